@@ -0,0 +1,222 @@
+"""
+Read-only JSON API for tires, disks and categories.
+
+Lists take the same filters as the HTML pages plus:
+
+* ``fields=brand,price`` - only these columns are selected, rows are built
+  with ``.values()`` so no model instance is created per row;
+* ``sort_by`` and ``cursor`` - keyset pagination like the list pages, search
+  results in relevance order use ``page`` instead.
+
+Responses are cached per catalog version and carry ETag / Last-Modified
+(see cache_catalog_page), so polling clients mostly get 304s.
+"""
+
+from decimal import Decimal
+from functools import wraps
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from categories.models import Category
+from disks.models import Disk
+from disks.views import filter_disks, search_disks
+from tires.models import Tire
+from tires.views import filter_tires, search_tires
+from .caching import cache_catalog_page
+from .pagination import KeysetPaginator
+
+PER_PAGE = 24
+MAX_PER_PAGE = 100
+
+TIRE_FIELDS = [
+    "id",
+    "slug",
+    "brand",
+    "model",
+    "width",
+    "profile",
+    "diameter",
+    "size_key",
+    "tire_type",
+    "season",
+    "load_index",
+    "speed_index",
+    "price",
+    "article",
+    "quantity",
+    "image",
+    "category",
+    "created_at",
+]
+DISK_FIELDS = [
+    "id",
+    "slug",
+    "brand",
+    "model",
+    "diameter",
+    "width",
+    "pcd",
+    "dia",
+    "price",
+    "article",
+    "quantity",
+    "image",
+    "category",
+    "created_at",
+]
+CATEGORY_FIELDS = ["id", "slug", "name", "created_at"]
+
+# Numeric filter parameters of the lists and the type they must parse as
+TIRE_NUMBERS = {"min_price": Decimal, "max_price": Decimal, "diameter": int}
+DISK_NUMBERS = {
+    "min_price": Decimal,
+    "max_price": Decimal,
+    "diameter": int,
+    "dia": Decimal,
+    "min_width": Decimal,
+    "max_width": Decimal,
+}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def selected_fields(request, default, extra=("description",)):
+    """Columns named by ?fields=, ``default`` without it"""
+    allowed = [*default, *extra]
+    names = request.GET.get("fields")
+    if not names:
+        return list(default)
+    fields = [name.strip() for name in names.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def check_numbers(params, numbers):
+    """BadRequest naming the first parameter of ``numbers`` that doesn't parse"""
+    for name, number in numbers.items():
+        value = params.get(name)
+        if not value:
+            continue
+        try:
+            parsed = number(value)
+        except (ValueError, ArithmeticError):
+            parsed = None
+        if parsed is None or (number is Decimal and not parsed.is_finite()):
+            kind = "a whole number" if number is int else "a number"
+            raise BadRequest(f"{name} must be {kind}")
+
+
+def serialize(rows, fields):
+    """Only ``fields`` of each row, image names turned into URLs"""
+    for row in rows:
+        if row.get("image"):
+            row["image"] = f"{settings.MEDIA_URL}{row['image']}"
+        yield {field: row[field] for field in fields}
+
+
+def list_response(request, queryset, fields, searched=False):
+    try:
+        per_page = int(request.GET.get("per_page", PER_PAGE))
+    except ValueError:
+        raise BadRequest("per_page must be a number")
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    sort_by = request.GET.get("sort_by", "relevance" if searched else "-created_at")
+    if sort_by in KeysetPaginator.orderings:
+        # The cursor is made of the sort column and id, select them too
+        columns = list(dict.fromkeys([*fields, "id", sort_by.lstrip("-")]))
+        paginator = KeysetPaginator(queryset.values(*columns), per_page, sort_by)
+        page = paginator.get_page(request.GET.get("cursor"))
+        data = {
+            "next_cursor": page.next_cursor,
+            "previous_cursor": page.previous_cursor,
+        }
+    elif sort_by == "relevance" and searched:
+        paginator = Paginator(queryset.values(*fields), per_page)
+        page = paginator.get_page(request.GET.get("page"))
+        data = {
+            "page": page.number,
+            "num_pages": paginator.num_pages,
+            "count": paginator.count,
+        }
+    else:
+        raise BadRequest(f"Can't sort by {sort_by}")
+    data["results"] = list(serialize(page.object_list, fields))
+    return JsonResponse(data)
+
+
+def api_view(view):
+    """GET only, BadRequest as a 400 JSON error, cached per catalog version"""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as error:
+            return JsonResponse({"error": str(error)}, status=400)
+
+    return require_GET(cache_catalog_page(wrapper))
+
+
+def detail_response(queryset, slug, fields):
+    rows = list(queryset.filter(slug=slug).values(*fields)[:1])
+    if not rows:
+        return JsonResponse({"error": "Not found"}, status=404)
+    return JsonResponse(next(serialize(rows, fields)))
+
+
+@api_view
+def tire_list(request):
+    """Tires, filtered like the tire list page"""
+    fields = selected_fields(request, TIRE_FIELDS)
+    check_numbers(request.GET, TIRE_NUMBERS)
+    tires = filter_tires(search_tires(request.GET), request.GET)
+    return list_response(
+        request, tires, fields, searched=bool(request.GET.get("search"))
+    )
+
+
+@api_view
+def tire_detail(request, slug):
+    """One tire"""
+    fields = selected_fields(request, [*TIRE_FIELDS, "description"], extra=())
+    return detail_response(Tire.objects.all(), slug, fields)
+
+
+@api_view
+def disk_list(request):
+    """Disks, filtered like the disk list page"""
+    fields = selected_fields(request, DISK_FIELDS)
+    check_numbers(request.GET, DISK_NUMBERS)
+    disks = filter_disks(search_disks(request.GET), request.GET)
+    return list_response(
+        request, disks, fields, searched=bool(request.GET.get("search"))
+    )
+
+
+@api_view
+def disk_detail(request, slug):
+    """One disk"""
+    fields = selected_fields(request, [*DISK_FIELDS, "description"], extra=())
+    return detail_response(Disk.objects.all(), slug, fields)
+
+
+@api_view
+def category_list(request):
+    """All categories"""
+    fields = selected_fields(request, CATEGORY_FIELDS)
+    rows = Category.objects.order_by("name").values(*fields)
+    return JsonResponse({"results": list(serialize(rows, fields))})
+
+
+@api_view
+def category_detail(request, slug):
+    """One category"""
+    fields = selected_fields(request, [*CATEGORY_FIELDS, "description"], extra=())
+    return detail_response(Category.objects.all(), slug, fields)
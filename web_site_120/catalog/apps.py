@@ -0,0 +1,40 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_save
+
+
+class CatalogConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'catalog'
+
+    def ready(self):
+        from categories.models import Category
+        from disks.models import Disk
+        from tires.models import Tire
+        from . import products, thumbnails
+        from .autocomplete import product_index
+        from .caching import bump_catalog_version
+        from .signals import catalog_bulk_changed, catalog_stock_changed
+
+        for model in (Tire, Disk, Category):
+            uid = f"catalog-version:{model._meta.label}"
+            post_save.connect(bump_catalog_version, sender=model, dispatch_uid=uid)
+            post_delete.connect(bump_catalog_version, sender=model, dispatch_uid=uid)
+            catalog_bulk_changed.connect(
+                bump_catalog_version, sender=model, dispatch_uid=uid
+            )
+            # Pages show the stock; the facets and suggestions don't
+            catalog_stock_changed.connect(
+                bump_catalog_version, sender=model, dispatch_uid=uid
+            )
+
+        for model in (Tire, Disk):
+            uid = f"products:{model._meta.label}"
+            post_save.connect(products.on_save, sender=model, dispatch_uid=uid)
+            post_delete.connect(products.on_delete, sender=model, dispatch_uid=uid)
+            catalog_bulk_changed.connect(
+                products.on_bulk_change, sender=model, dispatch_uid=uid
+            )
+            uid = f"thumbnails:{model._meta.label}"
+            pre_save.connect(thumbnails.on_pre_save, sender=model, dispatch_uid=uid)
+            post_save.connect(thumbnails.on_post_save, sender=model, dispatch_uid=uid)
+        product_index.connect()
@@ -0,0 +1,214 @@
+"""
+In-process prefix index for search box suggestions.
+
+Every word of brand and model, the whole "brand model" and the article of
+each tire and disk is a lower-cased key in one sorted list. A prefix lookup
+is a bisect to the first key >= the prefix and a walk while keys still
+start with it, so answering needs no database query.
+
+The index is built on the first lookup and patched by the Tire/Disk signals
+of this process once their transaction commits. Changes made by other
+processes are noticed through the catalog version (read from the cache at
+most every ``check_interval`` seconds); the index is then rebuilt in a
+background thread while lookups keep using the old one.
+
+Writers never change the published index, they make a patched copy and
+swap it in, so lookups read it without taking the lock. A patch copies the
+index once however many products it touches, and saves that leave the
+indexed fields as they were don't patch at all.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from heapq import merge
+
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.urls import reverse
+
+from disks.models import Disk
+from tires.models import Tire
+from .caching import catalog_version
+from .routers import primary
+from .signals import catalog_bulk_changed
+
+logger = logging.getLogger(__name__)
+
+
+FIELDS = ("pk", "brand", "model", "article", "slug")
+
+
+class PrefixIndex:
+    """Sorted (key, kind, pk) entries plus a label and url per product"""
+
+    def __init__(self, models, check_interval=5):
+        self.models = {model._meta.model_name: model for model in models}
+        self.check_interval = check_interval
+        self.lock = threading.Lock()  # between writers, lookups don't take it
+        # (entries, products), built on first use, replaced but never changed.
+        # products: (kind, pk) -> (keys, suggestion)
+        self.index = None
+        self.url_patterns = {}
+        self.version = None
+        self.checked_at = 0.0
+        self.rebuilding = None  # background build thread
+
+    def keys(self, row):
+        """Lower-cased words, model, "brand model" and article of a row"""
+        model = " ".join(row["model"].lower().split())
+        words = f"{row['brand']} {model}".lower().split()
+        return sorted({*words, model, " ".join(words), row["article"].lower()} - {""})
+
+    def suggestion(self, kind, row):
+        if kind not in self.url_patterns:
+            # "/tires/slug/" with the slug cut out, formatted per row
+            self.url_patterns[kind] = reverse(f"{kind}_detail", args=["-"])
+        return {
+            "label": f"{row['brand']} {row['model']}",
+            "article": row["article"],
+            "kind": kind,
+            "url": self.url_patterns[kind].replace("/-/", f"/{row['slug']}/"),
+        }
+
+    def rows(self, kind, pks=None):
+        queryset = primary(self.models[kind]).order_by()
+        if pks is not None:
+            queryset = queryset.filter(pk__in=pks)
+        return queryset.values(*FIELDS)
+
+    def build(self):
+        """Read every product, swap the new index in at once"""
+        version = catalog_version()
+        entries, products = [], {}
+        for kind in self.models:
+            for row in self.rows(kind).iterator(chunk_size=5000):
+                keys = self.keys(row)
+                products[kind, row["pk"]] = (keys, self.suggestion(kind, row))
+                entries += [(key, kind, row["pk"]) for key in keys]
+        entries.sort()
+        with self.lock:
+            self.index = (entries, products)
+            # A change patched in meanwhile may be missing, the version it
+            # bumped then differs and the next check rebuilds again
+            self.version = version
+            self.checked_at = time.monotonic()
+
+    def rebuild_later(self):
+        """Build a new index in a thread, lookups use the old one meanwhile"""
+        with self.lock:
+            if self.rebuilding is not None and self.rebuilding.is_alive():
+                return
+            self.rebuilding = threading.Thread(
+                target=self._rebuild, name="autocomplete", daemon=True
+            )
+            self.rebuilding.start()
+
+    def _rebuild(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception("Can't rebuild the autocomplete index")
+        finally:
+            connections.close_all()  # the ones this thread opened
+
+    def ensure_fresh(self):
+        now = time.monotonic()
+        if self.index is None:
+            self.build()
+        elif now - self.checked_at > self.check_interval:
+            self.checked_at = now
+            if catalog_version() != self.version:
+                self.rebuild_later()
+
+    def lookup(self, prefix, kind=None, limit=10):
+        """Up to ``limit`` products with a key starting with ``prefix``"""
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+        self.ensure_fresh()
+        entries, products = self.index
+        found = {}
+        index = bisect_left(entries, (prefix,))
+        while index < len(entries) and len(found) < limit:
+            key, entry_kind, pk = entries[index]
+            if not key.startswith(prefix):
+                break
+            if kind in (None, entry_kind) and (entry_kind, pk) not in found:
+                found[entry_kind, pk] = products[entry_kind, pk][1]
+            index += 1
+        return list(found.values())
+
+    def update(self, kind, pks, rows=None):
+        """Re-index ``pks`` of ``kind`` from ``rows`` or the database"""
+        if self.index is None:
+            return  # not built yet, the build will read them
+        if rows is None:
+            rows = self.rows(kind, pks)
+        rows = {row["pk"]: row for row in rows}
+        with self.lock:
+            entries, products = self.index
+            changed = {}  # (kind, pk) -> new (keys, suggestion), None if gone
+            for pk in pks:
+                old = products.get((kind, pk))
+                new = None
+                if pk in rows:
+                    new = (self.keys(rows[pk]), self.suggestion(kind, rows[pk]))
+                if new != old:
+                    changed[kind, pk] = new
+            if changed:
+                self.index = self._patched(entries, products, changed)
+            # Our own change bumped the version, don't rebuild for it
+            self.version = catalog_version()
+
+    def _patched(self, entries, products, changed):
+        """New (entries, products) with ``changed`` applied, one pass over both"""
+        products = dict(products)
+        added = []
+        for (kind, pk), new in changed.items():
+            products.pop((kind, pk), None)
+            if new is not None:
+                products[kind, pk] = new
+                added += [(key, kind, pk) for key in new[0]]
+        kept = (entry for entry in entries if entry[1:] not in changed)
+        return list(merge(kept, sorted(added))), products
+
+    def on_save(self, sender, instance, using, **kwargs):
+        # Applied once the change commits, a rolled back save leaves no entry.
+        # robust: a failed patch is logged, the stale version then rebuilds
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and update_fields.isdisjoint(FIELDS):
+            return  # e.g. only the stock or the price
+        row = {field: getattr(instance, field) for field in FIELDS}
+        kind = sender._meta.model_name
+        transaction.on_commit(
+            lambda: self.update(kind, [row["pk"]], [row]), using=using, robust=True
+        )
+
+    def on_delete(self, sender, instance, using, **kwargs):
+        kind, pk = sender._meta.model_name, instance.pk
+        transaction.on_commit(
+            lambda: self.update(kind, [pk], []), using=using, robust=True
+        )
+
+    def on_bulk_change(self, sender, pks=None, **kwargs):
+        kind = sender._meta.model_name
+        if pks is None:
+            transaction.on_commit(self.rebuild_later, robust=True)
+        else:
+            pks = list(pks)
+            transaction.on_commit(lambda: self.update(kind, pks), robust=True)
+
+    def connect(self):
+        # After the catalog version receivers, so update() sees the new version
+        for model in self.models.values():
+            uid = f"autocomplete:{model._meta.label}"
+            post_save.connect(self.on_save, sender=model, dispatch_uid=uid)
+            post_delete.connect(self.on_delete, sender=model, dispatch_uid=uid)
+            catalog_bulk_changed.connect(
+                self.on_bulk_change, sender=model, dispatch_uid=uid
+            )
+
+
+product_index = PrefixIndex([Tire, Disk])
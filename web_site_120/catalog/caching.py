@@ -0,0 +1,161 @@
+"""
+Response caching for catalog pages.
+
+Cached pages are keyed by the "catalog version", a counter bumped by every
+save or delete of a Tire, Disk or Category. An edit therefore retires all
+cached pages at once without waiting for a timeout, and the version doubles
+as the ETag so repeat visitors get 304 responses.
+
+Only visitors without a session, a CSRF cookie or a login share pages; for
+anyone else the page may hold their cart, user or CSRF token and is rendered
+for them.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (
+    get_conditional_response,
+    patch_vary_headers,
+    quote_etag,
+)
+from django.utils.http import http_date, urlencode
+
+from .parallel import run_in_worker
+
+VERSION_KEY = "catalog:version"
+MODIFIED_KEY = "catalog:modified"
+
+
+def catalog_version():
+    """Current catalog version"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock so a version lost from the cache can't be
+        # reused and revive pages cached under it
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def catalog_modified():
+    """Unix time of the last catalog change"""
+    modified = cache.get(MODIFIED_KEY)
+    if modified is None:
+        modified = int(time.time())
+        cache.add(MODIFIED_KEY, modified, None)
+    return modified
+
+
+def bump_catalog_version(**kwargs):
+    """Signal receiver: the catalog changed"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        catalog_version()
+    cache.set(MODIFIED_KEY, int(time.time()), None)
+
+
+def is_personal(request):
+    """The page may show something of the visitor's own: session, CSRF token, login"""
+    cookies = request.COOKIES
+    if settings.SESSION_COOKIE_NAME in cookies or settings.CSRF_COOKIE_NAME in cookies:
+        return True
+    user = getattr(request, "user", None)  # anonymous without a session cookie
+    return user is not None and user.is_authenticated
+
+
+def _cached(request):
+    """
+    (response, key, etag, last_modified) for a shareable request, the response
+    being a 304 or the cached page, None when the view has to run. None
+    instead of the tuple when the page must not be cached at all.
+    """
+    if request.method not in ("GET", "HEAD") or is_personal(request):
+        return None
+    version = catalog_version()
+    params = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.md5(f"{request.path}?{params}".encode()).hexdigest()
+    etag = quote_etag(f"{version}-{digest}")
+    last_modified = catalog_modified()
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    key = f"page:{version}:{digest}"
+    if response is None:
+        response = cache.get(key)
+    return response, key, etag, last_modified
+
+
+def _store(response, key, etag, last_modified, timeout):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return response
+    if (
+        settings.REPLICA_DATABASES
+        and time.time() - last_modified < settings.REPLICA_LAG
+    ):
+        # Rendered from a replica that may not have the latest change yet,
+        # don't keep it under the new version
+        return response
+    cache.set(key, response, timeout)
+    return response
+
+
+def _validators(response, etag, last_modified):
+    # A 404 or a redirect must not be revalidated into a 304 later
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+    patch_vary_headers(response, ["Cookie"])
+    return response
+
+
+def cache_catalog_page(view=None, timeout=60 * 60 * 24):
+    """
+    Cache a GET view under its path, sorted query string and catalog version.
+
+    ``timeout`` only clears out entries of old versions, current entries are
+    never stale. Visitors with a session or a login get the page rendered for
+    them (see is_personal), and every response varies on Cookie.
+    Responses carry ETag and Last-Modified, and a matching If-None-Match /
+    If-Modified-Since gets a 304 without running the view. Works on async
+    views too.
+    """
+    if view is None:
+        return lambda view: cache_catalog_page(view, timeout)
+
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            # The session and cache reads may touch the database
+            cached = await run_in_worker(_cached, request)
+            if cached is None:
+                response = await view(request, *args, **kwargs)
+                patch_vary_headers(response, ["Cookie"])
+                return response
+            response, key, etag, last_modified = cached
+            if response is None:
+                response = await view(request, *args, **kwargs)
+                await run_in_worker(_store, response, key, etag, last_modified, timeout)
+            return _validators(response, etag, last_modified)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        cached = _cached(request)
+        if cached is None:
+            response = view(request, *args, **kwargs)
+            patch_vary_headers(response, ["Cookie"])
+            return response
+        response, key, etag, last_modified = cached
+        if response is None:
+            response = view(request, *args, **kwargs)
+            _store(response, key, etag, last_modified, timeout)
+        return _validators(response, etag, last_modified)
+
+    return wrapper
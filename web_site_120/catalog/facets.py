@@ -0,0 +1,143 @@
+import time
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+
+from .routers import primary
+from .signals import catalog_bulk_changed
+
+
+class FacetSummary:
+    """
+    Cached sidebar data (distinct values and price bounds) for a catalog model.
+
+    The summary is stored under a version that signals bump once a change
+    commits, instead of being rewritten in place: a rolled back write never
+    reaches the cache, and a summary built from rows read before a change is
+    stored under the old version, where nobody looks for it any more.
+    """
+
+    def __init__(self, model, fields, timeout=24 * 60 * 60):
+        self.model = model
+        self.fields = list(fields)
+        self.timeout = timeout  # retired versions expire on their own
+
+    @property
+    def version_key(self):
+        return f"facets:{self.model._meta.label_lower}:version"
+
+    def version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # From the clock, a version lost from the cache is never reused
+            cache.add(self.version_key, time.time_ns() // 1000, None)
+            version = cache.get(self.version_key)
+        return version
+
+    @property
+    def cache_key(self):
+        return f"facets:{self.model._meta.label_lower}:{self.version()}"
+
+    def build(self):
+        """Read the summary from the database"""
+        queryset = primary(self.model).order_by()
+        summary = {
+            field: list(
+                queryset.order_by(field).values_list(field, flat=True).distinct()
+            )
+            for field in self.fields
+        }
+        prices = queryset.aggregate(
+            min_price=models.Min("price"), max_price=models.Max("price")
+        )
+        summary["min_price"] = prices["min_price"] or 0
+        summary["max_price"] = prices["max_price"] or 0
+        return summary
+
+    def get(self):
+        """Summary from the cache, built on a miss"""
+        key = self.cache_key
+        summary = cache.get(key)
+        if summary is None:
+            summary = self.refresh(key)
+        return summary
+
+    def refresh(self, key=None):
+        key = key or self.cache_key  # taken before the rows are read
+        summary = self.build()
+        cache.set(key, summary, self.timeout)
+        return summary
+
+    def invalidate(self):
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            self.version()
+
+    def covers(self, summary, values):
+        """Whether a row with ``values`` leaves ``summary`` as it is"""
+        if not summary[self.fields[0]]:
+            return False  # the table was empty, the 0 bounds are placeholders
+        return summary["min_price"] <= values["price"] <= summary["max_price"] and all(
+            values[field] in summary[field] for field in self.fields
+        )
+
+    def add(self, values):
+        """A row with ``values`` was created: keep the summary if it has them"""
+        summary = cache.get(self.cache_key)
+        if summary is not None and not self.covers(summary, values):
+            self.invalidate()
+
+    def on_save(self, sender, instance, created, using, **kwargs):
+        # Once the change commits. An edit can remove the last row with some
+        # value or move the price bounds inwards, which only a rebuild sees.
+        if created:
+            fields = [*self.fields, "price"]
+            values = {field: getattr(instance, field) for field in fields}
+            transaction.on_commit(lambda: self.add(values), using=using, robust=True)
+        else:
+            transaction.on_commit(self.invalidate, using=using, robust=True)
+
+    def on_delete(self, sender, instance, using, **kwargs):
+        transaction.on_commit(self.invalidate, using=using, robust=True)
+
+    def on_bulk_change(self, sender, **kwargs):
+        transaction.on_commit(self.invalidate, robust=True)
+
+    def connect(self):
+        uid = f"facets:{self.model._meta.label_lower}"
+        post_save.connect(self.on_save, sender=self.model, dispatch_uid=uid)
+        post_delete.connect(self.on_delete, sender=self.model, dispatch_uid=uid)
+        catalog_bulk_changed.connect(
+            self.on_bulk_change, sender=self.model, dispatch_uid=uid
+        )
+
+
+def facet_counts(queryset, selected):
+    """
+    Matching row count for every value of every facet in ``selected``.
+
+    Each facet is counted under the other facets' selections but not its own,
+    so the sidebar can show alternatives to the current choice. Everything
+    comes from one GROUP BY over the facet columns of ``queryset``.
+    """
+    dimensions = list(selected)
+    active = {
+        field: str(value)
+        for field, value in selected.items()
+        if value not in ("", None)
+    }
+    rows = queryset.order_by().values(*dimensions).annotate(count=models.Count("pk"))
+
+    counts = {field: {} for field in dimensions}
+    for row in rows:
+        for field in dimensions:
+            if all(
+                str(row[other]) == value
+                for other, value in active.items()
+                if other != field
+            ):
+                value = row[field]
+                counts[field][value] = counts[field].get(value, 0) + row["count"]
+    return {field: dict(sorted(values.items())) for field, values in counts.items()}
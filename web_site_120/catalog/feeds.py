@@ -0,0 +1,185 @@
+"""
+Product feeds for marketplaces: CSV, JSON Lines and Google Merchant RSS.
+
+Rows are read with ``.values().iterator(chunk_size=...)``, turned into feed
+items and written out one at a time, so a feed of the whole catalog takes
+the same memory as a feed of ten products. The same generators back the
+export_catalog command and the streaming /feeds/ endpoint.
+
+With ``since`` only products whose ``updated_at`` is at or after it are
+listed (an incremental feed). Deleted products can't be listed that way,
+consumers drop them on the next full feed.
+"""
+
+import csv
+import json
+from datetime import datetime, time
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from disks.models import Disk
+from tires.models import Tire
+
+FEED_MODELS = {"tires": Tire, "disks": Disk}
+CURRENCY = "UAH"
+
+COLUMNS = [
+    "id",
+    "kind",
+    "title",
+    "brand",
+    "model",
+    "size",
+    "article",
+    "price",
+    "quantity",
+    "availability",
+    "link",
+    "image_link",
+    "description",
+    "updated_at",
+]
+BASE_FIELDS = [
+    "id",
+    "slug",
+    "brand",
+    "model",
+    "article",
+    "price",
+    "quantity",
+    "image",
+    "description",
+    "updated_at",
+]
+# Columns read per model on top of BASE_FIELDS, and the "size" made of them
+SIZE_FIELDS = {
+    Tire: (["size_key"], lambda row: row["size_key"]),
+    Disk: (
+        ["diameter", "width", "pcd"],
+        lambda row: f"{row['diameter']}x{row['width']} {row['pcd']}",
+    ),
+}
+
+
+def parse_since(value):
+    """Aware datetime from "2026-10-01" or "2026-10-01T12:00[:00][+03:00]" """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Can't read {value!r} as a date or time")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def feed_items(models, since=None, base_url="", chunk_size=2000):
+    """Feed items of ``models``, all or those changed since ``since``"""
+    for model in models:
+        kind = model._meta.model_name
+        size_fields, size = SIZE_FIELDS[model]
+        # "/tires/slug/" with the slug cut out, formatted per row
+        link = base_url + reverse(f"{kind}_detail", args=["-"])
+        rows = model.objects.values(*BASE_FIELDS, *size_fields)
+        if since is None:
+            rows = rows.order_by("pk")
+        else:
+            rows = rows.filter(updated_at__gte=since).order_by("updated_at", "pk")
+        for row in rows.iterator(chunk_size=chunk_size):
+            item_size = size(row)
+            yield {
+                "id": f"{kind}-{row['id']}",
+                "kind": kind,
+                "title": f"{row['brand']} {row['model']} {item_size}",
+                "brand": row["brand"],
+                "model": row["model"],
+                "size": item_size,
+                "article": row["article"],
+                "price": row["price"],
+                "quantity": row["quantity"],
+                "availability": "in_stock" if row["quantity"] > 0 else "out_of_stock",
+                "link": link.replace("/-/", f"/{row['slug']}/"),
+                "image_link": (
+                    f"{base_url}{settings.MEDIA_URL}{row['image']}"
+                    if row["image"]
+                    else ""
+                ),
+                "description": row["description"],
+                "updated_at": row["updated_at"],
+            }
+
+
+class Echo:
+    """File-like object handing back what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def csv_feed(items):
+    writer = csv.DictWriter(Echo(), COLUMNS)
+    yield writer.writeheader()
+    for item in items:
+        item["updated_at"] = item["updated_at"].isoformat()
+        yield writer.writerow(item)
+
+
+def jsonl_feed(items):
+    for item in items:
+        yield json.dumps(item, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+XML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n'
+)
+XML_ITEM = """<item>
+<g:id>{id}</g:id>
+<title>{title}</title>
+<description>{description}</description>
+<link>{link}</link>
+<g:image_link>{image_link}</g:image_link>
+<g:price>{price} {currency}</g:price>
+<g:availability>{availability}</g:availability>
+<g:brand>{brand}</g:brand>
+<g:mpn>{article}</g:mpn>
+<g:condition>new</g:condition>
+</item>
+"""
+
+
+def xml_feed(items, title="Products"):
+    yield XML_HEADER + f"<title>{escape(title)}</title>\n"
+    for item in items:
+        yield XML_ITEM.format(
+            currency=CURRENCY,
+            **{key: escape(str(value)) for key, value in item.items()},
+        )
+    yield "</channel>\n</rss>\n"
+
+
+FORMATS = {
+    # name: (writer, content type)
+    "csv": (csv_feed, "text/csv; charset=utf-8"),
+    "jsonl": (jsonl_feed, "application/x-ndjson; charset=utf-8"),
+    "xml": (xml_feed, "application/xml; charset=utf-8"),
+}
+
+
+def buffered(chunks, size=64 * 1024):
+    """Join small chunks into ~``size`` character ones, fewer writes to the socket"""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer)
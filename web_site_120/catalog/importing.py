@@ -0,0 +1,172 @@
+"""
+Bulk upsert of supplier price lists into Tire / Disk.
+
+Rows are streamed from CSV or XLSX and written in batches with one
+``INSERT ... ON CONFLICT (article) DO UPDATE`` per batch, so memory use
+depends on the batch size and not on the file size. Existing rows only get
+the columns of the file: a price list without ``description`` leaves the
+descriptions alone.
+"""
+
+import csv
+import time
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from categories.models import Category
+from .routers import primary
+from .signals import catalog_bulk_changed
+from .slugs import assign_unique_slugs
+
+
+def read_rows(path):
+    """Yield one dict per data row of a .csv or .xlsx file, keyed by the header"""
+    path = Path(path)
+    if path.suffix.lower() == ".xlsx":
+        yield from _read_xlsx(path)
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            yield from csv.DictReader(file)
+
+
+def _read_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("Reading .xlsx files needs openpyxl (pip install openpyxl)")
+
+    # read_only streams the sheet instead of loading it whole
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows)]
+        for values in rows:
+            yield {
+                name: "" if value is None else str(value)
+                for name, value in zip(header, values)
+            }
+    finally:
+        workbook.close()
+
+
+class CatalogImporter:
+    """Upserts rows into ``model`` by article in batches of ``batch_size``"""
+
+    def __init__(self, model, category=None, batch_size=2000):
+        self.model = model
+        self.category = category  # for files without a "category" column
+        self.batch_size = batch_size
+        self.categories = {}
+        self.fields = [
+            field
+            for field in model._meta.concrete_fields
+            if field.editable
+            and not field.primary_key
+            and field.name not in ("slug", "category")
+        ]
+        self.update_fields = None  # set from the header of the first row
+
+        self.rows = self.written = self.failed = 0
+        self.errors = []  # (line, error) of the first max_errors bad rows
+        self.max_errors = 100
+
+    def run(self, rows, progress=None):
+        """Import ``rows`` (dicts), calling ``progress(importer)`` after each batch"""
+        self.started = time.perf_counter()
+        batch = {}  # by article, a later row of the same article wins
+        for number, row in enumerate(rows, start=2):  # line 1 is the header
+            self.rows += 1
+            if self.update_fields is None:
+                self.update_fields = self.columns_to_update(row)
+            try:
+                product = self.build(row)
+            except (ValidationError, ValueError, Category.DoesNotExist) as error:
+                self.failed += 1
+                if len(self.errors) < self.max_errors:
+                    self.errors.append((number, error))
+                continue
+            batch[product.article] = product
+            if len(batch) >= self.batch_size:
+                self.write(list(batch.values()))
+                batch = {}
+                if progress:
+                    progress(self)
+        if batch:
+            self.write(list(batch.values()))
+            if progress:
+                progress(self)
+        if self.written:
+            catalog_bulk_changed.send(sender=self.model)
+        return self
+
+    @property
+    def rate(self):
+        """Rows per second so far"""
+        return self.rows / max(time.perf_counter() - self.started, 1e-9)
+
+    def columns_to_update(self, row):
+        """Fields of existing rows the file has columns for"""
+        columns = {key.strip() for key in row if key} - {"article"}
+        fields = [field.name for field in self.fields if field.name in columns]
+        if "category" in columns:
+            fields.append("category")
+        # Computed columns whose sources are all in the file
+        for name, sources in self.model.DERIVED_FIELDS.items():
+            if columns.issuperset(sources):
+                fields.append(name)
+        return fields + ["updated_at"]  # bulk writes set it themselves
+
+    def build(self, row):
+        row = {key.strip(): (value or "").strip() for key, value in row.items() if key}
+        product = self.model(category=self.get_category(row.get("category")))
+        for field in self.fields:
+            value = row.get(field.name, "")
+            if value == "" and field.has_default():
+                value = field.get_default()
+            elif value == "" and not field.empty_strings_allowed:
+                raise ValidationError(f"{field.name} is required")
+            value = field.to_python(value)
+            if field.choices:
+                field.validate(value, product)  # not written if not a choice
+            setattr(product, field.attname, value)
+        if not product.article:
+            raise ValidationError("article is required")
+        product.set_derived_fields()
+        return product
+
+    def get_category(self, slug):
+        if not slug:
+            if self.category is None:
+                raise ValueError("No category column and no default category")
+            return self.category
+        if slug not in self.categories:
+            self.categories[slug] = Category.objects.get(slug=slug)
+        return self.categories[slug]
+
+    def write(self, batch, attempts=3):
+        # Slugs are only stored for inserted rows, existing rows keep theirs
+        for attempt in range(attempts):
+            existing = dict(
+                primary(self.model)
+                .filter(article__in=[product.article for product in batch])
+                .values_list("article", "slug")
+            )
+            for product in batch:
+                product.slug = existing.get(product.article, "")
+            assign_unique_slugs(self.model, batch, self.model.slug_parts)
+            try:
+                with transaction.atomic():
+                    self.model.objects.bulk_create(
+                        batch,
+                        update_conflicts=True,
+                        unique_fields=["article"],
+                        update_fields=self.update_fields,
+                    )
+                break
+            except IntegrityError:
+                # A concurrent insert took one of the slugs, pick new ones
+                if attempt == attempts - 1:
+                    raise
+        self.written += len(batch)
@@ -0,0 +1,128 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.test import AsyncClient, Client, override_settings
+
+# Pages with async versions in web_site_120.urls_async
+URLS = [
+    "/tires/",
+    "/tires/?brand=Michelin&sort_by=price",
+    "/tires/?season=winter&page=2",
+    "/disks/",
+    "/disks/?diameter=18",
+    "/",
+]
+TEMPLATES = {
+    "tires/tire_list.html": "{% for tire in tires %}{{ tire }}{% endfor %}",
+    "disks/disk_list.html": "{% for disk in disks %}{{ disk }}{% endfor %}",
+    "pages/home.html": "{% for tire in tires %}{{ tire }}{% endfor %}",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Request the catalog list pages from many clients at once, through the "
+        "WSGI handler (sync views, one thread per client) and through the ASGI "
+        "handler (async views, one task per client), and compare p50/p99 latency"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=600)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument(
+            "--no-page-cache",
+            action="store_true",
+            help="Clear the cache before every request (home is a cached page)",
+        )
+
+    def handle(self, *args, **options):
+        self.clear_cache = options["no_page_cache"]
+        urls = [URLS[i % len(URLS)] for i in range(options["requests"])]
+        concurrency = options["concurrency"]
+
+        hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+        with self.templates(), override_settings(ALLOWED_HOSTS=hosts):
+            with override_settings(ROOT_URLCONF="web_site_120.urls"):
+                self.report("WSGI, sync views", *self.run_wsgi(urls, concurrency))
+            with override_settings(ROOT_URLCONF="web_site_120.urls_async"):
+                self.report(
+                    "ASGI, async views", *asyncio.run(self.run_asgi(urls, concurrency))
+                )
+
+    def templates(self):
+        """Stand-in templates when the real ones aren't installed"""
+        missing = []
+        for name in TEMPLATES:
+            try:
+                get_template(name)
+            except TemplateDoesNotExist:
+                missing.append(name)
+        if not missing:
+            return override_settings()
+        self.stderr.write(f"Using stand-in templates for {', '.join(missing)}")
+        return override_settings(
+            TEMPLATES=[
+                {
+                    "BACKEND": "django.template.backends.django.DjangoTemplates",
+                    "OPTIONS": {
+                        "loaders": [
+                            ("django.template.loaders.locmem.Loader", TEMPLATES)
+                        ]
+                    },
+                }
+            ]
+        )
+
+    def run_wsgi(self, urls, concurrency):
+        local = threading.local()
+
+        def fetch(url):
+            if not hasattr(local, "client"):
+                local.client = Client()
+            if self.clear_cache:
+                cache.clear()
+            started = time.perf_counter()
+            response = local.client.get(url)
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(fetch, urls))
+        return results, time.perf_counter() - started
+
+    async def run_asgi(self, urls, concurrency):
+        queue = asyncio.Queue()
+        for url in urls:
+            queue.put_nowait(url)
+        results = []
+
+        async def worker():
+            client = AsyncClient()
+            while not queue.empty():
+                url = queue.get_nowait()
+                if self.clear_cache:
+                    cache.clear()
+                started = time.perf_counter()
+                response = await client.get(url)
+                results.append((time.perf_counter() - started, response.status_code))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return results, time.perf_counter() - started
+
+    def report(self, label, results, elapsed):
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        errors = sum(status != 200 for _, status in results)
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{label}: p50 {percentiles[49]:.1f} ms, p99 {percentiles[98]:.1f} ms, "
+            f"{len(results) / elapsed:.0f} req/s, {errors} errors"
+        )
@@ -0,0 +1,89 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from categories.models import Category
+from tires.models import Tire
+
+BRANDS = (
+    "Michelin Continental Bridgestone Goodyear Pirelli Nokian Hankook Yokohama "
+    "Dunlop Toyo Kumho Falken Nexen Barum Matador Kleber Vredestein Cooper"
+).split()
+WORDS = (
+    "pilot sport alpin cross climate eco contact premium winter ice snow grip "
+    "turanza potenza blizzak energy saver primacy hakka green ultra max touring"
+).split()
+QUERIES = ["michelin", "pilot sport", "hakka", "ice grip", "TB0012345", "conti eco"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the old icontains search with the full-text index on a generated "
+        "catalog. Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500_000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.generate(options["rows"])
+            self.stdout.write(f"{'query':<14}{'icontains ms':>14}{'full-text ms':>14}")
+            for query in QUERIES:
+                old = Tire.objects.filter(
+                    models.Q(brand__icontains=query)
+                    | models.Q(model__icontains=query)
+                    | models.Q(article__icontains=query)
+                )
+                new = Tire.objects.search(query)
+                self.stdout.write(
+                    f"{query:<14}"
+                    f"{self.measure(old, options['repeat']):>14.1f}"
+                    f"{self.measure(new, options['repeat']):>14.1f}"
+                )
+            transaction.set_rollback(True)
+
+    def generate(self, rows):
+        category = Category.objects.create(name="Benchmark", description="")
+        rng = random.Random(0)
+        started = time.perf_counter()
+        batch = []
+        for i in range(rows):
+            batch.append(
+                Tire(
+                    category=category,
+                    brand=rng.choice(BRANDS),
+                    model=" ".join(rng.sample(WORDS, 2)).title(),
+                    width=rng.choice([175, 185, 195, 205, 215, 225]),
+                    profile=rng.choice([45, 50, 55, 60, 65]),
+                    diameter=rng.choice([14, 15, 16, 17, 18]),
+                    tire_type="passenger",
+                    season=rng.choice(["summer", "winter", "all_season"]),
+                    load_index=91,
+                    speed_index="V",
+                    price=rng.randint(1500, 9000),
+                    article=f"TB{i:07d}",
+                    quantity=rng.randint(0, 20),
+                    image="tire_images/bench.jpg",
+                    description="",
+                    slug=f"bench-{i}",
+                )
+            )
+            if len(batch) == 5000:
+                Tire.objects.bulk_create(batch)
+                batch = []
+        Tire.objects.bulk_create(batch)
+        self.stdout.write(
+            f"Generated {rows} tires in {time.perf_counter() - started:.1f}s"
+        )
+
+    def measure(self, queryset, repeat):
+        """Average ms for one list page plus the match count"""
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset[:12])
+            queryset.count()
+        return (time.perf_counter() - started) * 1000 / repeat
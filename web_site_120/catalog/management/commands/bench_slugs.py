@@ -0,0 +1,97 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from categories.models import Category
+from catalog.slugs import assign_unique_slugs
+from tires.models import Tire
+
+SIZES = [
+    (w, p, d) for w in (185, 195, 205, 215) for p in (55, 60, 65) for d in (15, 16)
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert products that all share one brand and model through save() and "
+        "through the bulk import path, and report the queries spent per insert. "
+        "Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--skip-save", action="store_true", help="Only run the bulk path"
+        )
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        self.queries = 0
+        with connection.execute_wrapper(self.count_query), transaction.atomic():
+            category = Category.objects.create(name="Benchmark", description="")
+            if not options["skip_save"]:
+                self.run("save()", rows, lambda: self.insert_one_by_one(category, rows))
+            self.run(
+                "bulk",
+                rows,
+                lambda: self.insert_in_batches(category, rows, options["batch_size"]),
+            )
+            slugs = Tire.objects.filter(category=category).values_list(
+                "slug", flat=True
+            )
+            self.stdout.write(f"{slugs.distinct().count()} distinct slugs")
+            transaction.set_rollback(True)
+
+    def run(self, label, rows, insert):
+        self.queries = 0
+        started = time.perf_counter()
+        prefix = insert()
+        elapsed = time.perf_counter() - started
+        example = Tire.objects.filter(article__startswith=prefix).order_by("id").last()
+        self.stdout.write(
+            f"{label:<8} {rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s), "
+            f"{self.queries / rows:.2f} queries per row, last slug {example.slug}"
+        )
+
+    def insert_one_by_one(self, category, rows):
+        for i in range(rows):
+            self.tire(category, "S", i).save()
+        return "S"
+
+    def insert_in_batches(self, category, rows, batch_size):
+        for start in range(0, rows, batch_size):
+            batch = [
+                self.tire(category, "B", i)
+                for i in range(start, min(start + batch_size, rows))
+            ]
+            assign_unique_slugs(Tire, batch, Tire.slug_parts)
+            Tire.objects.bulk_create(batch)
+        return "B"
+
+    def tire(self, category, prefix, i):
+        width, profile, diameter = SIZES[i % len(SIZES)]
+        tire = Tire(
+            category=category,
+            brand="Michelin",
+            model="Pilot Sport",
+            width=width,
+            profile=profile,
+            diameter=diameter,
+            tire_type="passenger",
+            season="summer",
+            load_index=91,
+            speed_index="V",
+            price=2500,
+            article=f"{prefix}{i:07d}",
+            quantity=4,
+            image="tire_images/bench.jpg",
+            description="",
+        )
+        tire.set_derived_fields()
+        return tire
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
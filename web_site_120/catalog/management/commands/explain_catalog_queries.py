@@ -0,0 +1,164 @@
+import itertools
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+from catalog.pagination import KeysetPaginator
+from disks.models import Disk
+from tires.models import Tire
+
+# Filters of tire_list / disk_list, applied the way the views apply them
+TIRE_FILTERS = {
+    "search": lambda qs: qs.search("michelin"),
+    "size": lambda qs: qs.by_size("205/55 R16"),
+    "price": lambda qs: qs.by_price_range(1000.0, 3000.0),
+    "in_stock": lambda qs: qs.in_stock(),
+    "brand": lambda qs: qs.by_brand("Michelin"),
+    "season": lambda qs: qs.by_season("winter"),
+    "diameter": lambda qs: qs.by_diameter("16"),
+}
+DISK_FILTERS = {
+    "fitment": lambda qs: qs.fits("5x112", min_dia=57.1, min_width=7, max_width=9),
+    **{
+        name: TIRE_FILTERS[name]
+        for name in ("search", "price", "in_stock", "brand", "diameter")
+    },
+}
+# The facet counts are taken before these filters (tire_list / disk_list)
+FACET_FILTERS = {"brand", "season", "diameter"}
+FACET_SELECTIONS = {Tire: ("Michelin", "winter", "16"), Disk: ("BBS", "17")}
+
+# A cursor value for the second page of each keyset ordering
+CURSOR_VALUES = {
+    "created_at": "2025-01-01 00:00:00+00:00",
+    "price": "2000.00",
+    "brand": "Michelin",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN QUERY PLAN for every filter/sort combination of the tire and "
+        "disk lists, their ?page=N counts, facet counts and detail pages, fail if "
+        "any query reads rows it doesn't return"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans", action="store_true", help="Print every plan"
+        )
+
+    def handle(self, *args, **options):
+        failures = []
+        checked = 0
+        for label, query, filtered in self.queries():
+            for model, plan in self.plans(query):
+                checked += 1
+                if options["verbose_plans"]:
+                    self.stdout.write(f"{label}\n{plan}\n")
+                # Querysets are sliced pages, callables run counts and GROUP BYs
+                limited = not isinstance(query, tuple)
+                if self.reads_extra_rows(model, plan, filtered, limited):
+                    failures.append(f"{label}\n{plan}")
+
+        if failures:
+            raise CommandError(
+                f"{len(failures)} of {checked} queries scan more than they need:\n\n"
+                + "\n\n".join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS(f"{checked} query plans use indexes"))
+
+    def plans(self, query):
+        """(model, plan) of a queryset, or of every query a callable runs"""
+        if not isinstance(query, tuple):
+            yield query.model, query.explain()
+            return
+        model, function = query
+        connection = connections[model.objects.db]
+        with CaptureQueriesContext(connection) as queries:
+            function()
+        for captured in queries.captured_queries:
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {captured['sql']}")
+                yield model, "\n".join(" ".join(map(str, row)) for row in cursor)
+
+    def reads_extra_rows(self, model, plan, filtered, limited):
+        """
+        Whether the plan reads rows the query throws away. Allowed besides
+        SEARCH (an index seek on the filtered prefix):
+
+        * an ordered SCAN USING INDEX of an unfiltered query with a LIMIT,
+          which stops after the page;
+        * SCAN USING COVERING INDEX of an unfiltered count or GROUP BY, which
+          has to see every row but reads the smaller index instead;
+        * a SCAN of a partial index, which only holds the rows of its filter.
+        """
+        table = model._meta.db_table
+        partial = {index.name for index in model._meta.indexes if index.condition}
+        for match in re.finditer(
+            rf"\bSCAN {table}\b(?: USING (COVERING )?INDEX (\w+))?", plan
+        ):
+            covering, index = match.groups()
+            if index in partial:
+                continue
+            if index is None or filtered:
+                return True
+            if not covering and not limited:
+                return True
+        return False
+
+    def queries(self):
+        """(label, queryset or (model, callable), filtered) of the list pages"""
+        for model, filters in ((Tire, TIRE_FILTERS), (Disk, DISK_FILTERS)):
+            name = model._meta.model_name
+            for combination in self.combinations(filters):
+                queryset = model.objects.all()
+                for filter_name in combination:
+                    queryset = filters[filter_name](queryset)
+                applied = "+".join(combination) or "no filters"
+
+                if "search" in combination:
+                    yield f"{name}_list [{applied}] relevance", queryset[:12], True
+                for ordering in KeysetPaginator.orderings:
+                    label = f"{name}_list [{applied}] {ordering}"
+                    paginator = KeysetPaginator(queryset, 12, ordering)
+                    field = ordering.lstrip("-")
+                    position = {"value": CURSOR_VALUES[field], "id": 100}
+                    descending = ordering.startswith("-")
+                    filtered = bool(combination)
+                    yield label, paginator.page_queryset(None, descending), filtered
+                    yield (
+                        f"{label} next page",
+                        paginator.page_queryset(position, descending),
+                        filtered,
+                    )
+                # ?page=N links count the rows for the page numbers
+                yield (
+                    f"{name}_list [{applied}] count",
+                    (model, queryset.count),
+                    bool(combination),
+                )
+                if not FACET_FILTERS & set(combination):
+                    selection = FACET_SELECTIONS[model]
+                    yield (
+                        f"{name}_list [{applied}] facet counts",
+                        (model, lambda qs=queryset, s=selection: qs.facet_counts(*s)),
+                        bool(combination),
+                    )
+
+        # Width and profile only, the list sorted as usual
+        partial = Tire.objects.by_size("205/55").order_by("-created_at")
+        yield "tire_list [size 205/55]", partial[:12], True
+        yield "tire_list [size 205/55] count", (Tire, partial.count), True
+
+        related = Tire.objects.filter(brand="Michelin", season="winter")
+        yield "tire_detail related", related.exclude(id=1)[:4], True
+        related = Disk.objects.filter(brand="BBS")
+        yield "disk_detail related", related.exclude(id=1)[:4], True
+
+    def combinations(self, filters):
+        names = list(filters)
+        for size in range(len(names) + 1):
+            yield from itertools.combinations(names, size)
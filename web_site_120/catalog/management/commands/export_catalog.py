@@ -0,0 +1,56 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from catalog.feeds import FEED_MODELS, FORMATS, buffered, feed_items, parse_since
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a product feed (CSV, JSON Lines or Google Merchant XML) of tires "
+        "and disks, streamed row by row, optionally only the products changed "
+        "since a date"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--type", choices=FEED_MODELS, help="Only tires or disks")
+        parser.add_argument(
+            "--since", help='Only products changed since, "2026-10-01[T12:00]"'
+        )
+        parser.add_argument("--output", help="File to write, stdout without it")
+        parser.add_argument(
+            "--base-url", default="", help='Prefix of links, "https://example.com"'
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            try:
+                since = parse_since(options["since"])
+            except ValueError as error:
+                raise CommandError(error)
+        models = (
+            [FEED_MODELS[options["type"]]] if options["type"] else FEED_MODELS.values()
+        )
+
+        # Taken before reading, use it as --since of the next incremental run
+        generated_at = timezone.now()
+        writer, _ = FORMATS[options["format"]]
+        items = feed_items(
+            models, since, options["base_url"].rstrip("/"), options["chunk_size"]
+        )
+        output = (
+            open(options["output"], "w", encoding="utf-8", newline="")
+            if options["output"]
+            else sys.stdout
+        )
+        try:
+            for chunk in buffered(writer(items)):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(f"Feed generated at {generated_at.isoformat()}")
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importing import CatalogImporter, read_rows
+from categories.models import Category
+from disks.models import Disk
+from tires.models import Tire
+
+MODELS = {"tires": Tire, "disks": Disk}
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a supplier price list (.csv or .xlsx, one column per field) "
+        "into tires or disks, updating existing rows by article"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--type", choices=MODELS, required=True)
+        parser.add_argument(
+            "--category", help="Category slug for files without a category column"
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        category = None
+        if options["category"]:
+            try:
+                category = Category.objects.get(slug=options["category"])
+            except Category.DoesNotExist:
+                raise CommandError(f"Unknown category {options['category']!r}")
+
+        importer = CatalogImporter(
+            MODELS[options["type"]], category, options["batch_size"]
+        )
+        try:
+            importer.run(read_rows(options["path"]), progress=self.progress)
+        except (OSError, ImportError) as error:
+            raise CommandError(error)
+
+        for line, error in importer.errors:
+            self.stderr.write(f"line {line}: {error}")
+        if importer.failed > len(importer.errors):
+            self.stderr.write(f"... {importer.failed - len(importer.errors)} more")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {importer.written} of {importer.rows} rows "
+                f"({importer.failed} skipped, {importer.rate:.0f} rows/s)"
+            )
+        )
+
+    def progress(self, importer):
+        self.stdout.write(f"{importer.rows} rows, {importer.rate:.0f} rows/s")
@@ -0,0 +1,72 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.thumbnails import make_thumbnails
+from disks.models import Disk
+from tires.models import Tire
+
+
+def _setup():
+    # Spawned workers (macOS, Windows) start without Django configured
+    django.setup()
+
+
+def _make(name, force):
+    try:
+        return name, len(make_thumbnails(name, force=force)), None
+    except Exception as error:  # a broken upload mustn't stop the others
+        return name, 0, error
+
+
+class Command(BaseCommand):
+    help = (
+        "Make the missing thumbnails of every tire and disk image, "
+        "one worker process per core"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+        parser.add_argument(
+            "--force", action="store_true", help="Remake existing thumbnails too"
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be 1 or more")
+        names = set()
+        for model in (Tire, Disk):
+            names.update(
+                model.objects.exclude(image="")
+                .order_by()
+                .values_list("image", flat=True)
+                .distinct()
+            )
+        names = sorted(names)
+
+        started = time.perf_counter()
+        images = variants = failed = 0
+        with ProcessPoolExecutor(options["workers"], initializer=_setup) as pool:
+            results = pool.map(
+                _make,
+                names,
+                [options["force"]] * len(names),
+                chunksize=max(1, len(names) // (options["workers"] * 4)),
+            )
+            for name, written, error in results:
+                if error:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+                elif written:
+                    images += 1
+                    variants += written
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{variants} thumbnails of {images} images written "
+                f"({len(names) - images - failed} up to date, {failed} failed) "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importing import read_rows
+from catalog.sync import StockSync
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply price/quantity updates from a .csv or .xlsx file with article, "
+        "price and quantity columns to existing tires and disks"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        sync = StockSync(options["batch_size"])
+        try:
+            sync.run(read_rows(options["path"]))
+        except (OSError, ImportError) as error:
+            raise CommandError(error)
+
+        for article, error in sync.invalid:
+            self.stderr.write(f"{article}: {error}")
+        if sync.unknown:
+            self.stderr.write(f"Unknown articles: {', '.join(sync.unknown)}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{sync.received} rows: {sync.updated_total} changed, "
+                f"{sync.unknown_count} unknown, {sync.invalid_count} invalid"
+            )
+        )
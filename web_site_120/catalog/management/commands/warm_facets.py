@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from disks.facets import disk_facets
+from tires.facets import tire_facets
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached filter summaries of the tire and disk lists"
+
+    def handle(self, *args, **options):
+        for facets in (tire_facets, disk_facets):
+            summary = facets.refresh()
+            sizes = ", ".join(
+                f"{field}: {len(summary[field])}" for field in facets.fields
+            )
+            self.stdout.write(f"{facets.model._meta.verbose_name_plural}: {sizes}")
+        self.stdout.write(self.style.SUCCESS("Facet cache is warm"))
@@ -0,0 +1,170 @@
+import json
+import logging
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import profiling
+from .routers import routing_scope
+
+profile_logger = logging.getLogger("catalog.profiling")
+
+PRIMARY_COOKIE = "read_primary"
+
+
+class PrimaryAfterWriteMiddleware:
+    """
+    Catalog reads from the primary for the rest of a request that wrote to
+    the catalog, and for REPLICA_LAG seconds after it (a cookie), until the
+    replicas have caught up (see catalog.routers).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routing_scope(PRIMARY_COOKIE in request.COOKIES) as state:
+            response = self.get_response(request)
+        return self.remember(response, state)
+
+    async def __acall__(self, request):
+        with routing_scope(PRIMARY_COOKIE in request.COOKIES) as state:
+            response = await self.get_response(request)
+        return self.remember(response, state)
+
+    def remember(self, response, state):
+        if state["wrote"]:
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                "1",
+                max_age=settings.REPLICA_LAG,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+class RequestProfileMiddleware:
+    """
+    Query count, SQL time, the slowest query, template and view time of each
+    request as a Server-Timing header and a JSON log line, with warnings for
+    repeated queries and sampled traces of slow requests (see
+    catalog.profiling). Not loaded unless REQUEST_PROFILING is on.
+
+    First in MIDDLEWARE, with ViewProfileMiddleware last.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        profiling.install()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with profiling.profile_request() as profile:
+            response = self.get_response(request)
+        return self.report(request, response, profile)
+
+    async def __acall__(self, request):
+        with profiling.profile_request() as profile:
+            response = await self.get_response(request)
+        return self.report(request, response, profile)
+
+    def report(self, request, response, profile):
+        timing = profile.server_timing()
+        if response.has_header("Server-Timing"):  # the view's own entries
+            timing = f"{response['Server-Timing']}, {timing}"
+        response["Server-Timing"] = timing
+
+        slowest = profile.slowest
+        total_ms = profile.total_time * 1000
+        duplicates = profile.duplicates(settings.DUPLICATE_QUERY_THRESHOLD)
+        self.log(
+            logging.INFO,
+            "request",
+            request,
+            status=response.status_code,
+            queries=len(profile.queries),
+            db_ms=round(profile.db_time * 1000, 2),
+            slowest_ms=round(slowest[2] * 1000, 2) if slowest else None,
+            slowest_sql=slowest[0] if slowest else None,
+            template_ms=round(profile.template_time * 1000, 2),
+            view_ms=round(profile.view_time * 1000, 2),
+            total_ms=round(total_ms, 2),
+            duplicate_queries=sum(duplicates.values()),
+        )
+        for sql, count in duplicates.items():
+            self.log(
+                logging.WARNING, "duplicate_queries", request, count=count, sql=sql
+            )
+        if (
+            total_ms >= settings.SLOW_REQUEST_MS
+            and random.random() < settings.SLOW_REQUEST_TRACE_RATE
+        ):
+            self.log(
+                logging.WARNING,
+                "slow_request_trace",
+                request,
+                total_ms=round(total_ms, 2),
+                queries=profile.trace(),
+            )
+        return response
+
+    def log(self, level, event, request, **fields):
+        record = {"event": event, "method": request.method, "path": request.path}
+        profile_logger.log(level, json.dumps({**record, **fields}, default=str))
+
+
+class ViewProfileMiddleware:
+    """
+    The view time of RequestProfileMiddleware. Last in MIDDLEWARE, so its
+    process_view runs right before the view and the view's response comes
+    back to it before any other middleware sees it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # A sync process_view would cost the request a trip to the
+            # sync thread under ASGI
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        profiling.view_finished()
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        profiling.view_finished()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profiling.view_started()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        profiling.view_started()
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Product",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("tire", "Шина"), ("disk", "Диск")], max_length=10
+                    ),
+                ),
+                ("object_id", models.PositiveBigIntegerField()),
+                ("brand", models.CharField(max_length=100)),
+                ("model", models.CharField(max_length=100)),
+                ("article", models.CharField(max_length=50)),
+                ("price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("quantity", models.IntegerField()),
+                ("image", models.ImageField(blank=True, upload_to="")),
+                ("slug", models.SlugField(db_index=False)),
+                ("created_at", models.DateTimeField()),
+            ],
+            options={
+                "verbose_name": "Product",
+                "verbose_name_plural": "Products",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(fields=["created_at"], name="product_created_idx"),
+                    models.Index(fields=["price"], name="product_price_idx"),
+                    models.Index(fields=["brand"], name="product_brand_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "object_id"), name="product_kind_object_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+from catalog.search import drop_search_index, install_search_index
+
+SHARED_FIELDS = [
+    "brand",
+    "model",
+    "article",
+    "price",
+    "quantity",
+    "image",
+    "slug",
+    "created_at",
+]
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection, apps.get_model("catalog", "Product"))
+
+
+def remove_search_index(apps, schema_editor):
+    drop_search_index(schema_editor.connection, apps.get_model("catalog", "Product"))
+
+
+def fill_products(apps, schema_editor):
+    Product = apps.get_model("catalog", "Product")
+    for label in ("tires.Tire", "disks.Disk"):
+        model = apps.get_model(label)
+        batch = []
+        for values in model.objects.values("pk", *SHARED_FIELDS).iterator(2000):
+            batch.append(
+                Product(
+                    kind=model._meta.model_name, object_id=values.pop("pk"), **values
+                )
+            )
+            if len(batch) == 2000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0001_initial"),
+        ("disks", "0004_disk_fitment"),
+        ("tires", "0004_tire_size_key"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, remove_search_index),
+        migrations.RunPython(fill_products, migrations.RunPython.noop),
+    ]
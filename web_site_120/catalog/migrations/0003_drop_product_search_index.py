@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from catalog.search import drop_search_index, install_search_index
+
+
+def remove_search_index(apps, schema_editor):
+    drop_search_index(schema_editor.connection, apps.get_model("catalog", "Product"))
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection, apps.get_model("catalog", "Product"))
+
+
+class Migration(migrations.Migration):
+    """Nothing searches catalog.Product, its index only slowed down the syncs"""
+
+    dependencies = [
+        ("catalog", "0002_product_search_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_search_index, create_search_index),
+    ]
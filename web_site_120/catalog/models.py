@@ -0,0 +1,50 @@
+from django.db import models
+from django.urls import reverse
+
+
+class Product(models.Model):
+    """
+    One row per Tire and per Disk with the columns they share, so order items
+    can point at either with one foreign key. Kept in sync by
+    catalog.products, never edited directly.
+    """
+
+    KIND_CHOICES = [
+        ("tire", "Шина"),
+        ("disk", "Диск"),
+    ]
+
+    # The Tire / Disk this row mirrors
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+
+    # Copied from the tire / disk
+    brand = models.CharField(max_length=100)
+    model = models.CharField(max_length=100)
+    article = models.CharField(max_length=50)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.IntegerField()
+    image = models.ImageField(blank=True)
+    slug = models.SlugField(db_index=False)
+    created_at = models.DateTimeField()
+
+    def get_absolute_url(self):
+        return reverse(f"{self.kind}_detail", args=[self.slug])
+
+    def __str__(self):
+        return f"{self.brand} {self.model}"
+
+    class Meta:
+        ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "object_id"], name="product_kind_object_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["created_at"], name="product_created_idx"),
+            models.Index(fields=["price"], name="product_price_idx"),
+            models.Index(fields=["brand"], name="product_brand_idx"),
+        ]
+        verbose_name = "Product"
+        verbose_name_plural = "Products"
@@ -0,0 +1,170 @@
+import base64
+import hashlib
+import json
+from math import ceil
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage
+from django.db import models
+from django.utils.functional import cached_property
+
+from .caching import catalog_version
+
+
+class KeysetPage:
+    """
+    One page of a KeysetPaginator.
+
+    Has the parts of django's Page the listing templates use (``number``,
+    ``next_page_number()``, ``paginator.num_pages``...), so ``?page=N`` links
+    render as they do for a Paginator. The page number travels in the cursor.
+    """
+
+    def __init__(self, object_list, paginator, number, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.number = number
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f"<Page {self.number} of {self.paginator.num_pages}>"
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        if not self.has_next():
+            raise EmptyPage("That page contains no results")
+        return self.number + 1
+
+    def previous_page_number(self):
+        if not self.has_previous():
+            raise EmptyPage("That page number is less than 1")
+        return self.number - 1
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1 if self else 0
+
+
+class KeysetPaginator:
+    """
+    Cursor (seek) pagination over one sort column with ``id`` as tiebreaker.
+
+    Instead of ``OFFSET`` every page continues from the sort key of the last
+    row shown, so page N costs one indexed range query just like page 1, and
+    no ``COUNT(*)`` is run unless ``count`` is read.
+    """
+
+    orderings = ["-created_at", "created_at", "price", "-price", "brand"]
+
+    def __init__(self, queryset, per_page, ordering, count_timeout=300):
+        if ordering not in self.orderings:
+            raise ValueError(f"Keyset pagination can't order by {ordering!r}")
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = ordering.lstrip("-")
+        self.descending = ordering.startswith("-")
+        self.count_timeout = count_timeout
+
+    @cached_property
+    def count(self):
+        """Total number of rows, cached until the catalog changes"""
+        query = str(self.queryset.order_by().query)
+        digest = hashlib.md5(query.encode()).hexdigest()
+        key = f"count:{catalog_version()}:{digest}"
+        return cache.get_or_set(key, self.queryset.count, self.count_timeout)
+
+    @property
+    def num_pages(self):
+        """Pages of ``count`` rows, at least one like Paginator's; reads count"""
+        return max(ceil(self.count / self.per_page), 1)
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    def get_page(self, cursor=None):
+        """Page after (or before) ``cursor``, the first page for a bad cursor"""
+        position = self.decode(cursor) if cursor else None
+        if position is None:
+            backwards, number = False, 1
+            rows = self.fetch(None, descending=self.descending)
+        else:
+            backwards = position["direction"] == "previous"
+            number = position["number"]
+            rows = self.fetch(position, descending=self.descending != backwards)
+
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = self.encode(rows[-1], "next", number + 1)
+            if position is not None and (has_more or not backwards):
+                previous_cursor = self.encode(rows[0], "previous", number - 1)
+        return KeysetPage(rows, self, number, next_cursor, previous_cursor)
+
+    def fetch(self, position, descending):
+        return list(self.page_queryset(position, descending))
+
+    def page_queryset(self, position, descending):
+        """Rows after ``position`` in the given direction, plus one to peek"""
+        queryset = self.queryset
+        if position is not None:
+            after = "lt" if descending else "gt"
+            value = position["value"]
+            queryset = queryset.filter(
+                models.Q(**{f"{self.field}__{after}": value})
+                | models.Q(**{self.field: value, f"id__{after}": position["id"]})
+            )
+        sign = "-" if descending else ""
+        queryset = queryset.order_by(f"{sign}{self.field}", f"{sign}id")
+        return queryset[: self.per_page + 1]
+
+    def value(self, row, field):
+        return row[field] if isinstance(row, dict) else getattr(row, field)
+
+    def encode(self, row, direction, number):
+        """Cursor to the page ``number`` before or after ``row``"""
+        data = {
+            "value": str(self.value(row, self.field)),
+            "id": self.value(row, "id"),
+            "direction": direction,
+            "number": number,
+        }
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+    def decode(self, cursor):
+        field = self.queryset.model._meta.get_field(self.field)
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            data["number"] = int(data["number"])
+            if data["direction"] in ("next", "previous") and int(data["id"]):
+                data["value"] = field.to_python(data["value"])
+                if data["value"] is not None and data["number"] >= 1:
+                    return data
+        except (ValueError, TypeError, KeyError, ValidationError):
+            pass
+        return None
@@ -0,0 +1,39 @@
+"""
+Running independent queries of one async view at the same time.
+
+Django's async ORM methods (``acount``, ``aget``...) all run in the one
+thread that owns the request's connection, so awaiting them together still
+executes them one after another. run_queries() instead gives every call its
+own worker thread, and with it its own database connection, so a list page's
+rows, facet counts and sidebar summary are fetched concurrently.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _in_worker(function, args):
+    # Worker threads outlive the request: treat every call like a request
+    # of its own, which closes connections past CONN_MAX_AGE or broken
+    close_old_connections()
+    try:
+        return function(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_in_worker(function, *args):
+    """
+    ``function(*args)`` in a worker thread. Unlike plain sync_to_async, calls
+    from different requests don't queue up for the one shared sync thread.
+    """
+    return await sync_to_async(_in_worker, thread_sensitive=False)(function, args)
+
+
+async def run_queries(*calls):
+    """Results of ``(function, *args)`` calls, each run in its own thread"""
+    return await asyncio.gather(
+        *(run_in_worker(function, *args) for function, *args in calls)
+    )
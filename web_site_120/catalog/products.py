@@ -0,0 +1,65 @@
+"""
+Keeps catalog.Product in step with Tire and Disk.
+
+save() and delete() of a product are mirrored by post_save / post_delete
+receivers with one upsert or one delete. Bulk writers send
+catalog_bulk_changed, with ``pks`` when they know which rows they touched,
+and those rows (or the whole table) are synced in batches.
+"""
+
+from .models import Product
+from .routers import primary
+
+SHARED_FIELDS = [
+    "brand",
+    "model",
+    "article",
+    "price",
+    "quantity",
+    "image",
+    "slug",
+    "created_at",
+]
+
+
+def sync_products(model, pks=None, batch_size=2000):
+    """Upsert the Product rows of ``model`` (all or ``pks``), drop the orphans"""
+    kind = model._meta.model_name
+    rows = primary(model).order_by()
+    mirrored = Product.objects.filter(kind=kind)
+    if pks is not None:
+        pks = list(pks)
+        rows = rows.filter(pk__in=pks)
+        mirrored = mirrored.filter(object_id__in=pks)
+
+    batch = []
+    for values in rows.values("pk", *SHARED_FIELDS).iterator(chunk_size=batch_size):
+        batch.append(Product(kind=kind, object_id=values.pop("pk"), **values))
+        if len(batch) == batch_size:
+            _upsert(batch)
+            batch = []
+    if batch:
+        _upsert(batch)
+    mirrored.exclude(object_id__in=primary(model).values("pk")).delete()
+
+
+def _upsert(products):
+    Product.objects.bulk_create(
+        products,
+        update_conflicts=True,
+        unique_fields=["kind", "object_id"],
+        update_fields=SHARED_FIELDS,
+    )
+
+
+def on_save(sender, instance, **kwargs):
+    values = {field: getattr(instance, field) for field in SHARED_FIELDS}
+    _upsert([Product(kind=sender._meta.model_name, object_id=instance.pk, **values)])
+
+
+def on_delete(sender, instance, **kwargs):
+    Product.objects.filter(kind=sender._meta.model_name, object_id=instance.pk).delete()
+
+
+def on_bulk_change(sender, pks=None, **kwargs):
+    sync_products(sender, pks)
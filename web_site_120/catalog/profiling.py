@@ -0,0 +1,180 @@
+"""
+Where the time of a request goes.
+
+With REQUEST_PROFILING on, RequestProfileMiddleware (catalog.middleware)
+opens a RequestProfile per request and every query and template render of
+that request is added to it: from the request's thread and from the worker
+threads of the async views alike, which get a copy of the context and so
+the same profile. The middleware turns it into a Server-Timing header and a
+log line, logs queries repeated DUPLICATE_QUERY_THRESHOLD times or more (the
+N+1 pattern) and, for a SLOW_REQUEST_TRACE_RATE share of the requests slower
+than SLOW_REQUEST_MS, every query with its duration and parameters. The
+parameters of statements on SENSITIVE_TABLES (sessions, accounts, customer
+details) are left out, only their number is logged.
+
+The view time runs from the last process_view to the view's return, taken
+by ViewProfileMiddleware at the bottom of the stack, so it leaves out the
+other middleware.
+
+With it off the middleware isn't loaded, nothing is installed and a render
+costs one context variable lookup.
+"""
+
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+_current = ContextVar("request_profile", default=None)
+
+# Session data, password hashes, customer names and addresses
+SENSITIVE_TABLES = re.compile(
+    r'"(?:django_session|auth_user\w*|users_\w+|orders_order)"'
+)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_finished = None
+        self.finished = None
+        self.queries = []  # (sql, params, seconds, database alias)
+        self.template_time = 0.0
+        # Worker threads of an async view add to the same profile
+        self._lock = threading.Lock()
+
+    def add_query(self, sql, params, duration, alias):
+        with self._lock:
+            self.queries.append((sql, params, duration, alias))
+
+    def add_template(self, duration):
+        with self._lock:
+            self.template_time += duration
+
+    @property
+    def total_time(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def view_time(self):
+        if self.view_started is None:  # answered by a middleware
+            return 0.0
+        finished = self.view_finished or self.finished or time.perf_counter()
+        return finished - self.view_started
+
+    @property
+    def db_time(self):
+        return sum(duration for _, _, duration, _ in self.queries)
+
+    @property
+    def slowest(self):
+        """(sql, params, seconds, alias) of the slowest query, or None"""
+        return max(self.queries, key=lambda query: query[2], default=None)
+
+    def trace(self):
+        """Every query, without the parameters of SENSITIVE_TABLES statements"""
+        trace = []
+        for sql, params, duration, alias in self.queries:
+            query = {"sql": sql, "ms": round(duration * 1000, 2), "db": alias}
+            if SENSITIVE_TABLES.search(sql):
+                query["param_count"] = len(params or ())
+            else:
+                query["params"] = params
+            trace.append(query)
+        return trace
+
+    def duplicates(self, threshold):
+        """{sql: count} of the statements run ``threshold`` times or more"""
+        counts = Counter(sql for sql, _, _, _ in self.queries)
+        return {sql: count for sql, count in counts.items() if count >= threshold}
+
+    def server_timing(self):
+        """Server-Timing entries, durations in milliseconds"""
+        slowest = self.slowest
+        entries = [
+            f'db;dur={self.db_time * 1000:.2f};desc="{len(self.queries)} queries"',
+            f"db-slowest;dur={slowest[2] * 1000 if slowest else 0:.2f}",
+            f"template;dur={self.template_time * 1000:.2f}",
+            f"view;dur={self.view_time * 1000:.2f}",
+            f"total;dur={self.total_time * 1000:.2f}",
+        ]
+        return ", ".join(entries)
+
+
+@contextmanager
+def profile_request():
+    """Profile the queries and renders of the enclosed request"""
+    profile = RequestProfile()
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        profile.finished = time.perf_counter()
+        _current.reset(token)
+
+
+def view_started():
+    profile = _current.get()
+    if profile is not None:
+        profile.view_started = time.perf_counter()
+
+
+def view_finished():
+    profile = _current.get()
+    if profile is not None and profile.view_started is not None:
+        profile.view_finished = time.perf_counter()
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper timing the query into the current profile, if any"""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        profile.add_query(sql, params, duration, context["connection"].alias)
+
+
+def _add_wrapper(connection, **kwargs):
+    # Reconnecting sends connection_created again for the same wrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install():
+    """Time the queries of every connection, present and future, of any thread"""
+    connection_created.connect(_add_wrapper, dispatch_uid="catalog.profiling")
+    for connection in connections.all(initialized_only=True):
+        _add_wrapper(connection)
+
+
+class ProfiledTemplate(Template):
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.add_template(time.perf_counter() - started)
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    """The Django template backend, its renders timed into the request profile"""
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return ProfiledTemplate(super().get_template(template_name).template, self)
@@ -0,0 +1,111 @@
+"""
+Catalog reads from read replicas.
+
+Reads of tires, disks, categories and their Product mirror go to one of
+settings.REPLICA_DATABASES, everything else and every write to the primary.
+A replica may lag behind the primary, so reads go to the primary instead:
+
+* inside a transaction on the primary (checkout reads the rows it locked);
+* for the rest of a request that wrote catalog rows, and for REPLICA_LAG
+  seconds after it through a cookie (see catalog.middleware), so people see
+  their own changes;
+* while a replica can't be connected to, rechecked every RETRY_AFTER seconds.
+
+Code that keeps what it reads (caches, indexes) or writes based on it reads
+through primary(model) instead, inside a request or not.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+ROUTED_APPS = {"tires", "disks", "categories", "catalog"}
+RETRY_AFTER = 30
+CHECK_EVERY = 5  # seconds a replica that answered is trusted without a check
+
+# {"pinned": read from the primary, "wrote": a catalog write happened}, one
+# dict per request: worker threads get a copy of the context, not of the dict
+_state = ContextVar("replica_routing", default=None)
+
+
+@contextmanager
+def routing_scope(pinned=False):
+    """Fresh stickiness for a request (or a test), yields its state"""
+    state = {"pinned": pinned, "wrote": False}
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def pin_primary():
+    """Read the catalog from the primary for the rest of this scope"""
+    state = _state.get()
+    if state is not None:  # outside one nothing is pinned, see primary()
+        state["pinned"] = state["wrote"] = True
+
+
+def primary(model):
+    """Manager of ``model`` reading the primary, never a replica that may lag"""
+    return model._default_manager.db_manager(DEFAULT_DB_ALIAS)
+
+
+def primary_pinned():
+    state = _state.get()
+    return bool(state and state["pinned"])
+
+
+class ReplicaRouter:
+    def __init__(self, replicas=None):
+        self.replicas = list(
+            settings.REPLICA_DATABASES if replicas is None else replicas
+        )
+        self.down_until = {}  # alias -> monotonic time of the next try
+        self.up_until = {}  # alias -> monotonic time of the next check
+
+    def healthy(self, alias):
+        now = time.monotonic()
+        if self.up_until.get(alias, 0) > now:
+            return True
+        if self.down_until.get(alias, 0) > now:
+            return False
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            self.down_until[alias] = now + RETRY_AFTER
+            return False
+        self.up_until[alias] = now + CHECK_EVERY
+        return True
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APPS or not self.replicas:
+            return None
+        if primary_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        for alias in random.sample(self.replicas, len(self.replicas)):
+            if self.healthy(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APPS:
+            return None
+        pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *self.replicas}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in self.replicas:
+            return False  # they copy the primary's schema
+        return None
@@ -0,0 +1,204 @@
+"""
+Full-text search over brand, model and article of the catalog tables.
+
+SQLite uses an external-content FTS5 table (``<table>_fts``) kept in sync by
+triggers, PostgreSQL uses a GIN index over a ``tsvector`` expression. Any other
+backend, or SQLite built without FTS5, falls back to ``icontains`` lookups.
+Every path of full_text_search() annotates ``search_rank`` (higher is better)
+and orders by it.
+"""
+
+import heapq
+import re
+import time
+from itertools import islice
+
+from django.db import OperationalError, connections, models
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_migrate
+
+SEARCH_FIELDS = ("brand", "model", "article")
+
+# Tables known to have a working FTS5 index, per database alias
+_fts_tables = {}
+
+
+def _fts_table(table):
+    return f"{table}_fts"
+
+
+def _sqlite_statements(table):
+    fts = _fts_table(table)
+    columns = ", ".join(SEARCH_FIELDS)
+    new = ", ".join(f"new.{field}" for field in SEARCH_FIELDS)
+    old = ", ".join(f"old.{field}" for field in SEARCH_FIELDS)
+    insert = f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new});"
+    delete = (
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old});"
+    )
+    return {
+        fts: (
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({columns}, content='{table}', "
+            f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        ),
+        f"{fts}_ai": f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"{fts}_ad": f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        f"{fts}_au": (
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {columns} ON {table} "
+            f"BEGIN {delete} {insert} END"
+        ),
+    }
+
+
+def _postgres_vector(table=None):
+    prefix = f'"{table}".' if table else ""
+    columns = " || ' ' || ".join(
+        f"coalesce({prefix}\"{field}\", '')" for field in SEARCH_FIELDS
+    )
+    return f"to_tsvector('simple', {columns})"
+
+
+def install_search_index(connection, model):
+    """Create the search index of ``model`` if it (or part of it) is missing"""
+    table = model._meta.db_table
+    _fts_tables.pop((connection.alias, table), None)
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            # Rebuilding a table (ALTER TABLE on SQLite) drops its triggers,
+            # so this also runs after every migrate to put them back.
+            statements = _sqlite_statements(table)
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name IN (%s)"
+                % ", ".join("%s" for _ in statements),
+                list(statements),
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            if len(existing) == len(statements):
+                return
+            try:
+                for name, sql in statements.items():
+                    if name not in existing:
+                        cursor.execute(sql)
+            except OperationalError:
+                return  # SQLite without FTS5, search() uses icontains
+            fts = _fts_table(table)
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS "{table}_search_idx" '
+                f'ON "{table}" USING gin (({_postgres_vector()}))'
+            )
+
+
+def drop_search_index(connection, model):
+    table = model._meta.db_table
+    _fts_tables.pop((connection.alias, table), None)
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            for name in _sqlite_statements(table):
+                kind = "TABLE" if name == _fts_table(table) else "TRIGGER"
+                cursor.execute(f"DROP {kind} IF EXISTS {name}")
+        elif connection.vendor == "postgresql":
+            cursor.execute(f'DROP INDEX IF EXISTS "{table}_search_idx"')
+
+
+def keep_search_index(app_config, model):
+    """Re-check the search index of ``model`` after each migrate of its app"""
+
+    def ensure(sender, using, **kwargs):
+        install_search_index(connections[using], model)
+
+    post_migrate.connect(
+        ensure,
+        sender=app_config,
+        weak=False,
+        dispatch_uid=f"search:{model._meta.label}",
+    )
+
+
+def _has_fts(connection, table):
+    key = (connection.alias, table)
+    if key not in _fts_tables:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = %s", [_fts_table(table)]
+            )
+            _fts_tables[key] = cursor.fetchone() is not None
+    return _fts_tables[key]
+
+
+def full_text_search(queryset, query):
+    """Filter ``queryset`` to rows matching ``query``, best matches first"""
+    terms = re.findall(r"\w+", query)
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+
+    if terms and connection.vendor == "sqlite" and _has_fts(connection, table):
+        fts = _fts_table(table)
+        # Every word must match as a prefix: "mich pil" -> "mich"* "pil"*
+        match = " ".join(f'"{term}"*' for term in terms)
+        # A join, so the bm25 rank (lower is better) of each match is read
+        # once instead of re-running the MATCH per row
+        queryset = queryset.extra(
+            select={"search_rank": f"-{fts}.rank"},
+            tables=[fts],
+            where=[f'{fts}.rowid = "{table}"."id"', f"{fts} MATCH %s"],
+            params=[match],
+        )
+    elif terms and connection.vendor == "postgresql":
+        tsquery = " & ".join(f"'{term}':*" for term in terms)
+        vector = _postgres_vector(table)
+        queryset = queryset.filter(
+            RawSQL(
+                f"{vector} @@ to_tsquery('simple', %s)",
+                (tsquery,),
+                output_field=models.BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank({vector}, to_tsquery('simple', %s))",
+                (tsquery,),
+                output_field=models.FloatField(),
+            )
+        )
+    else:
+        lookups = models.Q()
+        for field in SEARCH_FIELDS:
+            lookups |= models.Q(**{f"{field}__icontains": query})
+        queryset = queryset.filter(lookups).annotate(
+            search_rank=models.Value(0.0, output_field=models.FloatField())
+        )
+    return queryset.order_by("-search_rank", "-created_at", "-id")
+
+
+def merge_ranked(searches, offset, limit, fields):
+    """
+    Rows ``offset`` to ``offset + limit`` of several searched querysets, merged
+    by rank as if they were one result set.
+
+    ``searches`` maps a kind ("tire") to a queryset from full_text_search().
+    Each one is already sorted by rank, so only its first ``offset + limit + 1``
+    rows can reach the page; they are read as dicts of ``fields`` and merged
+    lazily. Returns (rows, has_more, timings in ms per kind and for the merge).
+    """
+    needed = offset + limit + 1
+    sources = []
+    timings = {}
+    for kind, queryset in searches.items():
+        started = time.perf_counter()
+        rows = list(queryset.values(*fields, "search_rank")[:needed])
+        timings[kind] = (time.perf_counter() - started) * 1000
+        for row in rows:
+            row["kind"] = kind
+        sources.append(rows)
+
+    started = time.perf_counter()
+    # Same order as full_text_search(): rank, then newest, then id
+    merged = heapq.merge(
+        *sources,
+        key=lambda row: (row["search_rank"], row["created_at"], row["id"]),
+        reverse=True,
+    )
+    rows = list(islice(merged, offset, needed))
+    timings["merge"] = (time.perf_counter() - started) * 1000
+    return rows[:limit], len(rows) > limit, timings
@@ -0,0 +1,14 @@
+from django.dispatch import Signal
+
+# Sent after rows of a catalog model were written in bulk (bulk_create,
+# bulk_update, update()), which skips post_save/post_delete.
+# sender: the model class
+# pks: ids of the changed rows, if the sender knows them (optional)
+catalog_bulk_changed = Signal()
+
+# Sent after only the quantity of rows changed in bulk (checkout), with the
+# catalog.Product rows already updated. Only the caches that show the stock
+# listen to it.
+# sender: the model class
+# pks: ids of the changed rows
+catalog_stock_changed = Signal()
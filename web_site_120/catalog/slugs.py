@@ -0,0 +1,136 @@
+"""
+Unique slugs for products and categories.
+
+A slug is built from parts, most readable first: "michelin-pilot", then
+"michelin-pilot-205-55-r16", then "michelin-pilot-205-55-r16-a1234". All
+candidates are checked with one ``slug IN (...)`` query and the first free
+one wins. Only when every candidate is taken is a numeric suffix added,
+above the highest one in the candidate's index range. That is one query
+whatever the number of same-name rows, but the database still reads and
+sorts all "stem-N" rows to find the highest, so its work grows with them.
+``assign_unique_slugs`` runs it once per stem of a batch and numbers the
+batch's rows of that stem one after the other.
+
+Another writer can still take the chosen slug before the INSERT commits.
+``save_with_unique_slug`` runs the save in a savepoint and allocates again
+when the unique index rejects it.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Length
+from django.utils.text import slugify
+
+from .routers import primary
+
+
+def slug_candidates(parts, max_length=50):
+    """Slugs from the first part, then adding one part at a time"""
+    parts = [slugify(str(part)) for part in parts if part not in (None, "")]
+    parts = [part for part in parts if part] or ["item"]
+    return [
+        _join(parts[0], parts[1:index], max_length)
+        for index in range(1, len(parts) + 1)
+    ]
+
+
+def _join(head, tail, max_length):
+    """head-tail..., cutting ``head`` so the suffixes survive ``max_length``"""
+    suffix = "".join(f"-{part}" for part in tail)
+    head = head[: max(max_length - len(suffix), 1)].strip("-") or head[:1]
+    return f"{head}{suffix}"[:max_length]
+
+
+def unique_slug(model, parts, exclude_pk=None, reserved=()):
+    """First free slug for ``parts``, or the last candidate numbered"""
+    max_length = model._meta.get_field("slug").max_length
+    candidates = slug_candidates(parts, max_length)
+    rows = primary(model).filter(slug__in=candidates)
+    if exclude_pk is not None:
+        rows = rows.exclude(pk=exclude_pk)
+    taken = set(rows.values_list("slug", flat=True)) | set(reserved)
+    for candidate in candidates:
+        if candidate not in taken:
+            return candidate
+    return _numbered(model, candidates[-1], max_length, exclude_pk, reserved)
+
+
+def _numbered(model, stem, max_length, exclude_pk=None, reserved=()):
+    """``stem-N`` with N above every number already used"""
+    number = _top_number(model, stem, exclude_pk) + 1
+    while True:
+        slug = _join(stem, [str(number)], max_length)
+        if slug not in reserved:
+            return slug
+        number += 1
+
+
+def _top_number(model, stem, exclude_pk=None):
+    """Highest N of the stored ``stem-N`` slugs, 1 if there is none"""
+    # "stem-" < every "stem-..." < "stem.", a range the slug index can seek
+    rows = primary(model).filter(slug__gt=f"{stem}-", slug__lt=f"{stem}.")
+    if exclude_pk is not None:
+        rows = rows.exclude(pk=exclude_pk)
+    # Longer numbers are larger, so the longest-then-greatest slug has the top
+    # one. Non-numeric "stem-..." slugs are skipped here rather than with a
+    # regex, which SQLite would call back into Python for on every row.
+    ordered = (
+        rows.annotate(slug_length=Length("slug"))
+        .order_by("-slug_length", "-slug")
+        .values_list("slug", flat=True)
+    )
+    for slug in ordered.iterator(chunk_size=20):
+        suffix = slug[len(stem) + 1 :]
+        if suffix.isdigit() and suffix.isascii():
+            return int(suffix)
+    return 1
+
+
+def save_with_unique_slug(instance, parts, save, *args, attempts=5, **kwargs):
+    """Call ``save`` with a fresh unique slug, again if a concurrent insert took it"""
+    model = type(instance)
+    for attempt in range(attempts):
+        instance.slug = unique_slug(model, parts, exclude_pk=instance.pk)
+        try:
+            with transaction.atomic():
+                save(*args, **kwargs)
+            return
+        except IntegrityError:
+            # A duplicate article and the like are not ours to retry
+            taken = primary(model).filter(slug=instance.slug)
+            if attempt == attempts - 1 or not taken.exclude(pk=instance.pk).exists():
+                instance.slug = ""
+                raise
+
+
+def assign_unique_slugs(model, instances, parts):
+    """
+    Give every instance without a slug a unique one, for bulk_create.
+
+    ``parts(instance)`` returns the slug parts. All candidates of the batch
+    are checked in one query, and slugs handed out earlier in the batch are
+    treated as taken. Numbered slugs cost one more query per stem.
+    """
+    max_length = model._meta.get_field("slug").max_length
+    pending = [
+        (instance, slug_candidates(parts(instance), max_length))
+        for instance in instances
+        if not instance.slug
+    ]
+    wanted = {candidate for _, candidates in pending for candidate in candidates}
+    taken = set(primary(model).filter(slug__in=wanted).values_list("slug", flat=True))
+    numbers = {}  # stem -> last number handed out
+    for instance, candidates in pending:
+        free = [candidate for candidate in candidates if candidate not in taken]
+        if free:
+            instance.slug = free[0]
+        else:
+            stem = candidates[-1]
+            number = numbers.get(stem) or _top_number(model, stem)
+            slug = ""
+            while not slug or slug in taken:
+                number += 1
+                slug = _join(stem, [str(number)], max_length)
+            numbers[stem] = number
+            instance.slug = slug
+        taken.add(instance.slug)
+    return instances
@@ -0,0 +1,128 @@
+"""
+Price and stock updates from suppliers.
+
+Deltas are (article, price, quantity) triples for existing tires or disks.
+Each batch reads the current values of its articles in one query per model
+and writes only the rows that actually changed with one bulk_update, so
+cache invalidation follows real changes instead of the feed size.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+
+from disks.models import Disk
+from tires.models import Tire
+from .routers import primary
+from .signals import catalog_bulk_changed
+
+SYNC_MODELS = [Tire, Disk]
+
+
+class StockSync:
+    """Applies price/quantity deltas in batches of ``batch_size`` articles"""
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.received = 0
+        self.updated = {model: 0 for model in SYNC_MODELS}
+        self.changed_pks = {model: [] for model in SYNC_MODELS}
+        # First max_reported articles found in neither catalog / not readable
+        self.unknown = []
+        self.invalid = []
+        self.unknown_count = self.invalid_count = 0
+        self.max_reported = 100
+
+    def run(self, rows):
+        """Apply ``rows``, dicts with "article" and "price" and/or "quantity" """
+        batch = {}
+        for row in rows:
+            self.received += 1
+            try:
+                article, price, quantity = self.parse(row)
+            except (KeyError, ValueError, TypeError, InvalidOperation) as error:
+                self.invalid_count += 1
+                if len(self.invalid) < self.max_reported:
+                    self.invalid.append((row.get("article"), str(error)))
+                continue
+            batch[article] = (price, quantity)
+            if len(batch) >= self.batch_size:
+                self.apply(batch)
+                batch = {}
+        if batch:
+            self.apply(batch)
+
+        for model, pks in self.changed_pks.items():
+            if pks:
+                catalog_bulk_changed.send(sender=model, pks=pks)
+        return self
+
+    @property
+    def updated_total(self):
+        return sum(self.updated.values())
+
+    def parse(self, row):
+        article = str(row["article"]).strip()
+        if not article:
+            raise ValueError("empty article")
+        price = row.get("price")
+        quantity = row.get("quantity")
+        price = (
+            None
+            if price in (None, "")
+            else Decimal(str(price)).quantize(Decimal("0.01"))
+        )
+        quantity = None if quantity in (None, "") else int(quantity)
+        if price is None and quantity is None:
+            raise ValueError("neither price nor quantity given")
+        return article, price, quantity
+
+    def apply(self, batch):
+        """Write the changed rows of one batch, one read and one write per model"""
+        remaining = set(batch)
+        for model in SYNC_MODELS:
+            current = (
+                primary(model)
+                .filter(article__in=remaining)
+                .order_by()
+                .values_list("id", "article", "price", "quantity")
+            )
+            changed = []
+            # bulk_update skips auto_now, the feeds need updated_at to move
+            now = timezone.now()
+            for pk, article, price, quantity in current:
+                remaining.discard(article)
+                new_price, new_quantity = batch[article]
+                new_price = price if new_price is None else new_price
+                new_quantity = quantity if new_quantity is None else new_quantity
+                if (new_price, new_quantity) != (price, quantity):
+                    changed.append(
+                        model(
+                            id=pk,
+                            price=new_price,
+                            quantity=new_quantity,
+                            updated_at=now,
+                        )
+                    )
+            if changed:
+                model.objects.bulk_update(changed, ["price", "quantity", "updated_at"])
+                self.updated[model] += len(changed)
+                self.changed_pks[model] += [product.pk for product in changed]
+            if not remaining:
+                break
+        self.unknown_count += len(remaining)
+        room = self.max_reported - len(self.unknown)
+        self.unknown.extend(sorted(remaining)[:room])
+
+    def summary(self):
+        return {
+            "received": self.received,
+            "updated": {
+                model._meta.verbose_name_plural.lower(): count
+                for model, count in self.updated.items()
+            },
+            "unknown": self.unknown_count,
+            "invalid": self.invalid_count,
+            "unknown_articles": self.unknown,
+            "invalid_rows": self.invalid,
+        }
@@ -0,0 +1,38 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from catalog.thumbnails import SIZES, thumbnail_name, thumbnails_ready
+
+register = template.Library()
+
+
+def _url(image, size, extension):
+    if not image:
+        return ""
+    if size not in SIZES:
+        raise template.TemplateSyntaxError(f"Unknown thumbnail size {size!r}")
+    # Made in the background after the upload, the original until then
+    if thumbnails_ready(image.name):
+        return default_storage.url(thumbnail_name(image.name, size, extension))
+    return image.url
+
+
+@register.simple_tag
+def thumbnail(image, size="medium", extension="jpg"):
+    """URL of a thumbnail: {% thumbnail tire.image "small" "webp" %}"""
+    return _url(image, size, extension)
+
+
+@register.simple_tag
+def picture(image, size="medium", alt=""):
+    """<picture> with the WebP thumbnail and a JPEG fallback"""
+    if not image:
+        return ""
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp">'
+        '<img src="{}" alt="{}" loading="lazy"></picture>',
+        _url(image, size, "webp"),
+        _url(image, size, "jpg"),
+        alt,
+    )
@@ -0,0 +1,1154 @@
+import base64
+import csv
+import json
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections, router, transaction
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from categories.models import Category
+from catalog.signals import catalog_bulk_changed
+from catalog.sync import StockSync
+from catalog.autocomplete import product_index
+from catalog.feeds import FEED_MODELS, feed_items
+from catalog.caching import bump_catalog_version, cache_catalog_page, catalog_version
+from catalog.middleware import PRIMARY_COOKIE
+from catalog.models import Product
+from catalog.routers import primary, routing_scope
+from catalog.pagination import KeysetPaginator
+from catalog import thumbnails
+from catalog.thumbnails import make_thumbnails, thumbnail_name, variant_names
+from catalog.slugs import assign_unique_slugs, slug_candidates, unique_slug
+from disks.facets import disk_facets
+from tires.facets import tire_facets
+from disks.models import Disk
+from PIL import Image
+from tires.models import Tire
+
+
+def make_tire(category, article, **fields):
+    values = {
+        "brand": "Michelin",
+        "model": "Pilot",
+        "width": 205,
+        "profile": 55,
+        "diameter": 16,
+        "tire_type": "passenger",
+        "season": "summer",
+        "load_index": 91,
+        "speed_index": "V",
+        "price": Decimal("2500.00"),
+        "quantity": 4,
+        "image": "tire_images/test.jpg",
+        "description": "",
+    }
+    values.update(fields)
+    return Tire.objects.create(category=category, article=article, **values)
+
+
+def make_disk(category, article, **fields):
+    values = {
+        "brand": "BBS",
+        "model": "CH-R",
+        "diameter": 18,
+        "width": 8,
+        "pcd": "5X112",
+        "dia": Decimal("57.1"),
+        "price": Decimal("9000.00"),
+        "quantity": 4,
+        "image": "disk_images/test.jpg",
+        "description": "",
+    }
+    values.update(fields)
+    return Disk.objects.create(category=category, article=article, **values)
+
+
+class ChangelistQueriesMixin:
+    """Asserts an admin changelist costs the same queries for 2 rows and 20"""
+
+    def assertChangelistQueries(self, model, add_rows):
+        admin = get_user_model().objects.create_superuser("admin", "", "admin")
+        self.client.force_login(admin)
+        opts = model._meta
+        url = reverse(f"admin:{opts.app_label}_{opts.model_name}_changelist")
+
+        self.client.get(url)  # fills the per-process caches (content types, ...)
+        counts = []
+        total = 0
+        for rows in (2, 18):
+            add_rows(rows)
+            total += rows
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["cl"].result_count, total)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1], f"{opts.label} changelist is N+1")
+
+
+class FacetSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Tires", description="")
+
+    def test_warm_cache_needs_no_queries(self):
+        make_tire(self.category, "A1")
+        tire_facets.get()
+        with self.assertNumQueries(0):
+            summary = tire_facets.get()
+        self.assertEqual(summary["brand"], ["Michelin"])
+
+    def test_created_rows_with_known_values_keep_the_summary(self):
+        make_tire(self.category, "A1", price=Decimal("100"))
+        make_tire(self.category, "A2", price=Decimal("300"))
+        tire_facets.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_tire(self.category, "A3", price=Decimal("200"))
+        with self.assertNumQueries(0):
+            tire_facets.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_tire(self.category, "A4", brand="Continental", diameter=15, price=50)
+        summary = tire_facets.get()
+        self.assertEqual(summary["brand"], ["Continental", "Michelin"])
+        self.assertEqual(summary["diameter"], [15, 16])
+        self.assertEqual(summary["min_price"], 50)
+        self.assertEqual(summary["max_price"], 300)
+
+    def test_rolled_back_rows_leave_the_summary(self):
+        make_tire(self.category, "A1")
+        tire_facets.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                make_tire(self.category, "A2", brand="Nokian")
+                transaction.set_rollback(True)
+        with self.assertNumQueries(0):
+            self.assertEqual(tire_facets.get()["brand"], ["Michelin"])
+
+    def test_summary_read_before_a_change_is_not_kept(self):
+        make_tire(self.category, "A1")
+        key = tire_facets.cache_key
+        with self.captureOnCommitCallbacks(execute=True):
+            make_tire(self.category, "A2", brand="Nokian")
+        # A request that read the rows before the commit stores it late
+        tire_facets.refresh(key)
+        self.assertEqual(tire_facets.get()["brand"], ["Michelin", "Nokian"])
+
+    def test_edits_and_deletes_rebuild(self):
+        tire = make_tire(self.category, "A1")
+        other = make_tire(self.category, "A2", brand="Nokian")
+        tire_facets.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(tire_facets.get()["brand"], ["Michelin"])
+        tire.price = Decimal("10")
+        with self.captureOnCommitCallbacks(execute=True):
+            tire.save()
+        self.assertEqual(tire_facets.get()["max_price"], Decimal("10"))
+
+    def test_warm_facets_command(self):
+        make_tire(self.category, "A1")
+        call_command("warm_facets", stdout=StringIO())
+        self.assertIsNotNone(cache.get(tire_facets.cache_key))
+        self.assertEqual(cache.get(disk_facets.cache_key)["brand"], [])
+
+
+class FacetCountsTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tires", description="")
+        make_tire(category, "A1", brand="Michelin", season="summer", diameter=16)
+        make_tire(category, "A2", brand="Michelin", model="X", season="winter")
+        make_tire(category, "A3", brand="Nokian", season="winter", diameter=17)
+
+    def test_one_query(self):
+        with self.assertNumQueries(1):
+            Tire.objects.facet_counts(season="winter")
+
+    def test_each_facet_ignores_its_own_filter(self):
+        counts = Tire.objects.facet_counts(brand="Michelin", diameter="16")
+        self.assertEqual(counts["brand"], {"Michelin": 2})
+        self.assertEqual(counts["season"], {"summer": 1, "winter": 1})
+        self.assertEqual(counts["diameter"], {16: 2})
+
+    def test_respects_queryset_filters(self):
+        counts = Tire.objects.filter(season="winter").facet_counts()
+        self.assertEqual(counts["brand"], {"Michelin": 1, "Nokian": 1})
+
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tires", description="")
+        self.pilot = make_tire(category, "MP-100", model="Pilot Sport")
+        self.alpin = make_tire(category, "MA-200", model="Alpin")
+        self.hakka = make_tire(
+            category, "NH-300", brand="Nokian", model="Hakkapeliitta"
+        )
+
+    def test_prefix_words_match(self):
+        self.assertEqual(list(Tire.objects.search("mich pil")), [self.pilot])
+        self.assertEqual(list(Tire.objects.search("hakka")), [self.hakka])
+        self.assertEqual(list(Tire.objects.search("MA-200")), [self.alpin])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.alpin.model = "CrossClimate"
+        self.alpin.save()
+        self.assertEqual(list(Tire.objects.search("alpin")), [])
+        self.assertEqual(list(Tire.objects.search("cross")), [self.alpin])
+        self.hakka.delete()
+        self.assertEqual(list(Tire.objects.search("nokian")), [])
+
+    def test_results_are_ranked(self):
+        results = Tire.objects.search("michelin pilot")
+        self.assertTrue(all(hasattr(tire, "search_rank") for tire in results))
+
+    def test_facet_counts_of_results(self):
+        counts = Tire.objects.search("michelin").facet_counts()
+        self.assertEqual(counts["brand"], {"Michelin": 2})
+
+
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tires", description="")
+        for i in range(7):
+            # Repeated prices make the id tiebreaker matter
+            make_tire(category, f"A{i}", model=f"M{i}", price=100 + i // 3)
+
+    def walk(self, ordering):
+        paginator = KeysetPaginator(Tire.objects.all(), 3, ordering)
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        return paginator, pages
+
+    def test_pages_cover_the_ordering(self):
+        for ordering in KeysetPaginator.orderings:
+            _, pages = self.walk(ordering)
+            ids = [tire.id for page in pages for tire in page]
+            tiebreaker = "-id" if ordering.startswith("-") else "id"
+            expected = Tire.objects.order_by(ordering, tiebreaker)
+            expected = list(expected.values_list("id", flat=True))
+            self.assertEqual(ids, expected, ordering)
+
+    def test_previous_cursor_returns_the_same_page(self):
+        paginator, pages = self.walk("price")
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous())
+        back = paginator.get_page(pages[2].previous_cursor)
+        self.assertEqual(list(back), list(pages[1]))
+        back = paginator.get_page(back.previous_cursor)
+        self.assertEqual(list(back), list(pages[0]))
+        self.assertFalse(back.has_previous())
+
+    def test_deep_page_is_one_query(self):
+        paginator, pages = self.walk("-created_at")
+        with self.assertNumQueries(1):
+            paginator.get_page(pages[-1].previous_cursor)
+
+    def test_bad_cursor_gives_first_page(self):
+        paginator = KeysetPaginator(Tire.objects.all(), 3, "brand")
+        self.assertEqual(len(paginator.get_page("not-a-cursor")), 3)
+        for ordering in ("-created_at", "price"):
+            paginator = KeysetPaginator(Tire.objects.all(), 3, ordering)
+            for value in ("abc", None, [1]):
+                data = {"value": value, "id": 1, "direction": "next", "number": 2}
+                cursor = base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+                page = paginator.get_page(cursor)
+                self.assertEqual((len(page), page.has_previous()), (3, False))
+        self.assertEqual(paginator.count, 7)
+
+
+class QueryPlanTests(TestCase):
+    def test_catalog_queries_use_indexes(self):
+        # Raises CommandError listing the plans that scan more than they need
+        call_command("explain_catalog_queries", stdout=StringIO())
+
+
+class CatalogPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Tires", description="")
+        self.calls = 0
+
+        @cache_catalog_page
+        def view(request):
+            self.calls += 1
+            return HttpResponse(f"{Tire.objects.count()} tires")
+
+        self.view = view
+        self.factory = RequestFactory()
+
+    def test_repeat_requests_are_served_from_cache(self):
+        self.view(self.factory.get("/", {"b": "2", "a": "1"}))
+        response = self.view(self.factory.get("/", {"a": "1", "b": "2"}))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(response.content, b"0 tires")
+        self.view(self.factory.get("/", {"a": "2"}))
+        self.assertEqual(self.calls, 2)
+
+    def test_catalog_edits_invalidate(self):
+        version = catalog_version()
+        self.view(self.factory.get("/"))
+        make_tire(self.category, "A1")
+        self.assertGreater(catalog_version(), version)
+        response = self.view(self.factory.get("/"))
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(response.content, b"1 tires")
+
+    def test_conditional_requests(self):
+        response = self.view(self.factory.get("/"))
+        etag = response["ETag"]
+        response = self.view(self.factory.get("/", HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        response = self.view(
+            self.factory.get("/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        )
+        self.assertEqual(response.status_code, 304)
+        self.category.save()
+        response = self.view(self.factory.get("/", HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Vary"], "Cookie")
+
+    def test_only_ok_pages_get_validators(self):
+        @cache_catalog_page
+        def missing(request):
+            return HttpResponse(status=404)
+
+        response = missing(self.factory.get("/gone/"))
+        self.assertNotIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+
+    def test_visitors_with_cookies_get_their_own_page(self):
+        self.view(self.factory.get("/"))
+        for cookie in (settings.SESSION_COOKIE_NAME, settings.CSRF_COOKIE_NAME):
+            self.factory.cookies[cookie] = "x"
+            response = self.view(self.factory.get("/"))
+            self.assertNotIn("ETag", response)
+            self.assertEqual(response["Vary"], "Cookie")
+            del self.factory.cookies[cookie]
+        self.assertEqual(self.calls, 3)
+
+
+class ImportCatalogTests(TestCase):
+    header = "brand,model,width,profile,diameter,tire_type,season,load_index,speed_index,price,article,quantity\n"
+
+    def setUp(self):
+        cache.clear()
+        Category.objects.create(name="Tires", description="")
+
+    def import_csv(self, body, **options):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as file:
+            file.write(self.header + body)
+        self.addCleanup(os.remove, file.name)
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            "import_catalog",
+            file.name,
+            type="tires",
+            category="tires",
+            stdout=stdout,
+            stderr=stderr,
+            **options,
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_inserts_then_updates_by_article(self):
+        self.import_csv(
+            "Michelin,Pilot,205,55,16,passenger,summer,91,V,2500,A1,4\n"
+            "Michelin,Pilot,225,45,17,passenger,summer,94,W,3100,A2,2\n"
+        )
+        first = Tire.objects.get(article="A1")
+        self.assertEqual(first.size_key, "205/55R16")
+        self.assertEqual(first.slug, "michelin-pilot")
+        second = Tire.objects.get(article="A2")
+        self.assertEqual(second.slug, "michelin-pilot-225-45-r17")
+
+        tire_facets.get()
+        version = catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_csv(
+                "Michelin,Pilot,205,55,16,passenger,summer,91,V,1999,A1,0\n"
+            )
+        updated = Tire.objects.get(article="A1")
+        self.assertEqual(updated.price, Decimal("1999"))
+        self.assertEqual(updated.quantity, 0)
+        self.assertEqual(updated.created_at, first.created_at)
+        self.assertGreater(updated.updated_at, first.updated_at)
+        self.assertEqual(Tire.objects.count(), 2)
+        # bulk writes skip post_save, the import announces them instead
+        self.assertIsNone(cache.get(tire_facets.cache_key))
+        self.assertGreater(catalog_version(), version)
+
+    def test_existing_rows_keep_the_columns_missing_from_the_file(self):
+        self.import_csv("Michelin,Pilot,205,55,16,passenger,summer,91,V,2500,A1,4\n")
+        Tire.objects.update(image="tire_images/a1.jpg", description="Quiet")
+        # No image and description columns
+        self.import_csv("Michelin,Pilot,205,55,16,passenger,summer,91,V,1999,A1,0\n")
+        tire = Tire.objects.get()
+        self.assertEqual((tire.price, tire.quantity), (Decimal("1999"), 0))
+        self.assertEqual(tire.image, "tire_images/a1.jpg")
+        self.assertEqual(tire.description, "Quiet")
+
+    def test_reimports_allocate_no_slugs(self):
+        rows = "".join(
+            f"Michelin,Pilot,205,55,16,passenger,summer,91,V,2500,A{i},4\n"
+            for i in range(30)
+        )
+        self.import_csv(rows)
+        slugs = dict(Tire.objects.values_list("article", "slug"))
+        queries = []
+        for body in (rows[: rows.index("\n") + 1], rows):
+            with CaptureQueriesContext(connection) as captured:
+                self.import_csv(body)
+            queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])  # the same for 1 and 30 rows
+        self.assertEqual(dict(Tire.objects.values_list("article", "slug")), slugs)
+
+    def test_bad_choices_are_row_errors(self):
+        out, err = self.import_csv(
+            "Michelin,Pilot,205,55,16,passenger,monsoon,91,V,2500,A1,4\n"
+        )
+        self.assertIn("line 2", err)
+        self.assertIn("monsoon", err)
+        self.assertIn("Imported 0 of 1 rows", out)
+        self.assertFalse(Tire.objects.exists())
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        out, err = self.import_csv(
+            "Michelin,Pilot,wide,55,16,passenger,summer,91,V,2500,A1,4\n"
+            "Michelin,Pilot,205,55,16,passenger,summer,91,V,2500,A2,4\n",
+            batch_size=1,
+        )
+        self.assertIn("line 2", err)
+        self.assertIn("Imported 1 of 2 rows", out)
+        self.assertEqual(list(Tire.objects.values_list("article", flat=True)), ["A2"])
+
+
+@override_settings(CATALOG_SYNC_TOKEN="secret")
+class StockSyncTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tires", description="")
+        self.tire = make_tire(category, "T1", price=Decimal("100.00"), quantity=4)
+        self.disk = make_disk(category, "D1", price=Decimal("900.00"), quantity=2)
+        self.url = reverse("stock_sync")
+
+    def post(self, items, token="secret"):
+        return self.client.post(
+            self.url,
+            {"items": items},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+
+    def test_requires_token(self):
+        self.assertEqual(self.post([], token="wrong").status_code, 401)
+        with override_settings(CATALOG_SYNC_TOKEN=""):
+            self.assertEqual(self.post([], token="").status_code, 401)
+
+    def test_only_changed_rows_are_written(self):
+        items = [
+            {"article": "T1", "price": "100.00", "quantity": 4},  # unchanged
+            {"article": "D1", "quantity": 0},
+            {"article": "X9", "price": 5},
+            {"article": "T1", "price": "abc"},
+        ]
+        # read tires, read disks, write disks, then mirror the one disk into
+        # Product: read it, upsert, look for orphans
+        with self.assertNumQueries(6):
+            response = self.post(items)
+        data = response.json()
+        self.assertEqual(data["updated"], {"tires": 0, "disks": 1})
+        self.assertEqual(data["unknown_articles"], ["X9"])
+        self.assertEqual(data["invalid"], 1)
+        self.disk.refresh_from_db()
+        self.assertEqual((self.disk.price, self.disk.quantity), (Decimal("900"), 0))
+
+    def test_sync_stock_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as file:
+            file.write("article,price,quantity\nT1,120.50,3\n")
+        self.addCleanup(os.remove, file.name)
+        out = StringIO()
+        call_command("sync_stock", file.name, stdout=out)
+        self.assertIn("1 changed", out.getvalue())
+        self.tire.refresh_from_db()
+        self.assertEqual((self.tire.price, self.tire.quantity), (Decimal("120.50"), 3))
+
+
+class UniqueSlugTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Tires", description="")
+
+    def test_same_name_products_get_their_size_then_article(self):
+        first = make_tire(self.category, "A1")
+        other_size = make_tire(self.category, "A2", diameter=17)
+        same_size = make_tire(self.category, "A3")
+        again = make_tire(self.category, "A4")
+        self.assertEqual(first.slug, "michelin-pilot")
+        self.assertEqual(other_size.slug, "michelin-pilot-205-55-r17")
+        self.assertEqual(same_size.slug, "michelin-pilot-205-55-r16")
+        self.assertEqual(again.slug, "michelin-pilot-205-55-r16-a4")
+
+    def test_one_query_per_allocation(self):
+        for article in ("A1", "A2", "A3"):
+            make_tire(self.category, article)
+        with self.assertNumQueries(1):
+            slug = unique_slug(Tire, ["Michelin Pilot", "205-55-r16", "A4"])
+        self.assertEqual(slug, "michelin-pilot-205-55-r16-a4")
+
+    def test_numbers_when_every_candidate_is_taken(self):
+        names = [Category.objects.create(name="Шини", description="") for _ in range(3)]
+        self.assertEqual([c.slug for c in names], ["item", "item-2", "item-3"])
+        Category.objects.create(name="Winter", description="", slug="winter-9")
+        Category.objects.create(name="Winter", description="", slug="winter")
+        self.assertEqual(unique_slug(Category, ["Winter"]), "winter-10")
+
+    def test_long_names_keep_their_suffixes(self):
+        candidates = slug_candidates(["x" * 80, "205-55-r16", "A1"], max_length=50)
+        self.assertTrue(all(len(slug) <= 50 for slug in candidates))
+        self.assertTrue(candidates[-1].endswith("-205-55-r16-a1"))
+
+    def test_retries_when_a_concurrent_insert_took_the_slug(self):
+        make_tire(self.category, "A1")
+        # The first lookup ran before the other writer committed "michelin-pilot"
+        stale = mock.Mock(side_effect=["michelin-pilot", "michelin-pilot-x"])
+        with mock.patch("catalog.slugs.unique_slug", stale):
+            tire = make_tire(self.category, "A2")
+        self.assertEqual(tire.slug, "michelin-pilot-x")
+        self.assertEqual(stale.call_count, 2)
+
+    def test_other_integrity_errors_are_raised(self):
+        make_tire(self.category, "A1")
+        with self.assertRaises(IntegrityError):
+            make_tire(self.category, "A1", model="Alpin")
+
+    def test_bulk_assignment_checks_the_batch_once(self):
+        make_tire(self.category, "A1")
+        batch = [
+            Tire(
+                brand="Michelin",
+                model="Pilot",
+                width=205,
+                profile=55,
+                diameter=16,
+                article=article,
+            )
+            for article in ("A2", "A3")
+        ]
+        with self.assertNumQueries(1):
+            assign_unique_slugs(Tire, batch, Tire.slug_parts)
+        self.assertEqual(
+            [tire.slug for tire in batch],
+            ["michelin-pilot-205-55-r16", "michelin-pilot-205-55-r16-a3"],
+        )
+
+    def test_bulk_numbering_looks_up_each_stem_once(self):
+        for article in ("A1", "A2", "A3"):
+            make_tire(self.category, article)
+        # Every candidate of A3 is taken
+        batch = [
+            Tire(
+                brand="Michelin",
+                model="Pilot",
+                width=205,
+                profile=55,
+                diameter=16,
+                article="A3",
+            )
+            for _ in range(3)
+        ]
+        with self.assertNumQueries(2):  # the candidates, the top number
+            assign_unique_slugs(Tire, batch, Tire.slug_parts)
+        self.assertEqual(
+            [tire.slug for tire in batch],
+            [f"michelin-pilot-205-55-r16-a3-{number}" for number in (2, 3, 4)],
+        )
+
+
+class ProductTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Tires", description="")
+
+    def test_saves_and_deletes_are_mirrored(self):
+        tire = make_tire(self.category, "T1")
+        disk = make_disk(self.category, "D1")
+        self.assertEqual(
+            list(Product.objects.order_by("id").values_list("kind", "object_id")),
+            [("tire", tire.pk), ("disk", disk.pk)],
+        )
+        tire.price = Decimal("1999.00")
+        tire.save()
+        product = Product.objects.get(kind="tire")
+        self.assertEqual(product.price, Decimal("1999.00"))
+        self.assertEqual(product.slug, tire.slug)
+        self.assertEqual(product.get_absolute_url(), f"/tires/{tire.slug}/")
+
+        disk.delete()
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_bulk_writers_resync(self):
+        tire = make_tire(self.category, "T1", quantity=4)
+        Tire.objects.filter(pk=tire.pk).update(quantity=0)
+        Product.objects.create(
+            kind="disk",
+            object_id=999,
+            brand="Gone",
+            model="Gone",
+            article="X",
+            price=1,
+            quantity=1,
+            slug="gone",
+            created_at=tire.created_at,
+        )
+        catalog_bulk_changed.send(sender=Tire, pks=[tire.pk])
+        catalog_bulk_changed.send(sender=Disk)
+        self.assertEqual(
+            list(Product.objects.values_list("article", "quantity")), [("T1", 0)]
+        )
+
+    def test_sync_stock_updates_products(self):
+        make_tire(self.category, "T1", quantity=4)
+        StockSync().run([{"article": "T1", "quantity": 1}])
+        self.assertEqual(Product.objects.get(article="T1").quantity, 1)
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        product_index.index = None  # rows of other tests are rolled back
+        self.category = Category.objects.create(name="Tires", description="")
+        self.tire = make_tire(self.category, "MX-100", model="Pilot Sport")
+        self.disk = make_disk(self.category, "BB-7")
+
+    def suggest(self, query, **params):
+        response = self.client.get(reverse("autocomplete"), {"q": query, **params})
+        return [item["label"] for item in response.json()["suggestions"]]
+
+    def test_prefixes_of_words_model_and_article(self):
+        self.assertEqual(self.suggest("mich"), ["Michelin Pilot Sport"])
+        self.assertEqual(self.suggest("pilot sp"), ["Michelin Pilot Sport"])
+        self.assertEqual(self.suggest("MICHELIN  pilot"), ["Michelin Pilot Sport"])
+        self.assertEqual(self.suggest("bb-"), ["BBS CH-R"])
+        self.assertEqual(self.suggest("nokian"), [])
+        self.assertEqual(self.suggest("b", kind="tire"), [])
+
+    def test_no_queries_once_built(self):
+        self.suggest("mich")
+        with self.assertNumQueries(0):
+            self.suggest("pil")
+            self.suggest("bbs")
+
+    def test_signals_patch_the_index(self):
+        self.suggest("x")
+        with self.captureOnCommitCallbacks(execute=True):
+            make_tire(self.category, "N1", brand="Nokian", model="Hakka")
+            self.tire.brand = "Goodyear"
+            self.tire.save()
+            self.disk.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest("nok"), ["Nokian Hakka"])
+            self.assertEqual(self.suggest("mich"), [])
+            self.assertEqual(self.suggest("good"), ["Goodyear Pilot Sport"])
+            self.assertEqual(self.suggest("bbs"), [])
+
+    def test_saves_that_keep_the_keys_leave_the_index(self):
+        self.suggest("x")
+        index = product_index.index
+        with mock.patch.object(product_index, "update") as update:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.tire.quantity = 1
+                self.tire.save(update_fields=["quantity"])
+        update.assert_not_called()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tire.price = Decimal("1.00")
+            self.tire.save()
+        self.assertIs(product_index.index, index)
+
+    def test_bulk_changes_patch_once(self):
+        self.suggest("x")
+        tires = [make_tire(self.category, f"N{i}", brand="Nokian") for i in range(3)]
+        Tire.objects.filter(brand="Nokian").update(brand="Kumho")
+        with mock.patch.object(
+            product_index, "_patched", wraps=product_index._patched
+        ) as patched:
+            product_index.update("tire", [tire.pk for tire in tires])
+        patched.assert_called_once()
+        self.assertEqual(len(self.suggest("kum")), 3)
+        self.assertEqual(self.suggest("nok"), [])
+
+    def test_rolled_back_saves_leave_no_entry(self):
+        self.suggest("x")
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                make_tire(self.category, "N1", brand="Nokian")
+                transaction.set_rollback(True)
+        self.assertEqual(self.suggest("nok"), [])
+
+    def test_other_processes_changes_trigger_a_rebuild(self):
+        self.suggest("mich")
+        # A write elsewhere: the version moved without our signals
+        Tire.objects.filter(pk=self.tire.pk).update(brand="Kumho")
+        bump_catalog_version()
+        product_index.checked_at = 0
+        with mock.patch.object(product_index, "rebuild_later") as rebuild_later:
+            # The old index answers, the rebuild happens off the request
+            self.assertEqual(self.suggest("mich"), ["Michelin Pilot Sport"])
+        rebuild_later.assert_called_once_with()
+        product_index.build()
+        self.assertEqual(self.suggest("kum"), ["Kumho Pilot Sport"])
+
+
+class AutocompleteRebuildTests(TransactionTestCase):
+    # The rebuild thread has its own connection, which only sees committed rows
+
+    def test_rebuild_in_a_thread(self):
+        product_index.index = None
+        category = Category.objects.create(name="Tires", description="")
+        tire = make_tire(category, "MX-100")
+        product_index.build()
+        Tire.objects.filter(pk=tire.pk).update(brand="Kumho")
+        product_index.rebuild_later()
+        product_index.rebuilding.join()
+        self.assertEqual(
+            [item["label"] for item in product_index.lookup("kum")],
+            ["Kumho Pilot"],
+        )
+
+
+class CatalogApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Tires", description="")
+        self.tires = [
+            make_tire(
+                self.category, f"A{i}", price=Decimal(1000 + i), diameter=15 + i % 2
+            )
+            for i in range(5)
+        ]
+        make_disk(self.category, "D1")
+
+    def get(self, name, *args, **params):
+        return self.client.get(reverse(name, args=args), params)
+
+    def test_sparse_fields_select_only_those_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get("api_tire_list", fields="brand,price", diameter=16)
+        data = response.json()
+        self.assertEqual(
+            data["results"],
+            [
+                {"brand": "Michelin", "price": "1003.00"},
+                {"brand": "Michelin", "price": "1001.00"},
+            ],
+        )
+        sql = queries.captured_queries[-1]["sql"]
+        self.assertNotIn("description", sql)
+        self.assertNotIn('"model"', sql)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.get("api_tire_list", fields="brand,secret")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secret", response.json()["error"])
+
+    def test_bad_numbers_are_named(self):
+        for name, params, bad in [
+            ("api_tire_list", {"min_price": "x", "max_price": "9"}, "min_price"),
+            ("api_tire_list", {"diameter": "16.5"}, "diameter"),
+            ("api_disk_list", {"pcd": "5x112", "dia": "wide"}, "dia"),
+            ("api_disk_list", {"pcd": "5x112", "max_width": "NaN"}, "max_width"),
+        ]:
+            response = self.get(name, **params)
+            self.assertEqual(response.status_code, 400)
+            self.assertTrue(response.json()["error"].startswith(f"{bad} must"))
+
+    def test_per_page_is_clamped(self):
+        for per_page, count in ((-5, 1), (0, 1), (2, 2), (1000, 5)):
+            data = self.get("api_tire_list", fields="id", per_page=per_page).json()
+            self.assertEqual(len(data["results"]), count)
+
+    def test_keyset_pages(self):
+        ids = []
+        params = {"fields": "id", "sort_by": "price", "per_page": 2}
+        while True:
+            data = self.get("api_tire_list", **params).json()
+            ids += [row["id"] for row in data["results"]]
+            if not data["next_cursor"]:
+                break
+            params["cursor"] = data["next_cursor"]
+        self.assertEqual(ids, [tire.pk for tire in self.tires])
+
+    def test_detail_and_conditional_get(self):
+        tire = self.tires[0]
+        response = self.get("api_tire_detail", tire.slug, fields="article,description")
+        self.assertEqual(response.json(), {"article": "A0", "description": ""})
+        repeat = self.client.get(
+            response.wsgi_request.get_full_path(),
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(self.get("api_tire_detail", "nope").status_code, 404)
+
+    def test_disks_and_categories(self):
+        disks = self.get("api_disk_list", fields="article,image").json()["results"]
+        self.assertEqual(
+            disks, [{"article": "D1", "image": "/media/disk_images/test.jpg"}]
+        )
+        categories = self.get("api_category_list").json()["results"]
+        self.assertEqual([c["slug"] for c in categories], [self.category.slug])
+        category = self.get("api_category_detail", self.category.slug, fields="name")
+        self.assertEqual(category.json(), {"name": "Tires"})
+
+    def test_search_results_page_by_relevance(self):
+        make_tire(self.category, "N1", brand="Nokian", model="Hakka")
+        data = self.get("api_tire_list", search="hakka", fields="article").json()
+        self.assertEqual(data["results"], [{"article": "N1"}])
+        self.assertEqual(data["count"], 1)
+
+
+class ProductFeedTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Tires", description="")
+        self.tire = make_tire(self.category, "T1", description="Tom & Jerry <3")
+        self.disk = make_disk(self.category, "D1", quantity=0)
+        # Both were last changed long ago
+        past = timezone.now() - timedelta(days=30)
+        Tire.objects.update(updated_at=past)
+        Disk.objects.update(updated_at=past)
+
+    def feed(self, fmt, **params):
+        response = self.client.get(reverse("product_feed", args=[fmt]), params)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_formats(self):
+        response, body = self.feed("csv")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(
+            [row["id"] for row in rows],
+            [f"tire-{self.tire.pk}", f"disk-{self.disk.pk}"],
+        )
+        self.assertEqual(rows[0]["title"], "Michelin Pilot 205/55R16")
+        self.assertEqual(rows[0]["link"], f"http://testserver/tires/{self.tire.slug}/")
+        self.assertEqual(
+            rows[0]["image_link"], "http://testserver/media/tire_images/test.jpg"
+        )
+        self.assertEqual(rows[1]["size"], "18x8 5X112")
+        self.assertEqual(rows[1]["availability"], "out_of_stock")
+
+        _, body = self.feed("jsonl", type="disks")
+        items = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([item["article"] for item in items], ["D1"])
+        self.assertEqual(items[0]["price"], "9000.00")
+
+        _, body = self.feed("xml")
+        root = ElementTree.fromstring(body)
+        ns = {"g": "http://base.google.com/ns/1.0"}
+        items = root.findall("channel/item")
+        self.assertEqual(len(items), 2)
+        self.assertEqual(items[0].find("description").text, "Tom & Jerry <3")
+        self.assertEqual(items[0].find("g:price", ns).text, "2500.00 UAH")
+        self.assertEqual(items[1].find("g:mpn", ns).text, "D1")
+
+    def test_bad_requests(self):
+        url = reverse("product_feed", args=["jsonl"])
+        self.assertEqual(self.client.get(url, {"since": "soon"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"type": "wheels"}).status_code, 400)
+        url = reverse("product_feed", args=["pdf"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_one_query_per_model_whatever_the_size(self):
+        for i in range(2, 30):
+            make_tire(self.category, f"T{i}")
+        with self.assertNumQueries(2):
+            items = list(feed_items(FEED_MODELS.values(), chunk_size=5))
+        self.assertEqual(len(items), 30)
+
+    def test_incremental_feed_follows_every_writer(self):
+        since = timezone.now()
+        response, body = self.feed("jsonl", since=since.isoformat())
+        self.assertEqual(body, "")
+        self.assertGreaterEqual(
+            datetime.fromisoformat(response["X-Feed-Generated-At"]), since
+        )
+
+        # the stock sync writes with bulk_update(), which skips auto_now
+        StockSync().run([{"article": "D1", "quantity": 8}])
+        _, body = self.feed("jsonl", since=since.isoformat())
+        self.assertEqual(
+            [json.loads(line)["article"] for line in body.splitlines()], ["D1"]
+        )
+
+    def test_export_command(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as file:
+            pass
+        self.addCleanup(os.remove, file.name)
+        err = StringIO()
+        call_command(
+            "export_catalog",
+            format="csv",
+            type="tires",
+            output=file.name,
+            base_url="https://shop.example/",
+            stderr=err,
+        )
+        with open(file.name, encoding="utf-8") as output:
+            rows = list(csv.DictReader(output))
+        self.assertEqual([row["article"] for row in rows], ["T1"])
+        self.assertTrue(rows[0]["link"].startswith("https://shop.example/tires/"))
+        self.assertIn("Feed generated at", err.getvalue())
+
+        out = StringIO()
+        call_command(
+            "export_catalog", format="jsonl", since="2999-01-01", stdout=out, stderr=err
+        )
+        self.assertEqual(out.getvalue(), "")
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.category = Category.objects.create(name="Tires", description="")
+
+    def upload(self, name="photo.png", size=(1200, 900)):
+        buffer = BytesIO()
+        Image.new("RGBA", size, (200, 30, 30, 128)).save(buffer, "PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+
+    def thumbnail_jobs(self, callbacks):
+        return [
+            callback
+            for callback in callbacks
+            if callback.__module__ == thumbnails.__name__
+        ]
+
+    def test_uploads_are_resized_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            tire = make_tire(self.category, "T1", image=self.upload())
+            # Not in the request: nothing is written until the commit
+            self.assertFalse(default_storage.exists("thumbs"))
+        self.assertEqual(len(self.thumbnail_jobs(callbacks)), 1)
+        thumbnails.wait()
+
+        name = thumbnail_name(tire.image.name, "medium", "webp")
+        with default_storage.open(name) as file, Image.open(file) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (400, 300)))
+        with default_storage.open(
+            thumbnail_name(tire.image.name, "large", "jpg")
+        ) as file, Image.open(file) as image:
+            self.assertEqual((image.format, image.size), ("JPEG", (800, 600)))
+
+        # Saves without a new upload leave the thumbnails alone
+        with self.captureOnCommitCallbacks() as callbacks:
+            tire.price = Decimal("1.00")
+            tire.save()
+        self.assertEqual(self.thumbnail_jobs(callbacks), [])
+
+    def test_template_tags_fall_back_to_the_original(self):
+        tire = make_tire(self.category, "T1", brand="Tom & Jerry", image=self.upload())
+        template = Template(
+            '{% load thumbnails %}{% thumbnail tire.image "small" %}|'
+            '{% picture tire.image "medium" alt=tire.brand %}'
+        )
+        html = template.render(Context({"tire": tire}))
+        self.assertTrue(html.startswith(f"{tire.image.url}|<picture>"))
+
+        make_thumbnails(tire.image.name)
+        with mock.patch.object(default_storage, "exists") as exists:
+            html = template.render(Context({"tire": tire}))
+        exists.assert_not_called()  # known from the cache
+        root = f"/media/thumbs/{tire.image.name[:-4]}"
+        self.assertEqual(
+            html,
+            f"{root}_small.jpg|<picture>"
+            f'<source srcset="{root}_medium.webp" type="image/webp">'
+            f'<img src="{root}_medium.jpg" alt="Tom &amp; Jerry" loading="lazy"></picture>',
+        )
+
+    def test_backfill_command(self):
+        tire = make_tire(self.category, "T1")
+        name = default_storage.save(tire.image.name, self.upload())
+        Tire.objects.filter(pk=tire.pk).update(image=name)
+        make_disk(self.category, "D1", image="disk_images/missing.jpg")
+
+        out = StringIO()
+        call_command("make_thumbnails", workers=2, stdout=out)
+        self.assertIn("6 thumbnails of 1 images written", out.getvalue())
+        for variant in variant_names(name):
+            self.assertTrue(default_storage.exists(variant))
+        call_command("make_thumbnails", workers=2, stdout=out)
+        self.assertIn("0 thumbnails of 0 images written", out.getvalue())
+        with self.assertRaisesMessage(CommandError, "--workers must be 1 or more"):
+            call_command("make_thumbnails", workers=0)
+
+
+# The read replica of ReplicaRouterTests, declared before the runner sets up
+# the databases. A test mirror of default, so it is neither created nor
+# flushed; each test points it at its own snapshot
+connections.settings["replica"] = connections.configure_settings(
+    {
+        "default": dict(connections.settings["default"]),
+        "replica": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "TEST": {"MIRROR": "default"},
+        },
+    }
+)["replica"]
+
+
+@override_settings(CATALOG_SYNC_TOKEN="secret")
+class ReplicaRouterTests(TransactionTestCase):
+    # The replica is a read-only snapshot file of the test database, and the
+    # primary is changed behind its back to tell which one a query read
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Tires", description="")
+        self.tire = make_tire(category, "T1", price=Decimal("100.00"))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "replica.sqlite3")
+        connection.ensure_connection()
+        with sqlite3.connect(self.path) as replica:
+            connection.connection.backup(replica)
+            # A read-only connection can't open a WAL file without its -shm
+            replica.execute("PRAGMA journal_mode = DELETE")
+        replica.close()
+        self.add_replica(f"file:{self.path}?mode=ro")
+        self.enterContext(
+            override_settings(
+                REPLICA_DATABASES=["replica"],
+                DATABASE_ROUTERS=["catalog.routers.ReplicaRouter"],
+            )
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE tires_tire SET price = 200 WHERE id = %s", [self.tire.pk]
+            )
+
+    def add_replica(self, name):
+        connections["replica"].close()
+        self.enterContext(
+            mock.patch.dict(connections["replica"].settings_dict, NAME=name)
+        )
+        self.addCleanup(connections["replica"].close)
+
+    def price(self):
+        return Tire.objects.get(pk=self.tire.pk).price
+
+    def test_reads_go_to_the_replica(self):
+        with routing_scope():
+            self.assertEqual(self.price(), Decimal("100.00"))
+            self.assertEqual(Tire.objects.get(pk=self.tire.pk)._state.db, "replica")
+            # Not the orders app
+            self.assertEqual(router.db_for_read(get_user_model()), "default")
+
+    def test_a_write_pins_the_rest_of_the_scope_to_the_primary(self):
+        with routing_scope() as state:
+            Category.objects.create(name="Disks", description="")
+            self.assertTrue(state["wrote"])
+            self.assertEqual(self.price(), Decimal("200.00"))
+        with routing_scope():
+            self.assertEqual(self.price(), Decimal("100.00"))
+
+    def test_a_write_outside_a_scope_pins_nothing(self):
+        Category.objects.create(name="Disks", description="")
+        self.assertEqual(self.price(), Decimal("100.00"))
+        # What has to see the write reads through primary()
+        self.assertEqual(primary(Tire).get(pk=self.tire.pk).price, Decimal("200.00"))
+
+    def test_transactions_read_the_primary(self):
+        with routing_scope(), transaction.atomic():
+            self.assertEqual(self.price(), Decimal("200.00"))
+
+    def test_the_request_after_a_write_reads_the_primary(self):
+        url = reverse("api_tire_detail", args=[self.tire.slug])
+        self.assertEqual(
+            self.client.get(url, {"fields": "price"}).json()["price"], "100.00"
+        )
+        self.assertNotIn(PRIMARY_COOKIE, self.client.cookies)
+
+        response = self.client.post(
+            reverse("stock_sync"),
+            {"items": [{"article": "T2", "quantity": 1}]},
+            content_type="application/json",
+            HTTP_AUTHORIZATION="Bearer secret",
+        )
+        self.assertEqual(response.json()["unknown"], 1)
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)  # nothing written
+
+        response = self.client.post(
+            reverse("stock_sync"),
+            {"items": [{"article": "T1", "quantity": 7}]},
+            content_type="application/json",
+            HTTP_AUTHORIZATION="Bearer secret",
+        )
+        self.assertEqual(response.json()["updated"]["tires"], 1)
+        cookie = response.cookies[PRIMARY_COOKIE]
+        self.assertEqual(cookie["max-age"], settings.REPLICA_LAG)
+        data = self.client.get(url, {"fields": "price,quantity"}).json()
+        self.assertEqual(data, {"price": "200.00", "quantity": 7})
+
+    def test_pages_are_not_cached_until_the_replicas_catch_up(self):
+        url = reverse("api_tire_detail", args=[self.tire.slug])
+        bump_catalog_version()
+        self.client.get(url)
+        with self.assertNumQueries(1, using="replica"):
+            self.client.get(url)
+        with override_settings(REPLICA_LAG=0):
+            self.client.get(url)
+            with self.assertNumQueries(0, using="replica"):
+                self.client.get(url)
+
+    def test_a_healthy_replica_is_not_checked_on_every_read(self):
+        replica_router = router.routers[0]
+        with mock.patch.object(connections["replica"], "ensure_connection") as connect:
+            self.assertEqual(router.db_for_read(Tire), "replica")
+            self.assertEqual(router.db_for_read(Disk), "replica")
+            connect.assert_called_once()
+            with mock.patch("catalog.routers.time.monotonic") as monotonic:
+                monotonic.return_value = replica_router.up_until["replica"] + 1
+                router.db_for_read(Tire)
+            self.assertEqual(connect.call_count, 2)
+
+    def test_unavailable_replicas_fall_back_to_the_primary(self):
+        connections["replica"].close()
+        os.remove(self.path)
+        with routing_scope():
+            self.assertEqual(self.price(), Decimal("200.00"))
+        replica_router = router.routers[0]
+        self.assertIn("replica", replica_router.down_until)
+        # Not retried on every query
+        with mock.patch.object(connections["replica"], "ensure_connection") as connect:
+            with routing_scope():
+                self.price()
+        connect.assert_not_called()
+        with mock.patch("catalog.routers.time.monotonic") as monotonic:
+            monotonic.return_value = replica_router.down_until["replica"] + 1
+            self.assertFalse(replica_router.healthy("replica"))  # tried again
+            self.assertEqual(
+                replica_router.down_until["replica"], monotonic.return_value + 30
+            )
@@ -0,0 +1,155 @@
+"""
+Pre-generated thumbnails of tire and disk images.
+
+Every image gets each of SIZES (fitted into a square, never enlarged) as
+JPEG and WebP, stored next to the media as
+``thumbs/tire_images/photo_medium.webp``. Pages link to those instead of
+the multi-megabyte uploads (see the ``thumbnail`` template tags), once
+thumbnails_ready() says they exist: remembered in the cache, so a page
+render doesn't ask the storage about every variant.
+
+Uploads are resized in a small thread pool after the transaction commits,
+so the request that saved the product doesn't wait for Pillow, which drops
+the GIL while it decodes, resizes and encodes. Images written in bulk (the
+importer) or uploaded before this existed are covered by the
+make_thumbnails command.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Name: longest side in pixels. small: cart and suggestions, medium: the
+# list page cards, large: the detail page
+SIZES = {"small": 160, "medium": 400, "large": 800}
+FORMATS = {
+    # extension: (Pillow format, save options)
+    "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+}
+
+# Seconds before images without thumbnails are looked for again, they may
+# be written meanwhile by make_thumbnails in another process
+MISSING_TIMEOUT = 60
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()  # futures not finished yet
+
+
+def thumbnail_name(name, size, extension):
+    """Storage name of one variant of the image ``name``"""
+    root, _ = os.path.splitext(name)
+    return f"thumbs/{root}_{size}.{extension}"
+
+
+def variant_names(name):
+    return [
+        thumbnail_name(name, size, extension) for size in SIZES for extension in FORMATS
+    ]
+
+
+def _ready_key(name):
+    return f"thumbnails:{name}"
+
+
+def thumbnails_ready(name):
+    """Whether every variant of the image ``name`` is in the default storage"""
+    ready = cache.get(_ready_key(name))
+    if ready is None:
+        ready = all(default_storage.exists(variant) for variant in variant_names(name))
+        cache.set(_ready_key(name), ready, None if ready else MISSING_TIMEOUT)
+    return ready
+
+
+def make_thumbnails(name, force=False, storage=None):
+    """Write every variant of the image ``name``, return the names written"""
+    storage = storage or default_storage
+    if not storage.exists(name):
+        return []  # e.g. a path written by the importer for a missing file
+    if not force and all(storage.exists(variant) for variant in variant_names(name)):
+        return []
+    with storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    if image.mode not in ("RGB", "L"):
+        # JPEG has no alpha, put transparent parts on white
+        background = Image.new("RGB", image.size, "white")
+        image = image.convert("RGBA")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+
+    written = []
+    for size, pixels in SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((pixels, pixels), Image.Resampling.LANCZOS)
+        for extension, (image_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, image_format, **options)
+            variant = thumbnail_name(name, size, extension)
+            # save() would pick a new name for an existing file
+            storage.delete(variant)
+            written.append(storage.save(variant, ContentFile(buffer.getvalue())))
+    if storage is default_storage:
+        cache.set(_ready_key(name), True, None)
+    return written
+
+
+def _make_logged(name):
+    try:
+        return make_thumbnails(name)
+    except Exception:
+        logger.exception("Can't make thumbnails of %s", name)
+        return []
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix="thumbnails",
+            )
+    return _executor
+
+
+def schedule(name):
+    """Make the thumbnails of ``name`` in the background once committed"""
+
+    def submit():
+        future = executor().submit(_make_logged, name)
+        _pending.add(future)
+        future.add_done_callback(_pending.discard)
+
+    transaction.on_commit(submit)
+
+
+def wait():
+    """Block until the scheduled thumbnails are written (tests, commands)"""
+    for future in list(_pending):
+        future.result()
+
+
+def on_pre_save(sender, instance, raw=False, **kwargs):
+    # A new upload is an uncommitted file until FileField.pre_save stores it
+    image = instance.image
+    instance._image_uploaded = bool(image) and not image._committed
+
+
+def on_post_save(sender, instance, created, raw=False, **kwargs):
+    if raw or not instance.image:
+        return
+    if created or getattr(instance, "_image_uploaded", False):
+        schedule(instance.image.name)
@@ -0,0 +1,75 @@
+import hmac
+import json
+
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .autocomplete import product_index
+from .feeds import FEED_MODELS, FORMATS, buffered, feed_items, parse_since
+from .sync import StockSync
+
+
+def _authorized(request):
+    token = settings.CATALOG_SYNC_TOKEN
+    header = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(header, f"Bearer {token}")
+
+
+@csrf_exempt
+@require_POST
+def stock_sync(request):
+    """Apply supplier price/stock deltas: {"items": [{"article", "price", "quantity"}]}"""
+    if not _authorized(request):
+        return JsonResponse({"error": "Invalid or missing token"}, status=401)
+    try:
+        items = json.loads(request.body)["items"]
+        if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": 'Expected {"items": [...]}'}, status=400)
+
+    sync = StockSync().run(items)
+    return JsonResponse(sync.summary())
+
+
+@require_GET
+def autocomplete(request):
+    """Suggestions for a search box: ?q=mich[&kind=tire|disk]"""
+    query = request.GET.get("q", "")[:50]
+    kind = request.GET.get("kind") or None
+    if kind not in (None, *product_index.models):
+        return JsonResponse({"error": "kind must be tire or disk"}, status=400)
+    suggestions = product_index.lookup(query, kind=kind)
+    return JsonResponse({"query": query, "suggestions": suggestions})
+
+
+@require_GET
+def product_feed(request, fmt):
+    """Streamed product feed: /feeds/<csv|jsonl|xml>/[?type=tires|disks][&since=]"""
+    if fmt not in FORMATS:
+        raise Http404(f"Unknown feed format {fmt!r}")
+    kind = request.GET.get("type")
+    if kind and kind not in FEED_MODELS:
+        return JsonResponse({"error": "type must be tires or disks"}, status=400)
+    since = None
+    if request.GET.get("since"):
+        try:
+            since = parse_since(request.GET["since"])
+        except ValueError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+
+    # Taken before reading, so rows changed while streaming make the next feed
+    generated_at = timezone.now()
+    models = [FEED_MODELS[kind]] if kind else FEED_MODELS.values()
+    base_url = request.build_absolute_uri("/").rstrip("/")
+    writer, content_type = FORMATS[fmt]
+    response = StreamingHttpResponse(
+        buffered(writer(feed_items(models, since, base_url))),
+        content_type=content_type,
+    )
+    response["Content-Disposition"] = f'inline; filename="products.{fmt}"'
+    response["X-Feed-Generated-At"] = generated_at.isoformat()
+    return response
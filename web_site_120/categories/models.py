@@ -1,5 +1,5 @@
 from django.db import models
-from django.utils.text import slugify
+from catalog.slugs import save_with_unique_slug
 
 
 class Category(models.Model):
@@ -10,9 +10,10 @@ class Category(models.Model):
 
     # https://docs.djangoproject.com/en/5.2/topics/db/models/#overriding-predefined-model-methods
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        if self.slug:
+            super().save(*args, **kwargs)
+        else:
+            save_with_unique_slug(self, [self.name], super().save, *args, **kwargs)
 
     def __str__(self):
         return self.name
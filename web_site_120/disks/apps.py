@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class DisksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'disks'
+
+    def ready(self):
+        from catalog.search import keep_search_index
+        from .facets import disk_facets
+        from .models import Disk
+
+        disk_facets.connect()
+        keep_search_index(self, Disk)
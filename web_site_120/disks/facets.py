@@ -0,0 +1,5 @@
+from catalog.facets import FacetSummary
+from .models import Disk
+
+# Sidebar filters of the disk list
+disk_facets = FacetSummary(Disk, ["brand", "diameter"])
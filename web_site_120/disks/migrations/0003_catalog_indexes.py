@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0001_initial"),
+        ("disks", "0002_disk_search_index"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="disk",
+            name="disks_disk_diamete_99863a_idx",
+        ),
+        migrations.AddIndex(
+            model_name="disk",
+            index=models.Index(fields=["created_at"], name="disk_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="disk",
+            index=models.Index(fields=["price"], name="disk_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="disk",
+            index=models.Index(
+                fields=["diameter", "created_at"], name="disk_diameter_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="disk",
+            index=models.Index(
+                fields=["diameter", "price"], name="disk_diameter_price_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="disk",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["diameter", "created_at"],
+                name="disk_in_stock_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="disk",
+            index=models.Index(
+                fields=["brand", "created_at"], name="disk_brand_created_idx"
+            ),
+        ),
+    ]
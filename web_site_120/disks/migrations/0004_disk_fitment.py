@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:34
+
+import re
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# Same pattern as disks.models.PCD_RE at the time of this migration
+PCD_RE = re.compile(r"(\d{1,2})\s*[xX*/×хХ]\s*(\d{2,3}(?:[.,]\d+)?)")
+
+
+def fill_fitment(apps, schema_editor):
+    Disk = apps.get_model("disks", "Disk")
+    batch = []
+    for disk in Disk.objects.only("pcd").iterator(chunk_size=2000):
+        match = PCD_RE.search(disk.pcd or "")
+        if not match:
+            continue
+        count, circle = match.groups()
+        disk.bolt_count = int(count)
+        disk.bolt_circle = Decimal(circle.replace(",", ".")).quantize(Decimal("0.1"))
+        batch.append(disk)
+        if len(batch) == 2000:
+            Disk.objects.bulk_update(batch, ["bolt_count", "bolt_circle"])
+            batch = []
+    Disk.objects.bulk_update(batch, ["bolt_count", "bolt_circle"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0001_initial"),
+        ("disks", "0003_catalog_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="disk",
+            name="bolt_circle",
+            field=models.DecimalField(
+                decimal_places=1, editable=False, max_digits=4, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="disk",
+            name="bolt_count",
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_fitment, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="disk",
+            index=models.Index(
+                fields=["bolt_count", "bolt_circle", "dia", "width"],
+                name="disk_fitment_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:56
+
+from django.db import migrations, models
+
+
+def fill_updated_at(apps, schema_editor):
+    # Existing rows would all look changed "now", start from their creation
+    Disk = apps.get_model("disks", "Disk")
+    Disk.objects.update(updated_at=models.F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0001_initial"),
+        ("disks", "0004_disk_fitment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="disk",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="disk",
+            index=models.Index(fields=["updated_at"], name="disk_updated_idx"),
+        ),
+    ]
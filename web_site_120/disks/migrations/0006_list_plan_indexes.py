@@ -0,0 +1,61 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0001_initial"),
+        ("disks", "0005_updated_at"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="disk",
+            name="disk_in_stock_created_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="disk",
+            name="disk_brand_created_idx",
+        ),
+        migrations.AddIndex(
+            model_name="disk",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["created_at"],
+                name="disk_in_stock_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="disk",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["price"],
+                name="disk_in_stock_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="disk",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["brand"],
+                name="disk_in_stock_brand_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="disk",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["brand", "diameter"],
+                name="disk_in_stock_facets_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="disk",
+            index=models.Index(
+                fields=["brand", "diameter", "created_at"],
+                name="disk_brand_diam_created_idx",
+            ),
+        ),
+    ]
@@ -1,18 +1,31 @@
+import re
+from decimal import Decimal
+
 from django.db import models
-from django.utils.text import slugify
 from categories.models import Category
+from catalog.facets import facet_counts
+from catalog.search import full_text_search
+from catalog.slugs import save_with_unique_slug
+
+# Bolt pattern as suppliers write it: "5X112", "5x112.0", "5*114.3", "5/100"
+PCD_RE = re.compile(r"(\d{1,2})\s*[xX*/×хХ]\s*(\d{2,3}(?:[.,]\d+)?)")
+
+
+def parse_pcd(value):
+    """(bolt count, bolt circle) from a PCD string or None"""
+    match = PCD_RE.search(value or "")
+    if match:
+        count, circle = match.groups()
+        return int(count), Decimal(circle.replace(",", ".")).quantize(Decimal("0.1"))
+    return None
 
 
 class DiskQuerySet(models.QuerySet):
     """Custom method for search Disks"""
 
     def search(self, query):
-        """Search by brand, model, article"""
-        return self.filter(
-            models.Q(brand__icontains=query)
-            | models.Q(model__icontains=query)
-            | models.Q(article__icontains=query)
-        )
+        """Search by brand, model, article (best matches first)"""
+        return full_text_search(self, query)
 
     def by_brand(self, brand):
         """Filter by brand"""
@@ -22,6 +35,25 @@ class DiskQuerySet(models.QuerySet):
         """Filter by diameter"""
         return self.filter(diameter=diameter)
 
+    def by_pcd(self, pcd):
+        """Filter by bolt pattern, "5x112" matches "5X112.0" """
+        parsed = parse_pcd(pcd)
+        if parsed is None:
+            return self.none()
+        bolt_count, bolt_circle = parsed
+        return self.filter(bolt_count=bolt_count, bolt_circle=bolt_circle)
+
+    def fits(self, pcd, min_dia=None, min_width=None, max_width=None):
+        """Disks for a car: its bolt pattern, a center bore it fits on, a width range"""
+        disks = self.by_pcd(pcd)
+        if min_dia:
+            disks = disks.filter(dia__gte=min_dia)
+        if min_width:
+            disks = disks.filter(width__gte=min_width)
+        if max_width:
+            disks = disks.filter(width__lte=max_width)
+        return disks
+
     def by_price_range(self, min_price, max_price):
         """Filter by price"""
         return self.filter(price__gte=min_price, price__lte=max_price)
@@ -30,6 +62,10 @@ class DiskQuerySet(models.QuerySet):
         """Only products in stock"""
         return self.filter(quantity__gt=0)
 
+    def facet_counts(self, brand="", diameter=""):
+        """Count per brand/diameter value, each ignoring its own filter"""
+        return facet_counts(self, {"brand": brand, "diameter": diameter})
+
 
 class DiskManager(models.Manager):
     def get_queryset(self):
@@ -44,12 +80,21 @@ class DiskManager(models.Manager):
     def by_diameter(self, diameter):
         return self.get_queryset().by_diameter(diameter)
 
+    def by_pcd(self, pcd):
+        return self.get_queryset().by_pcd(pcd)
+
+    def fits(self, pcd, min_dia=None, min_width=None, max_width=None):
+        return self.get_queryset().fits(pcd, min_dia, min_width, max_width)
+
     def by_price_range(self, min_price, max_price):
         return self.get_queryset().by_price_range(min_price, max_price)
 
     def in_stock(self):
         return self.get_queryset().in_stock()
 
+    def facet_counts(self, brand="", diameter=""):
+        return self.get_queryset().facet_counts(brand, diameter)
+
 
 class Disk(models.Model):
     # link to category
@@ -65,6 +110,12 @@ class Disk(models.Model):
     pcd = models.CharField(max_length=20)  # PCD (5X112, 5X120...)
     dia = models.DecimalField(max_digits=5, decimal_places=1)  #  DIA (70.1, 72.6...
 
+    # PCD split into searchable columns, filled in save()
+    bolt_count = models.PositiveSmallIntegerField(null=True, editable=False)  # 5
+    bolt_circle = models.DecimalField(  # 112.0
+        max_digits=4, decimal_places=1, null=True, editable=False
+    )
+
     # Commercial information
     price = models.DecimalField(max_digits=10, decimal_places=2)  # Price
     article = models.CharField(max_length=50, unique=True)  # Article (13123...)
@@ -76,15 +127,36 @@ class Disk(models.Model):
 
     # Date
     created_at = models.DateTimeField(auto_now_add=True)  # Date
+    # Bumped by save(); bulk writers set it themselves (feeds read it)
+    updated_at = models.DateTimeField(auto_now=True)
 
     slug = models.SlugField(unique=True, blank=True)
 
     objects = DiskManager()
 
+    def slug_parts(self):
+        """Slug words, later ones only used to tell same-name products apart"""
+        return (
+            f"{self.brand} {self.model}",
+            f"{self.diameter}x{self.width} {self.pcd}",
+            self.article,
+        )
+
+    # Computed columns and the fields they are computed from
+    DERIVED_FIELDS = {"bolt_count": ("pcd",), "bolt_circle": ("pcd",)}
+
+    def set_derived_fields(self):
+        """Fill the columns computed from other fields (bulk writes call it too)"""
+        self.bolt_count, self.bolt_circle = parse_pcd(self.pcd) or (None, None)
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(f"{self.brand}-{self.model}")
-        super().save(*args, **kwargs)
+        self.set_derived_fields()
+        if self.slug:
+            super().save(*args, **kwargs)
+        else:
+            save_with_unique_slug(
+                self, self.slug_parts(), super().save, *args, **kwargs
+            )
 
     def __str__(self):
         return f"{self.brand} {self.model} {self.diameter}x{self.width} {self.pcd}"
@@ -93,8 +165,49 @@ class Disk(models.Model):
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["brand"]),
-            models.Index(fields=["diameter"]),
             models.Index(fields=["slug"]),
+            # Fitment search: bolt pattern, then center bore range
+            models.Index(
+                fields=["bolt_count", "bolt_circle", "dia", "width"],
+                name="disk_fitment_idx",
+            ),
+            # Sorted list pages and their filter combinations. Ascending created_at
+            # indexes also serve "-created_at, -id" when walked backwards.
+            models.Index(fields=["created_at"], name="disk_created_idx"),
+            models.Index(fields=["updated_at"], name="disk_updated_idx"),
+            models.Index(fields=["price"], name="disk_price_idx"),
+            models.Index(
+                fields=["diameter", "created_at"], name="disk_diameter_created_idx"
+            ),
+            models.Index(fields=["diameter", "price"], name="disk_diameter_price_idx"),
+            # Only the rows in stock, walked in order by ?in_stock=1 pages and
+            # grouped by their facet counts
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(quantity__gt=0),
+                name="disk_in_stock_created_idx",
+            ),
+            models.Index(
+                fields=["price"],
+                condition=models.Q(quantity__gt=0),
+                name="disk_in_stock_price_idx",
+            ),
+            models.Index(
+                fields=["brand"],
+                condition=models.Q(quantity__gt=0),
+                name="disk_in_stock_brand_idx",
+            ),
+            models.Index(
+                fields=["brand", "diameter"],
+                condition=models.Q(quantity__gt=0),
+                name="disk_in_stock_facets_idx",
+            ),
+            # Brand filter, the "related" block of disk_detail and, covering
+            # brand/diameter, the facet counts GROUP BY
+            models.Index(
+                fields=["brand", "diameter", "created_at"],
+                name="disk_brand_diam_created_idx",
+            ),
         ]
         verbose_name = "Disk"
         verbose_name_plural = "Disks"
@@ -1,3 +1,66 @@
+from decimal import Decimal
+
+from django.http import QueryDict
 from django.test import TestCase
 
-# Create your tests here.
+from catalog.tests import ChangelistQueriesMixin, make_disk
+from categories.models import Category
+from .models import Disk, parse_pcd
+from .views import filter_disks, search_disks
+
+
+class DiskFitmentTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Disks", description="")
+        self.golf = make_disk(category, "D1", pcd="5x112.0", dia=Decimal("57.1"))
+        self.wide = make_disk(
+            category, "D2", model="LM", pcd="5X112", width=10, dia=66.6
+        )
+        self.ford = make_disk(category, "D3", model="RS", pcd="4*108", dia=63.4)
+
+    def test_parse_pcd(self):
+        self.assertEqual(parse_pcd("5X112"), (5, Decimal("112.0")))
+        self.assertEqual(parse_pcd("5x114,3"), (5, Decimal("114.3")))
+        self.assertEqual(parse_pcd("4 * 100"), (4, Decimal("100.0")))
+        self.assertIsNone(parse_pcd("ET45"))
+
+    def test_save_splits_pcd(self):
+        self.assertEqual(self.ford.bolt_count, 4)
+        self.assertEqual(self.ford.bolt_circle, Decimal("108.0"))
+
+    def test_by_pcd_matches_spelling_variants(self):
+        self.assertEqual(set(Disk.objects.by_pcd("5x112")), {self.golf, self.wide})
+        self.assertEqual(list(Disk.objects.by_pcd("4X108.0")), [self.ford])
+
+    def test_fits(self):
+        self.assertEqual(list(Disk.objects.fits("5x112", min_dia=60)), [self.wide])
+        self.assertEqual(
+            list(Disk.objects.fits("5x112", min_dia=57.1, max_width=9)), [self.golf]
+        )
+
+    def test_search_ignores_filters_that_are_not_numbers(self):
+        def search(query):
+            return set(search_disks(QueryDict(query)))
+
+        self.assertEqual(search("pcd=5x112&dia=60&max_width=10"), {self.wide})
+        for query in (
+            "pcd=5x112&dia=abc",
+            "pcd=5x112&min_width=abc&max_width=nan",
+            "pcd=5x112&min_price=1&max_price=abc",
+        ):
+            with self.subTest(query):
+                self.assertEqual(search(query), {self.golf, self.wide})
+        disks = filter_disks(Disk.objects.all(), QueryDict("diameter=abc"))
+        self.assertEqual(len(disks), 3)
+
+
+class DiskAdminTests(ChangelistQueriesMixin, TestCase):
+    def test_changelist_queries_are_constant(self):
+        category = Category.objects.create(name="Disks", description="")
+
+        def add_rows(rows):
+            start = Disk.objects.count()
+            for i in range(start, start + rows):
+                make_disk(category, f"D{i}", diameter=16 + i % 3)
+
+        self.assertChangelistQueries(Disk, add_rows)
@@ -1,68 +1,139 @@
+from decimal import Decimal
+
 from django.shortcuts import render, get_object_or_404
 from django.core.paginator import Paginator
-from django.db import models
+from catalog.caching import cache_catalog_page
+from catalog.pagination import KeysetPaginator
+from catalog.parallel import run_in_worker, run_queries
+from .facets import disk_facets
 from .models import Disk, DiskManager
 
 
-def disk_list(request):
-    """List of disks with search, filtering, and sorting"""
+def _number(params, name):
+    """Decimal value of ``name``, None if missing or not a number (ignored)"""
+    try:
+        value = Decimal(params.get(name, ""))
+    except ArithmeticError:
+        return None
+    return value if value.is_finite() else None
+
+
+def search_disks(params):
+    """Disks matching the search, fitment, price and stock parameters"""
     disks: DiskManager = Disk.objects.all()
 
     # Search
-    search = request.GET.get("search", "")
+    search = params.get("search", "")
     if search:
         disks = disks.search(search)
 
-    brand = request.GET.get("brand", "")
-    if brand:
-        disks = disks.by_brand(brand)
+    # Fitment: bolt pattern, minimal center bore and width range of the car
+    pcd = params.get("pcd", "")
+    if pcd:
+        disks = disks.fits(
+            pcd,
+            min_dia=_number(params, "dia"),
+            min_width=_number(params, "min_width"),
+            max_width=_number(params, "max_width"),
+        )
+
+    min_price = _number(params, "min_price")
+    max_price = _number(params, "max_price")
+    if min_price is not None and max_price is not None:
+        disks = disks.by_price_range(min_price, max_price)
+
+    is_stock_only = params.get("in_stock", "")
+    if is_stock_only:
+        disks = disks.in_stock()
 
-    diameter = request.GET.get("diameter", "")
-    if diameter:
-        disks = disks.by_diameter(diameter)
+    return disks
 
-    min_price = request.GET.get("min_price", "")
-    max_price = request.GET.get("max_price", "")
-    if min_price and max_price:
-        disks = disks.by_price_range(float(min_price), float(max_price))
 
-    sort_by = request.GET.get("sort_by", "-created_at")
-    valid_sorts = ["-created_at", "created_at", "price", "-price", "brand"]
-    if sort_by in valid_sorts:
-        disks = disks.order_by(sort_by)
+def filter_disks(disks, params):
+    """Apply the brand and diameter filters"""
+    if params.get("brand"):
+        disks = disks.by_brand(params["brand"])
 
-    is_stock_only = request.GET.get("in_stock", "")
-    if is_stock_only:
-        disks = disks.in_stock()
+    if params.get("diameter", "").isdigit():
+        disks = disks.by_diameter(params["diameter"])
 
-    # PAGINATION (12 products per page)
-    paginator = Paginator(disks, 12)
-    page_number = request.GET.get("page", 1)
-    page_obj = paginator.get_page(page_number)
+    return disks
 
-    # GET UNIQUE VALUES FOR THE FILTERS
-    all_disks: DiskManager = Disk.objects.all()
-    brands = sorted(all_disks.values_list("brand", flat=True).distinct())
-    diameters = sorted(all_disks.values_list("diameter", flat=True).distinct())
 
-    min_price_db = all_disks.aggregate(models.Min("price"))["price__min"] or 0
-    max_price_db = all_disks.aggregate(models.Max("price"))["price__max"] or 0
+def disk_page(disks, params):
+    """The page of ``disks`` asked for by ``params``, its rows already read"""
+    # Search results keep their relevance order unless a sort is chosen
+    sort_by = params.get(
+        "sort_by", "relevance" if params.get("search") else "-created_at"
+    )
+    valid_sorts = ["-created_at", "created_at", "price", "-price", "brand"]
+    if sort_by in valid_sorts:
+        disks = disks.order_by(sort_by)
 
-    context = {
+    # PAGINATION (12 products per page)
+    # Cursor links cost the same on every page, ?page=N links still work
+    if sort_by in KeysetPaginator.orderings and "page" not in params:
+        paginator = KeysetPaginator(disks, 12, sort_by)
+        page_obj = paginator.get_page(params.get("cursor"))
+    else:
+        paginator = Paginator(disks, 12)
+        page_number = params.get("page", 1)
+        page_obj = paginator.get_page(page_number)
+        page_obj.object_list = list(page_obj.object_list)
+    return page_obj
+
+
+def disk_list_context(params, page_obj, facet_counts, facets):
+    return {
         "page_obj": page_obj,
         "disks": page_obj.object_list,
-        "brands": brands,
-        "diameters": diameters,
-        "min_price_db": min_price_db,
-        "max_price_db": max_price_db,
-        "current_search": search,
-        "current_brand": brand,
-        "current_diameter": diameter,
+        "brands": facets["brand"],
+        "diameters": facets["diameter"],
+        "facet_counts": facet_counts,
+        "min_price_db": facets["min_price"],
+        "max_price_db": facets["max_price"],
+        "current_search": params.get("search", ""),
+        "current_pcd": params.get("pcd", ""),
+        "current_brand": params.get("brand", ""),
+        "current_diameter": params.get("diameter", ""),
     }
 
+
+def disk_list(request):
+    """List of disks with search, filtering, and sorting"""
+    disks = search_disks(request.GET)
+    brand = request.GET.get("brand", "")
+    diameter = request.GET.get("diameter", "")
+
+    # Counts for the filters, before the filters themselves are applied
+    facet_counts = disks.facet_counts(brand, diameter)
+    page_obj = disk_page(filter_disks(disks, request.GET), request.GET)
+
+    # UNIQUE VALUES FOR THE FILTERS (cached, kept fresh by model signals)
+    facets = disk_facets.get()
+
+    context = disk_list_context(request.GET, page_obj, facet_counts, facets)
     return render(request, "disks/disk_list.html", context=context)
 
 
+async def disk_list_async(request):
+    """disk_list with the page, the facet counts and the facets read at once"""
+    # Building a search may look up its index table
+    disks = await run_in_worker(search_disks, request.GET)
+    brand = request.GET.get("brand", "")
+    diameter = request.GET.get("diameter", "")
+
+    facet_counts, page_obj, facets = await run_queries(
+        (disks.facet_counts, brand, diameter),
+        (disk_page, filter_disks(disks, request.GET), request.GET),
+        (disk_facets.get,),
+    )
+
+    context = disk_list_context(request.GET, page_obj, facet_counts, facets)
+    return await run_in_worker(render, request, "disks/disk_list.html", context)
+
+
+@cache_catalog_page
 def disk_detail(request, slug):
     """Details of one disk"""
     disk = get_object_or_404(Disk, slug=slug)
@@ -1,19 +1,79 @@
 from django.contrib import admin
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.forms.models import BaseInlineFormSet
+from django.urls import NoReverseMatch, reverse
+from django.utils.text import Truncator
 from .models import Order, OrderItem
 
 
+class LoadedRawIdWidget(ForeignKeyRawIdWidget):
+    """Raw id input labelled from the row's already loaded object, no query"""
+
+    related_object = None
+
+    def label_and_url_for_value(self, value):
+        obj = self.related_object
+        if obj is None or str(obj.pk) != str(value):
+            return super().label_and_url_for_value(value)
+        opts = obj._meta
+        try:
+            url = reverse(
+                f"{self.admin_site.name}:{opts.app_label}_{opts.model_name}_change",
+                args=[obj.pk],
+            )
+        except NoReverseMatch:
+            url = ""
+        return Truncator(obj).words(14), url
+
+
+class OrderItemFormSet(BaseInlineFormSet):
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        for name in OrderItemInline.raw_id_fields:
+            # select_related by the inline queryset, so no query here
+            form.fields[name].widget.related_object = getattr(form.instance, name)
+        return form
+
+
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
+    formset = OrderItemFormSet
     extra = 1
+    # A select of every tire and disk per row would load both tables each time
+    raw_id_fields = ["tire", "disk"]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("tire", "disk")
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.raw_id_fields:
+            kwargs["widget"] = LoadedRawIdWidget(
+                db_field.remote_field, self.admin_site, using=kwargs.get("using")
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ["id", "user", "status", "total_price", "created_at"]
+    list_display = ["id", "user", "status", "total_price", "items_count", "created_at"]
     list_filter = ["status", "created_at"]
+    list_select_related = ["user"]
     search_fields = ["user__first_name", "user__last_name"]
     inlines = [OrderItemInline]
-    readonly_fields = ["created_at", "updated_at"]
+    raw_id_fields = ["user"]
+    # Totals follow the items, see orders.signals
+    readonly_fields = ["total_price", "items_count", "created_at", "updated_at"]
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "order", "product_name", "quantity", "price"]
+    list_select_related = ["order__user"]
+    raw_id_fields = ["order", "tire", "disk"]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_product_name()
 
-admin.site.register(OrderItem)
+    @admin.display(description="Product", ordering="product_name")
+    def product_name(self, item):
+        return item.product_name
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
+
+    def ready(self):
+        from .models import OrderItem
+        from .signals import update_order_totals
+
+        uid = "order-totals"
+        post_save.connect(update_order_totals, sender=OrderItem, dispatch_uid=uid)
+        post_delete.connect(update_order_totals, sender=OrderItem, dispatch_uid=uid)
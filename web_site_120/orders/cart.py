@@ -0,0 +1,114 @@
+"""
+Shopping cart kept in the session.
+
+The session only holds ``[kind, pk, quantity]`` triples, so the item count
+shown on every page is a sum over a short list, with no query. Products
+are loaded when the lines are actually shown: one ``in_bulk`` per product
+model, whatever the number of lines. Their prices at that moment are what
+the cart shows; checkout() copies the prices again under the stock lock into
+OrderItem.price.
+"""
+
+from decimal import Decimal
+
+from .services import PRODUCT_FIELDS, checkout
+
+SESSION_KEY = "cart"
+MAX_LINES = 50
+MAX_QUANTITY = 99
+
+MODELS = {model._meta.model_name: model for model in PRODUCT_FIELDS}
+
+
+class CartLine:
+    """A loaded product, its quantity and its price when loaded"""
+
+    def __init__(self, kind, product, quantity):
+        self.kind = kind
+        self.product = product
+        self.quantity = quantity
+        self.price = product.price
+
+    @property
+    def total(self):
+        return self.price * self.quantity
+
+
+class Cart:
+    """Lines of the session cart, products loaded on first use"""
+
+    def __init__(self, session):
+        self.session = session
+        self.quantities = {
+            (kind, pk): quantity
+            for kind, pk, quantity in session.get(SESSION_KEY, [])
+            if kind in MODELS
+        }
+        self._lines = None
+
+    @property
+    def count(self):
+        """Units in the cart, no query"""
+        return sum(self.quantities.values())
+
+    def __len__(self):
+        return len(self.quantities)
+
+    def set(self, kind, pk, quantity):
+        """Set the quantity of a product, 0 removes it"""
+        if kind not in MODELS:
+            raise ValueError(f"Unknown product kind {kind!r}")
+        quantity = min(int(quantity), MAX_QUANTITY)
+        if quantity < 1:
+            self.quantities.pop((kind, pk), None)
+        elif (kind, pk) in self.quantities or len(self.quantities) < MAX_LINES:
+            self.quantities[kind, pk] = quantity
+        else:
+            raise ValueError(f"A cart holds at most {MAX_LINES} products")
+        self.save()
+
+    def add(self, product, quantity=1):
+        kind = product._meta.model_name
+        self.set(
+            kind, product.pk, self.quantities.get((kind, product.pk), 0) + quantity
+        )
+
+    def clear(self):
+        self.quantities = {}
+        self.save()
+
+    def save(self):
+        self.session[SESSION_KEY] = [
+            [kind, pk, quantity] for (kind, pk), quantity in self.quantities.items()
+        ]
+        self._lines = None
+
+    def lines(self):
+        """CartLines in the order added, one query per product model"""
+        if self._lines is None:
+            pks = {}
+            for kind, pk in self.quantities:
+                pks.setdefault(kind, []).append(pk)
+            products = {
+                kind: MODELS[kind].objects.defer("description").in_bulk(kind_pks)
+                for kind, kind_pks in pks.items()
+            }
+            # Products deleted since they were added are left out
+            self._lines = [
+                CartLine(kind, products[kind][pk], quantity)
+                for (kind, pk), quantity in self.quantities.items()
+                if pk in products[kind]
+            ]
+        return self._lines
+
+    @property
+    def total(self):
+        return sum((line.total for line in self.lines()), Decimal("0.00"))
+
+    def checkout(self, user, contact=None):
+        """Order the cart's products for ``user`` and empty it"""
+        order = checkout(
+            user, [(line.product, line.quantity) for line in self.lines()], contact
+        )
+        self.clear()
+        return order
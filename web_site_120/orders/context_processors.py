@@ -0,0 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
+from .cart import Cart
+
+
+def cart(request):
+    """``cart`` in every template, read from the session only when used"""
+    return {"cart": SimpleLazyObject(lambda: Cart(request.session))}
@@ -0,0 +1,150 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+# name: (OPTIONS, new connection per transaction like CONN_MAX_AGE=0)
+PROFILES = {
+    # Django's defaults: rollback journal, synchronous=FULL, 5 s timeout,
+    # deferred transactions
+    "default": ({}, True),
+    "tuned": (settings.SQLITE_OPTIONS, False),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run checkout-like write transactions (read stock, decrement it, insert "
+        "a sale) from many threads next to catalog readers, on a scratch SQLite "
+        "file with Django's default options and with settings.SQLITE_OPTIONS, "
+        "and report throughput, lock errors and write latency"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument("--products", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, (db_options, reconnect) in PROFILES.items():
+                alias = f"bench_{name}"
+                path = os.path.join(directory, f"{name}.sqlite3")
+                self.add_database(alias, path, db_options)
+                try:
+                    self.create_tables(alias, options["products"])
+                    result = self.run(alias, reconnect, options)
+                finally:
+                    connections[alias].close()
+                    del connections.settings[alias]
+                self.report(name, result, options["seconds"])
+
+    def add_database(self, alias, path, db_options):
+        databases = connections.configure_settings(
+            {
+                "default": dict(settings.DATABASES["default"]),
+                alias: {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": path,
+                    "OPTIONS": dict(db_options),
+                },
+            }
+        )
+        connections.settings[alias] = databases[alias]
+
+    def create_tables(self, alias, products):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE stock (id INTEGER PRIMARY KEY, quantity INTEGER)"
+            )
+            cursor.execute(
+                "CREATE TABLE sale (id INTEGER PRIMARY KEY, stock_id INTEGER, "
+                "quantity INTEGER, created REAL)"
+            )
+            cursor.executemany(
+                "INSERT INTO stock (id, quantity) VALUES (%s, %s)",
+                [(pk, 10**9) for pk in range(1, products + 1)],
+            )
+
+    def run(self, alias, reconnect, options):
+        stop = time.monotonic() + options["seconds"]
+        lock = threading.Lock()
+        result = {"writes": 0, "reads": 0, "errors": 0, "latencies": []}
+
+        def write(worker):
+            connection = connections[alias]
+            pk = worker % options["products"] + 1
+            while time.monotonic() < stop:
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic(using=alias):
+                        with connection.cursor() as cursor:
+                            cursor.execute(
+                                "SELECT quantity FROM stock WHERE id = %s", [pk]
+                            )
+                            cursor.fetchone()
+                            cursor.execute(
+                                "UPDATE stock SET quantity = quantity - 1 "
+                                "WHERE id = %s",
+                                [pk],
+                            )
+                            cursor.execute(
+                                "INSERT INTO sale (stock_id, quantity, created) "
+                                "VALUES (%s, 1, %s)",
+                                [pk, time.time()],
+                            )
+                except OperationalError:  # "database is locked"
+                    with lock:
+                        result["errors"] += 1
+                else:
+                    with lock:
+                        result["writes"] += 1
+                        result["latencies"].append(time.perf_counter() - started)
+                if reconnect:
+                    connection.close()
+            connection.close()
+
+        def read():
+            connection = connections[alias]
+            while time.monotonic() < stop:
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT COUNT(*), SUM(quantity) FROM sale")
+                        cursor.fetchone()
+                except OperationalError:
+                    with lock:
+                        result["errors"] += 1
+                else:
+                    with lock:
+                        result["reads"] += 1
+                if reconnect:
+                    connection.close()
+            connection.close()
+
+        threads = [
+            threading.Thread(target=write, args=[i]) for i in range(options["writers"])
+        ] + [threading.Thread(target=read) for _ in range(options["readers"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def report(self, name, result, seconds):
+        latencies = sorted(latency * 1000 for latency in result["latencies"])
+        if len(latencies) > 1:
+            percentiles = statistics.quantiles(latencies, n=100)
+            timing = f"write p50 {percentiles[49]:.1f} ms, p99 {percentiles[98]:.1f} ms"
+        else:
+            timing = "too few writes for percentiles"
+        self.stdout.write(
+            f"{name}: {result['writes'] / seconds:.0f} writes/s, "
+            f"{result['reads'] / seconds:.0f} reads/s, "
+            f"{result['errors']} lock errors, {timing}"
+        )
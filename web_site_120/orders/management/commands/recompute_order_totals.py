@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Repair Order.total_price / items_count that drifted from the items, "
+        "e.g. after bulk edits that skip signals. Works in batches of orders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only report the drifted orders"
+        )
+
+    def handle(self, *args, **options):
+        checked = repaired = 0
+        last_id = 0
+        while True:
+            # Walk the orders by id, each batch is one range of the primary key
+            ids = list(
+                Order.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["batch_size"]]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+            batch = Order.objects.filter(pk__gte=ids[0], pk__lte=last_id)
+            drifted = list(batch.with_drift().values_list("pk", flat=True))
+            if drifted and not options["dry_run"]:
+                Order.objects.filter(pk__in=drifted).recompute_totals()
+            repaired += len(drifted)
+            if options["verbosity"] > 1 and drifted:
+                self.stdout.write(f"Orders {', '.join(map(str, drifted))}")
+
+        action = "would repair" if options["dry_run"] else "repaired"
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {checked} orders, {action} {repaired}")
+        )
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:47
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_totals(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+    items = OrderItem.objects.filter(order=OuterRef("pk")).order_by().values("order")
+    total = items.annotate(total=Sum(F("quantity") * F("price"))).values("total")
+    count = items.annotate(count=Sum("quantity")).values("count")
+    Order.objects.update(
+        total_price=Coalesce(
+            Subquery(total),
+            Value(Decimal("0.00")),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        ),
+        items_count=Coalesce(
+            Subquery(count), 0, output_field=models.PositiveIntegerField()
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="items_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
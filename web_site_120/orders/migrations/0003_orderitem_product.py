@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_product(apps, schema_editor):
+    OrderItem = apps.get_model("orders", "OrderItem")
+    Product = apps.get_model("catalog", "Product")
+    for kind in ("tire", "disk"):
+        products = Product.objects.filter(kind=kind, object_id=OuterRef(f"{kind}_id"))
+        OrderItem.objects.filter(**{f"{kind}__isnull": False}).update(
+            product=Subquery(products.values("pk")[:1])
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0002_product_search_index"),
+        ("orders", "0002_order_items_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orderitem",
+            name="product",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="catalog.product",
+            ),
+        ),
+        migrations.RunPython(fill_product, migrations.RunPython.noop),
+    ]
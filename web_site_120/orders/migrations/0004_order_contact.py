@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0003_orderitem_product"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="address",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="city",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="first_name",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="last_name",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="phone",
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
@@ -1,9 +1,56 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Concat
 from users.models import User
+from catalog.models import Product
 from tires.models import Tire
 from disks.models import Disk
 
 
+def item_totals():
+    """Expressions for the sum and the units of an order's items"""
+    items = OrderItem.objects.filter(order=OuterRef("pk")).order_by().values("order")
+    total = items.annotate(total=Sum(F("quantity") * F("price"))).values("total")
+    count = items.annotate(count=Sum("quantity")).values("count")
+    return (
+        Coalesce(
+            Subquery(total),
+            Value(Decimal("0.00")),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        ),
+        Coalesce(Subquery(count), 0, output_field=models.PositiveIntegerField()),
+    )
+
+
+class OrderQuerySet(models.QuerySet):
+    """Custom methods for Orders"""
+
+    def recompute_totals(self):
+        """Store total_price and items_count from the items, one UPDATE"""
+        total_price, items_count = item_totals()
+        return self.update(total_price=total_price, items_count=items_count)
+
+    def with_drift(self):
+        """Orders whose stored totals don't match their items"""
+        total_price, items_count = item_totals()
+        return self.annotate(items_total=total_price, items_units=items_count).exclude(
+            total_price=F("items_total"), items_count=F("items_units")
+        )
+
+
+class OrderManager(models.Manager):
+    def get_queryset(self):
+        return OrderQuerySet(self.model, using=self._db)
+
+    def recompute_totals(self):
+        return self.get_queryset().recompute_totals()
+
+    def with_drift(self):
+        return self.get_queryset().with_drift()
+
+
 class Order(models.Model):
     # Choices status
     STATUS_CHOICES = [
@@ -14,18 +61,46 @@ class Order(models.Model):
         ("cancelled", "Скасовано"),
     ]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # None for a guest checkout, who is only known by the contact details
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+
+    # Contact details given with this order, the user's profile isn't changed
+    first_name = models.CharField(max_length=100, blank=True)
+    last_name = models.CharField(max_length=100, blank=True)
+    email = models.EmailField(blank=True)
+    phone = models.CharField(max_length=20, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    address = models.CharField(max_length=255, blank=True)
 
     # Information about order
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default="new")
+    # Kept equal to the items by OrderItem signals, see orders.signals
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    items_count = models.PositiveIntegerField(default=0)  # Units of all items
 
     # Dates
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderManager()
+
+    def save(self, *args, **kwargs):
+        # The totals are written by recompute_totals() alone: an instance
+        # loaded before its items changed would put the old ones back
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in ("total_price", "items_count")
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
-        return f"Order #{self.id} - {self.user.first_name} - {self.status}"
+        name = self.user.first_name if self.user_id else self.first_name
+        return f"Order #{self.id} - {name} - {self.status}"
 
     class Meta:
         ordering = ["-created_at"]  # Новіші першими
@@ -37,23 +112,85 @@ class Order(models.Model):
         verbose_name_plural = "Orders"
 
 
+class OrderItemQuerySet(models.QuerySet):
+    """Custom methods for Order Items"""
+
+    def with_product_name(self):
+        """Annotate product_name in the query instead of loading tire/disk"""
+        return self.annotate(
+            product_name=models.Case(
+                models.When(
+                    product__isnull=False,
+                    then=Concat("product__brand", Value(" "), "product__model"),
+                ),
+                models.When(
+                    tire__isnull=False,
+                    then=Concat("tire__brand", Value(" "), "tire__model"),
+                ),
+                models.When(
+                    disk__isnull=False,
+                    then=Concat("disk__brand", Value(" "), "disk__model"),
+                ),
+                default=Value("Unknown Product"),
+                output_field=models.CharField(),
+            )
+        )
+
+
+class OrderItemManager(models.Manager):
+    def get_queryset(self):
+        return OrderItemQuerySet(self.model, using=self._db)
+
+    def with_product_name(self):
+        return self.get_queryset().with_product_name()
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
 
     # Link to the product (can be a tire or wheel)
     tire = models.ForeignKey(Tire, on_delete=models.SET_NULL, null=True, blank=True)
     disk = models.ForeignKey(Disk, on_delete=models.SET_NULL, null=True, blank=True)
+    # The same product in the cross-catalog table, filled in save()
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     # Count and price
     quantity = models.IntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)  # Price 1 product
 
+    objects = OrderItemManager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        item = super().from_db(db, field_names, values)
+        # Lets the totals of the old order be fixed when an item moves
+        item._loaded_order_id = item.__dict__.get("order_id")
+        return item
+
+    def save(self, *args, **kwargs):
+        if self.product_id is None and (self.tire_id or self.disk_id):
+            kind, object_id = (
+                ("tire", self.tire_id) if self.tire_id else ("disk", self.disk_id)
+            )
+            self.product = Product.objects.filter(
+                kind=kind, object_id=object_id
+            ).first()
+        super().save(*args, **kwargs)
+
     def get_total_price(self):
         """Calculates the total cost of goods in the order"""
         return self.quantity * self.price
 
     def get_product_name(self):
         """Returns the name of the product (tire or wheel)"""
+        if "product_name" in self.__dict__:  # from with_product_name()
+            return self.product_name
         if self.tire:
             return f"{self.tire.brand} {self.tire.model}"
         if self.disk:
@@ -61,7 +198,7 @@ class OrderItem(models.Model):
         return "Unknown Product"
 
     def __str__(self):
-        return f"Order #{self.order.id} - {self.get_product_name()} x{self.quantity}"
+        return f"Order #{self.order_id} - {self.get_product_name()} x{self.quantity}"
 
     class Meta:
         ordering = ["id"]
@@ -0,0 +1,141 @@
+"""
+Checkout: turn a list of products into an Order and take them off stock.
+
+Stock is reserved with conditional updates,
+``UPDATE ... SET quantity = quantity - n WHERE id = ? AND quantity >= n``,
+so the check and the decrement are one statement and two buyers can never
+both take the last item. Everything runs in one transaction: if any line is
+out of stock, nothing is reserved and no order is left behind.
+"""
+
+from collections import defaultdict
+
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from catalog.models import Product
+from catalog.products import sync_products
+from catalog.signals import catalog_stock_changed
+from disks.models import Disk
+from tires.models import Tire
+from .models import Order, OrderItem
+
+# OrderItem field that links each product model
+PRODUCT_FIELDS = {Tire: "tire", Disk: "disk"}
+
+
+class OutOfStock(Exception):
+    """Not enough of ``product`` left to sell ``requested``"""
+
+    def __init__(self, product, requested, available):
+        self.product = product
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f"{product.brand} {product.model} ({product.article}): "
+            f"requested {requested}, available {available}"
+        )
+
+
+def checkout(user, lines, contact=None):
+    """
+    Create an order of ``lines``, (Tire or Disk, quantity) pairs, for ``user``
+    (None for a guest).
+
+    ``contact`` holds the Order contact fields (name, email, phone, city,
+    address) given with this order.
+
+    Raises OutOfStock when a product can't cover its quantity and ValueError
+    for a bad line. Prices are read from the database after the stock is
+    reserved, and the order totals are summed by the database.
+    """
+    wanted = defaultdict(int)  # (model, pk) -> quantity, repeated products merged
+    products = {}
+    for product, quantity in lines:
+        model = type(product)
+        if model not in PRODUCT_FIELDS or product.pk is None:
+            raise ValueError(f"Can't order {product!r}")
+        if int(quantity) < 1:
+            raise ValueError(f"Quantity must be positive, got {quantity}")
+        wanted[model, product.pk] += int(quantity)
+        products[model, product.pk] = product
+    if not wanted:
+        raise ValueError("Nothing to order")
+
+    with transaction.atomic():
+        # Same lock order in every checkout, so two of them can't deadlock
+        now = timezone.now()
+        for model, pk in sorted(wanted, key=lambda key: (key[0]._meta.label, key[1])):
+            quantity = wanted[model, pk]
+            reserved = model.objects.filter(pk=pk, quantity__gte=quantity).update(
+                quantity=F("quantity") - quantity, updated_at=now
+            )
+            if not reserved:
+                available = (
+                    model.objects.filter(pk=pk)
+                    .values_list("quantity", flat=True)
+                    .first()
+                )
+                raise OutOfStock(products[model, pk], quantity, available or 0)
+
+        order = Order.objects.create(user=user, **(contact or {}))
+        items = []
+        for model, field in PRODUCT_FIELDS.items():
+            pks = [pk for product_model, pk in wanted if product_model is model]
+            if not pks:
+                continue
+            # The rows are locked by the updates above, the prices can't move
+            prices = (
+                model.objects.filter(pk__in=pks)
+                .order_by("pk")
+                .values_list("pk", "price")
+            )
+            items += [
+                OrderItem(
+                    order=order,
+                    quantity=wanted[model, pk],
+                    price=price,
+                    **{f"{field}_id": pk},
+                )
+                for pk, price in prices
+            ]
+        # bulk_create skips OrderItem.save(), link the products in the same query
+        products = models.Q()
+        for model, field in PRODUCT_FIELDS.items():
+            pks = [pk for product_model, pk in wanted if product_model is model]
+            products |= models.Q(kind=model._meta.model_name, object_id__in=pks)
+        product_ids = {
+            (kind, object_id): pk
+            for kind, object_id, pk in Product.objects.filter(products).values_list(
+                "kind", "object_id", "pk"
+            )
+        }
+        for item in items:
+            kind, object_id = (
+                ("tire", item.tire_id) if item.tire_id else ("disk", item.disk_id)
+            )
+            item.product_id = product_ids.get((kind, object_id))
+        OrderItem.objects.bulk_create(items)
+
+        # bulk_create skips the item signals, sum the items in one UPDATE
+        Order.objects.filter(pk=order.pk).recompute_totals()
+        order.refresh_from_db(fields=["total_price", "items_count"])
+
+        # update() sends no post_save. The Product rows move with the stock,
+        # in the transaction; the caches are told once the stock is committed,
+        # so nothing re-caches the old stock under the new catalog version.
+        # Only the quantities changed, so the facet summaries and the search
+        # suggestions are left alone (catalog_stock_changed).
+        # robust: the order is placed even if a cache can't be told
+        for model in PRODUCT_FIELDS:
+            pks = [pk for product_model, pk in wanted if product_model is model]
+            if pks:
+                sync_products(model, pks)
+                transaction.on_commit(
+                    lambda model=model, pks=pks: catalog_stock_changed.send(
+                        sender=model, pks=pks
+                    ),
+                    robust=True,
+                )
+    return order
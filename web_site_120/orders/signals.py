@@ -0,0 +1,11 @@
+from .models import Order
+
+
+def update_order_totals(sender, instance, origin=None, **kwargs):
+    """Recompute the totals of the order(s) an added/changed/removed item belongs to"""
+    if isinstance(origin, Order):
+        return  # the order itself is being deleted
+    order_ids = {instance.order_id, getattr(instance, "_loaded_order_id", None)}
+    order_ids.discard(None)
+    Order.objects.filter(pk__in=order_ids).recompute_totals()
+    instance._loaded_order_id = instance.order_id
@@ -1,3 +1,404 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.template import RequestContext, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.caching import catalog_version
+from catalog.tests import ChangelistQueriesMixin, make_disk, make_tire
+from catalog.models import Product
+from categories.models import Category
+from disks.models import Disk
+from tires.facets import tire_facets
+from tires.models import Tire
+from users.models import User
+from .cart import SESSION_KEY, Cart
+from .models import Order, OrderItem
+from .services import OutOfStock, checkout
+
+
+def make_user(email="buyer@example.com"):
+    return User.objects.create(
+        first_name="Ivan",
+        last_name="Petrenko",
+        email=email,
+        password="-",
+        phone="+380000000000",
+        city="Kyiv",
+        address="Khreshchatyk 1",
+    )
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tires", description="")
+        self.user = make_user()
+        self.tire = make_tire(category, "T1", price=Decimal("2500.50"), quantity=4)
+        self.disk = make_disk(category, "D1", price=Decimal("9000.00"), quantity=2)
+
+    def test_stock_change_keeps_the_facets(self):
+        tire_facets.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout(self.user, [(self.tire, 1)])
+        # Only the quantity moved, the sidebar values are still right
+        self.assertIsNotNone(cache.get(tire_facets.cache_key))
+
+    def test_creates_order_and_takes_stock(self):
+        version = catalog_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            order = checkout(
+                self.user, [(self.tire, 3), (self.disk, 1), (self.tire, 1)]
+            )
+        # The caches are only told once the stock change is committed
+        self.assertEqual(catalog_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(catalog_version(), version)
+        self.assertEqual(order.total_price, Decimal("19002.00"))
+        self.assertEqual(order.items_count, 5)
+        self.assertEqual(
+            list(order.items.values_list("tire", "disk", "quantity", "price")),
+            [
+                (self.tire.pk, None, 4, Decimal("2500.50")),
+                (None, self.disk.pk, 1, Decimal("9000.00")),
+            ],
+        )
+        updated_at = self.tire.updated_at
+        self.tire.refresh_from_db()
+        self.disk.refresh_from_db()
+        self.assertEqual((self.tire.quantity, self.disk.quantity), (0, 1))
+        # update() skips auto_now, the incremental feeds still see the change
+        self.assertGreater(self.tire.updated_at, updated_at)
+        self.assertEqual(
+            [item.product.get_absolute_url() for item in order.items.all()],
+            [f"/tires/{self.tire.slug}/", f"/disks/{self.disk.slug}/"],
+        )
+        # Stock moved without post_save, the product rows follow
+        self.assertEqual(
+            list(Product.objects.order_by("id").values_list("quantity", flat=True)),
+            [0, 1],
+        )
+
+    def test_out_of_stock_changes_nothing(self):
+        with self.assertRaises(OutOfStock) as raised:
+            checkout(self.user, [(self.tire, 1), (self.disk, 3)])
+        self.assertEqual(
+            (raised.exception.requested, raised.exception.available), (3, 2)
+        )
+        self.tire.refresh_from_db()
+        self.assertEqual(self.tire.quantity, 4)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_rejects_bad_lines(self):
+        for lines in ([], [(self.tire, 0)], [(self.user, 1)]):
+            with self.assertRaises(ValueError):
+                checkout(self.user, lines)
+
+
+class OrderTotalsTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tires", description="")
+        self.tire = make_tire(category, "T1")
+        self.order = Order.objects.create(user=make_user())
+
+    def add_item(self, order, quantity, price):
+        return OrderItem.objects.create(
+            order=order, tire=self.tire, quantity=quantity, price=Decimal(price)
+        )
+
+    def assertTotals(self, order, total_price, items_count):
+        order.refresh_from_db()
+        self.assertEqual(
+            (order.total_price, order.items_count), (Decimal(total_price), items_count)
+        )
+
+    def test_items_keep_the_totals(self):
+        with self.assertNumQueries(3):  # find the product, INSERT, UPDATE the order
+            first = self.add_item(self.order, 2, "100.10")
+        second = self.add_item(self.order, 1, "0.20")
+        self.assertTotals(self.order, "200.40", 3)
+
+        first.quantity = 3
+        first.save()
+        self.assertTotals(self.order, "300.50", 4)
+
+        second.delete()
+        self.assertTotals(self.order, "300.30", 3)
+        self.assertFalse(Order.objects.with_drift().exists())
+
+    def test_saving_a_stale_order_keeps_the_totals(self):
+        stale = Order.objects.get(pk=self.order.pk)
+        self.add_item(self.order, 2, "50.00")
+        stale.status = "paid"
+        stale.save()
+        self.assertTotals(stale, "100.00", 2)
+        self.assertEqual(stale.status, "paid")
+
+    def test_moving_an_item_fixes_both_orders(self):
+        item = self.add_item(self.order, 2, "50.00")
+        other = Order.objects.create(user=self.order.user)
+        item = OrderItem.objects.get(pk=item.pk)
+        item.order = other
+        item.save()
+        self.assertTotals(self.order, "0.00", 0)
+        self.assertTotals(other, "100.00", 2)
+
+    def test_deleting_an_order_skips_the_recompute(self):
+        for _ in range(3):
+            self.add_item(self.order, 1, "10.00")
+        # SELECT items, DELETE items, DELETE order, no UPDATE per item
+        with self.assertNumQueries(3):
+            self.order.delete()
+
+    def test_command_repairs_drift(self):
+        self.add_item(self.order, 2, "10.10")
+        clean = Order.objects.create(user=self.order.user)
+        self.add_item(clean, 1, "5.00")
+        # Bulk edits send no signals
+        OrderItem.objects.filter(order=self.order).update(quantity=5)
+        self.assertEqual(list(Order.objects.with_drift()), [self.order])
+
+        out = StringIO()
+        call_command("recompute_order_totals", "--batch-size", "1", stdout=out)
+        self.assertIn("Checked 2 orders, repaired 1", out.getvalue())
+        self.assertTotals(self.order, "50.50", 5)
+        self.assertFalse(Order.objects.with_drift().exists())
+
+
+class OrderAdminTests(ChangelistQueriesMixin, TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tires", description="")
+        self.tire = make_tire(category, "T1")
+        self.disk = make_disk(category, "D1")
+
+    def add_orders(self, rows):
+        for _ in range(rows):
+            user = make_user(f"buyer{Order.objects.count()}@example.com")
+            order = Order.objects.create(user=user)
+            OrderItem.objects.create(
+                order=order, tire=self.tire, quantity=1, price=Decimal("1")
+            )
+
+    def test_order_changelist_queries_are_constant(self):
+        self.assertChangelistQueries(Order, self.add_orders)
+
+    def test_item_changelist_queries_are_constant(self):
+        order = Order.objects.create(user=make_user())
+
+        def add_items(rows):
+            for i in range(rows):
+                product = {"tire": self.tire} if i % 2 else {"disk": self.disk}
+                OrderItem.objects.create(
+                    order=order, quantity=1, price=Decimal("1"), **product
+                )
+
+        self.assertChangelistQueries(OrderItem, add_items)
+
+    def test_order_change_page_queries_are_constant(self):
+        admin = get_user_model().objects.create_superuser("admin", "", "admin")
+        self.client.force_login(admin)
+        order = Order.objects.create(user=make_user())
+        url = reverse("admin:orders_order_change", args=[order.pk])
+        self.client.get(url)  # fills the per-process caches (content types, ...)
+        counts = []
+        for rows in (1, 10):
+            for _ in range(rows):
+                OrderItem.objects.create(
+                    order=order, tire=self.tire, quantity=1, price=Decimal("1")
+                )
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_product_name_is_annotated(self):
+        order = Order.objects.create(user=make_user())
+        OrderItem.objects.create(order=order, tire=self.tire, quantity=1, price=1)
+        OrderItem.objects.create(order=order, disk=self.disk, quantity=2, price=1)
+        OrderItem.objects.create(order=order, quantity=3, price=1)
+        with self.assertNumQueries(1):
+            names = [str(item) for item in OrderItem.objects.with_product_name()]
+        self.assertEqual(
+            names,
+            [
+                f"Order #{order.pk} - Michelin Pilot x1",
+                f"Order #{order.pk} - BBS CH-R x2",
+                f"Order #{order.pk} - Unknown Product x3",
+            ],
+        )
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    buyers = 20
+    stock = 7
+
+    def test_no_overselling(self):
+        category = Category.objects.create(name="Tires", description="")
+        tire = make_tire(category, "T1", quantity=self.stock)
+        users = [make_user(f"buyer{i}@example.com") for i in range(self.buyers)]
+        results = []
+        start = threading.Barrier(self.buyers)
+
+        def buy(user):
+            start.wait()
+            try:
+                while True:
+                    try:
+                        checkout(user, [(tire, 1)])
+                        results.append("sold")
+                        break
+                    except OutOfStock:
+                        results.append("out of stock")
+                        break
+                    except OperationalError:
+                        pass  # SQLite lets one writer in at a time, try again
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count("sold"), self.stock)
+        self.assertEqual(results.count("out of stock"), self.buyers - self.stock)
+        self.assertEqual(Tire.objects.get(pk=tire.pk).quantity, 0)
+        self.assertEqual(Order.objects.count(), self.stock)
+        self.assertEqual(OrderItem.objects.count(), self.stock)
+
+
+class CartTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Tires", description="")
+        self.tires = [make_tire(category, f"T{i}", quantity=10) for i in range(3)]
+        self.disk = make_disk(category, "D1", price=Decimal("9000.00"), quantity=2)
+
+    def put(self, product, quantity):
+        return self.client.post(
+            reverse("cart_update"),
+            {
+                "kind": product._meta.model_name,
+                "id": product.pk,
+                "quantity": quantity,
+            },
+        )
+
+    def test_session_holds_only_kind_id_quantity(self):
+        for tire in self.tires:
+            self.put(tire, 2)
+        response = self.put(self.disk, 1)
+        self.assertEqual(response.json(), {"count": 7})
+        self.assertEqual(
+            self.client.session[SESSION_KEY],
+            [["tire", tire.pk, 2] for tire in self.tires] + [["disk", self.disk.pk, 1]],
+        )
+        self.put(self.tires[0], 0)
+        self.assertEqual(len(self.client.session[SESSION_KEY]), 3)
+
+    def test_bad_updates(self):
+        self.assertEqual(self.put(self.disk, "many").status_code, 400)
+        response = self.client.post(reverse("cart_update"), {"kind": "car", "id": 1})
+        self.assertEqual(response.status_code, 400)
+        Disk.objects.filter(pk=self.disk.pk).delete()
+        self.assertEqual(self.put(self.disk, 1).status_code, 400)
+
+    def test_lines_are_one_query_per_model(self):
+        for tire in self.tires:
+            self.put(tire, 1)
+        self.put(self.disk, 2)
+        session = self.client.session
+        with self.assertNumQueries(2):
+            lines = Cart(session).lines()
+        self.assertEqual([line.product for line in lines], [*self.tires, self.disk])
+        self.assertEqual(Cart(session).total, Decimal("25500.00"))
+
+        # Products deleted in the meantime drop out
+        self.tires[1].delete()
+        data = self.client.get(reverse("cart")).json()
+        self.assertEqual(len(data["lines"]), 3)
+        self.assertEqual(data["lines"][2]["total"], "18000.00")
+
+    def test_context_processor_count_needs_no_query(self):
+        self.put(self.tires[0], 3)
+        self.put(self.disk, 1)
+        request = RequestFactory().get("/")
+        request.session = SessionStore(self.client.session.session_key)
+        template = Template("{{ cart.count }}")
+        with self.assertNumQueries(0):
+            self.assertEqual(template.render(RequestContext(request)), "4")
+
+    def test_checkout_orders_the_cart(self):
+        self.put(self.tires[0], 3)
+        self.put(self.disk, 2)
+        url = reverse("cart_checkout")
+        customer = {
+            "first_name": "Ivan",
+            "last_name": "Petrenko",
+            "email": "buyer@example.com",
+            "phone": "+380000000000",
+            "city": "Kyiv",
+            "address": "Khreshchatyk 1",
+        }
+        response = self.client.post(url, {**customer, "city": ""})
+        self.assertEqual(response.json(), {"error": "Missing city"})
+
+        make_user()
+        Tire.objects.filter(pk=self.tires[0].pk).update(price=Decimal("100.00"))
+        response = self.client.post(url, {**customer, "address": "Podil 2"})
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.json()["order"])
+        # Anyone can post the email, a guest's order isn't put on its profile
+        self.assertIsNone(order.user)
+        self.assertEqual((order.email, order.address), (customer["email"], "Podil 2"))
+        # Prices are taken when the order is placed
+        self.assertEqual(order.total_price, Decimal("18300.00"))
+        self.assertEqual(self.client.session[SESSION_KEY], [])
+
+        self.put(self.disk, 1)
+        response = self.client.post(url, customer)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(self.client.session[SESSION_KEY]), 1)
+
+    def test_logged_in_checkout_uses_the_account(self):
+        url = reverse("cart_checkout")
+        customer = {
+            "first_name": "Ivan",
+            "last_name": "Petrenko",
+            "email": "someone@example.com",
+            "phone": "+380000000000",
+            "city": "Lviv",
+            "address": "Rynok 1",
+        }
+        account = get_user_model().objects.create_user("ivan", email="ivan@example.com")
+        self.client.force_login(account)
+        self.put(self.tires[0], 1)
+        response = self.client.post(url, customer)
+        order = Order.objects.get(pk=response.json()["order"])
+        self.assertEqual(order.user.email, "ivan@example.com")
+        self.assertEqual((order.user.city, order.email), ("Lviv", customer["email"]))
+
+        # A returning customer's profile is left alone
+        self.put(self.tires[1], 1)
+        response = self.client.post(url, {**customer, "city": "Kyiv"})
+        again = Order.objects.get(pk=response.json()["order"])
+        self.assertEqual(again.user, order.user)
+        self.assertEqual((again.user.city, again.city), ("Lviv", "Kyiv"))
+
+    def test_pages_with_a_cart_are_not_shared(self):
+        url = reverse("api_tire_list")
+        self.assertIn("ETag", self.client.get(url))
+        self.put(self.disk, 1)
+        with self.assertNumQueries(1):  # the tires, not a cached page
+            response = self.client.get(url, {"fields": "id"})
+        self.assertNotIn("ETag", response)
@@ -1,3 +1,96 @@
-from django.shortcuts import render
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
 
-# Create your views here.
+from users.models import User
+from .cart import MODELS, Cart
+from .services import OutOfStock
+
+CUSTOMER_FIELDS = ["first_name", "last_name", "email", "phone", "city", "address"]
+
+
+def _cart_data(cart):
+    lines = cart.lines()
+    return {
+        "count": cart.count,
+        "total": cart.total,
+        "lines": [
+            {
+                "kind": line.kind,
+                "id": line.product.pk,
+                "name": f"{line.product.brand} {line.product.model}",
+                "article": line.product.article,
+                "url": reverse(f"{line.kind}_detail", args=[line.product.slug]),
+                "quantity": line.quantity,
+                "price": line.price,
+                "total": line.total,
+            }
+            for line in lines
+        ],
+    }
+
+
+def _customer(request, details):
+    """
+    The profile of a logged-in visitor, made from ``details`` on their first
+    order. Anyone can post an email, so a guest's order is never linked to
+    a profile by it: guests get None and the details stay on the order.
+    """
+    account = request.user
+    if not account.is_authenticated or not account.email:
+        return None
+    defaults = {field: value for field, value in details.items() if field != "email"}
+    user, _ = User.objects.get_or_create(email=account.email, defaults=defaults)
+    return user
+
+
+@require_GET
+def cart_detail(request):
+    """The session cart with its products"""
+    return JsonResponse(_cart_data(Cart(request.session)))
+
+
+@require_POST
+def cart_update(request):
+    """Set the quantity of a product in the cart: kind, id, quantity (0 removes)"""
+    cart = Cart(request.session)
+    kind = request.POST.get("kind")
+    try:
+        pk = int(request.POST.get("id", ""))
+        quantity = int(request.POST.get("quantity", 1))
+        if kind not in MODELS:
+            raise ValueError("kind must be tire or disk")
+        if quantity > 0 and not MODELS[kind].objects.filter(pk=pk).exists():
+            raise ValueError(f"No {kind} {pk}")
+        cart.set(kind, pk, quantity)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    return JsonResponse({"count": cart.count})
+
+
+@require_POST
+def cart_checkout(request):
+    """Order the cart for the customer posted with it (CUSTOMER_FIELDS)"""
+    details = {field: request.POST.get(field, "").strip() for field in CUSTOMER_FIELDS}
+    missing = [field for field, value in details.items() if not value]
+    if missing:
+        return JsonResponse({"error": f"Missing {', '.join(missing)}"}, status=400)
+    try:
+        validate_email(details["email"])
+    except ValidationError:
+        return JsonResponse({"error": "Invalid email"}, status=400)
+
+    cart = Cart(request.session)
+    try:
+        with transaction.atomic():
+            order = cart.checkout(_customer(request, details), details)
+    except OutOfStock as error:
+        return JsonResponse({"error": str(error)}, status=409)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    return JsonResponse(
+        {"order": order.pk, "total_price": order.total_price}, status=201
+    )
@@ -1,3 +1,303 @@
-from django.test import TestCase
+import json
+import time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django import shortcuts
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.client import RequestFactory
+from django.urls import reverse
+
+from catalog.middleware import RequestProfileMiddleware
+from catalog.tests import make_disk, make_tire
+from orders.models import Order
+from tires.models import Tire
+from categories.models import Category
+from disks import views as disk_views
+from tires import views as tire_views
+from users.models import User
+from . import views
+
+
+class GlobalSearchTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Catalog", description="")
+        self.tire = make_tire(category, "T1", brand="Nokian", model="Hakka Green")
+        self.disk = make_disk(category, "D1", brand="Nokian", model="Wheel")
+        make_tire(category, "T2")  # Michelin, doesn't match
+
+    def search(self, **params):
+        return self.client.get(reverse("search"), {"format": "json", **params})
+
+    def test_merges_both_catalogs(self):
+        self.search(q="warm")  # the FTS table check runs once per process
+        with self.assertNumQueries(2):  # one bounded query per catalog
+            response = self.search(q="nokian")
+        data = response.json()
+        self.assertEqual(
+            sorted((row["kind"], row["id"]) for row in data["results"]),
+            [("disk", self.disk.pk), ("tire", self.tire.pk)],
+        )
+        self.assertEqual(set(data["timings"]), {"tire", "disk", "merge"})
+        self.assertIn("tire;dur=", response["Server-Timing"])
+        urls = {row["url"] for row in data["results"]}
+        self.assertIn(f"/tires/{self.tire.slug}/", urls)
+
+    def test_pages_of_the_merged_stream(self):
+        category = Category.objects.get()
+        for i in range(5):
+            make_tire(category, f"N{i}", brand="Nokian", model=f"Model {i}")
+            make_disk(category, f"M{i}", brand="Nokian", model=f"Model {i}")
+        per_page = views.SEARCH_PER_PAGE
+        views.SEARCH_PER_PAGE = 4
+        self.addCleanup(setattr, views, "SEARCH_PER_PAGE", per_page)
+
+        seen = []
+        page = 1
+        while True:
+            data = self.search(q="nokian", page=page).json()
+            seen += [(row["kind"], row["id"]) for row in data["results"]]
+            if not data["has_next"]:
+                break
+            page += 1
+        self.assertEqual(page, 3)
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(len(set(seen)), 12)
+
+    def test_empty_query_runs_no_search(self):
+        with self.assertNumQueries(0):
+            data = self.search(q="  ").json()
+        self.assertEqual(data["results"], [])
+        self.assertEqual(data["page"], 1)
+
+
+def slow_response_middleware(get_response):
+    def middleware(request):
+        response = get_response(request)
+        time.sleep(0.05)
+        return response
+
+    return middleware
+
+
+def profile_lines(logs):
+    return [json.loads(line.split(":", 2)[2]) for line in logs.output]
+
+
+@override_settings(REQUEST_PROFILING=True)
+class RequestProfileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Catalog", description="")
+        self.tire = make_tire(category, "T1", brand="Nokian")
+        self.disk = make_disk(category, "D1", brand="Nokian")
+        for module in (views, tire_views, disk_views):
+            patcher = mock.patch.object(
+                module, "render", lambda request, name, context=None: HttpResponse()
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_every_page_reports_its_timings(self):
+        pages = [
+            ("home", [], {}),
+            ("tire_list", [], {"brand": "Nokian"}),
+            ("tire_detail", [self.tire.slug], {}),
+            ("disk_list", [], {}),
+            ("disk_detail", [self.disk.slug], {}),
+            ("search", [], {"q": "nokian"}),
+        ]
+        lines = {}
+        for name, args, params in pages:
+            with self.subTest(name), self.assertLogs("catalog.profiling") as logs:
+                response = self.client.get(reverse(name, args=args), params)
+                self.assertEqual(response.status_code, 200)
+                timing = response["Server-Timing"]
+                for entry in ("db", "db-slowest", "template", "view", "total"):
+                    self.assertIn(f"{entry};dur=", timing)
+                [lines[name]] = profile_lines(logs)
+                self.assertEqual(lines[name]["event"], "request")
+                self.assertEqual(lines[name]["path"], reverse(name, args=args))
+                self.assertIn(f'desc="{lines[name]["queries"]} queries"', timing)
+                self.assertLessEqual(lines[name]["view_ms"], lines[name]["total_ms"])
+        self.assertEqual(lines["tire_detail"]["queries"], 1)
+        self.assertIn('FROM "tires_tire"', lines["tire_detail"]["slowest_sql"])
+        self.assertEqual(lines["home"]["queries"], 0)  # the template's querysets
+        # The search's own entries are kept
+        self.assertIn("tire;dur=", response["Server-Timing"])
+
+    @override_settings(
+        TEMPLATES=[
+            {
+                "BACKEND": "catalog.profiling.ProfiledDjangoTemplates",
+                "OPTIONS": {
+                    "loaders": [
+                        (
+                            "django.template.loaders.locmem.Loader",
+                            {
+                                "tires/tire_detail.html": "{{ tire.brand }} {{ tire.model }}"
+                            },
+                        )
+                    ]
+                },
+            }
+        ]
+    )
+    def test_template_time(self):
+        self.enterContext(mock.patch.object(tire_views, "render", shortcuts.render))
+        with self.assertLogs("catalog.profiling") as logs:
+            response = self.client.get(reverse("tire_detail", args=[self.tire.slug]))
+        self.assertEqual(response.content, b"Nokian Pilot")
+        self.assertGreater(profile_lines(logs)[0]["template_ms"], 0)
+
+    def profile(self, view):
+        middleware = RequestProfileMiddleware(view)
+        with self.assertLogs("catalog.profiling") as logs:
+            response = middleware(RequestFactory().get("/tires/"))
+        return response, profile_lines(logs)
+
+    def test_repeated_queries_are_flagged(self):
+        def view(request):
+            for pk in [self.tire.pk] * 3:
+                Tire.objects.get(pk=pk)
+            return HttpResponse()
+
+        _, (line, duplicate) = self.profile(view)
+        self.assertEqual(line["duplicate_queries"], 3)
+        self.assertEqual(duplicate["event"], "duplicate_queries")
+        self.assertEqual(duplicate["count"], 3)
+        self.assertIn('FROM "tires_tire"', duplicate["sql"])
+
+        def view(request):
+            Tire.objects.get(pk=self.tire.pk)
+            return HttpResponse()
+
+        _, lines = self.profile(view)
+        self.assertEqual([line["event"] for line in lines], ["request"])
+
+    def test_slow_requests_are_sampled_with_every_query(self):
+        def view(request):
+            Tire.objects.get(pk=self.tire.pk)
+            return HttpResponse()
+
+        with override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_TRACE_RATE=1):
+            _, (line, trace) = self.profile(view)
+        self.assertEqual(trace["event"], "slow_request_trace")
+        [query] = trace["queries"]
+        self.assertEqual(query["db"], "default")
+        self.assertEqual(query["params"], [self.tire.pk])
+        with override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_TRACE_RATE=0):
+            _, lines = self.profile(view)
+        self.assertEqual(len(lines), 1)
+
+    def test_slow_traces_leave_out_personal_data(self):
+        user = User.objects.create(
+            first_name="Ann", last_name="Lee", email="ann@example.com"
+        )
+
+        def view(request):
+            User.objects.get(email="ann@example.com")
+            Order.objects.create(user=user, address="1 Main St")
+            Tire.objects.get(pk=self.tire.pk)
+            return HttpResponse()
+
+        with override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_TRACE_RATE=1):
+            _, (line, trace) = self.profile(view)
+        users, orders, tires = trace["queries"]
+        self.assertEqual(users["param_count"], 1)
+        self.assertGreater(orders["param_count"], 1)
+        self.assertNotIn("params", users)
+        self.assertNotIn("1 Main St", json.dumps(trace))
+        self.assertEqual(tires["params"], [self.tire.pk])
+
+    def test_view_time_leaves_out_the_other_middleware(self):
+        middleware = [
+            "catalog.middleware.RequestProfileMiddleware",
+            "pages.tests.slow_response_middleware",
+            "catalog.middleware.ViewProfileMiddleware",
+        ]
+        with self.settings(MIDDLEWARE=middleware):
+            with self.assertLogs("catalog.profiling") as logs:
+                self.client.get(reverse("tire_detail", args=[self.tire.slug]))
+        [line] = profile_lines(logs)
+        self.assertGreaterEqual(line["total_ms"], 50)
+        self.assertLess(line["view_ms"], 50)
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_not_loaded_when_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestProfileMiddleware(lambda request: HttpResponse())
+        with self.assertNoLogs("catalog.profiling"):
+            response = self.client.get(reverse("tire_list"))
+        self.assertFalse(response.has_header("Server-Timing"))
+
+
+@override_settings(ROOT_URLCONF="web_site_120.urls_async")
+class AsyncPagesTests(TransactionTestCase):
+    # The queries run in worker threads with their own connections, which
+    # only see committed rows
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Catalog", description="")
+        for i in range(14):
+            make_tire(category, f"T{i}", brand=["Nokian", "Michelin"][i % 2])
+        make_tire(category, "H1", brand="Nokian", model="Hakka Green")
+        make_disk(category, "D1")
+        # No templates in this tree, record what the pages would render
+        self.rendered = []
+        for module in (views, tire_views, disk_views):
+            patcher = mock.patch.object(module, "render", self.render)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def render(self, request, template_name, context=None):
+        self.rendered.append(context)
+        return HttpResponse(template_name)
+
+    def get(self, name, params, client):
+        if client is self.async_client:
+            return async_to_sync(client.get)(reverse(name), params)
+        return client.get(reverse(name), params)
+
+    def test_list_pages_match_the_sync_views(self):
+        cases = [
+            ("tire_list", "tires", {}),
+            ("tire_list", "tires", {"brand": "Nokian", "sort_by": "price"}),
+            ("tire_list", "tires", {"search": "hakka", "page": 1}),
+            ("disk_list", "disks", {"diameter": 18}),
+        ]
+        for name, rows, params in cases:
+            with self.subTest(name=name, params=params):
+                response = self.get(name, params, self.async_client)
+                self.assertEqual(response.status_code, 200)
+                concurrent = self.rendered.pop()
+                with override_settings(ROOT_URLCONF="web_site_120.urls"):
+                    self.get(name, params, self.client)
+                sequential = self.rendered.pop()
+                self.assertEqual(list(concurrent[rows]), list(sequential[rows]))
+                del concurrent["page_obj"], sequential["page_obj"]
+                self.assertEqual(concurrent, sequential)
+
+    def test_async_home_is_cached(self):
+        response = self.get("home", {}, self.async_client)
+        self.assertEqual(len(self.rendered.pop()["tires"]), 6)
+        repeat = async_to_sync(self.async_client.get)(
+            reverse("home"), headers={"if-none-match": response["ETag"]}
+        )
+        self.assertEqual(repeat.status_code, 304)
+        self.get("home", {}, self.async_client)
+        self.assertEqual(self.rendered, [])  # served from the page cache
+
+    @override_settings(REQUEST_PROFILING=True)
+    def test_queries_of_the_worker_threads_are_profiled(self):
+        with self.assertLogs("catalog.profiling") as logs:
+            response = self.get("tire_list", {"brand": "Nokian"}, self.async_client)
+        [line] = profile_lines(logs)
+        # The search, the page and its count, facet counts, filter values
+        self.assertGreaterEqual(line["queries"], 4)
+        self.assertGreater(line["view_ms"], 0)
+        self.assertIn(f'desc="{line["queries"]} queries"', response["Server-Timing"])
@@ -1,8 +1,28 @@
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.urls import reverse
+from catalog.caching import cache_catalog_page
+from catalog.parallel import run_in_worker, run_queries
+from catalog.search import merge_ranked
 from disks.models import Disk
 from tires.models import Tire
 
+SEARCH_PER_PAGE = 20
+SEARCH_MAX_PAGES = 50  # deeper pages would read too many rows of each catalog
+SEARCH_FIELDS = [
+    "id",
+    "brand",
+    "model",
+    "article",
+    "price",
+    "quantity",
+    "slug",
+    "image",
+    "created_at",
+]
 
+
+@cache_catalog_page
 def home(request):
     """Main Page"""
     latest_disks = Disk.objects.all()[0:6]
@@ -16,3 +36,63 @@ def home(request):
             "tires": latest_tires,
         },
     )
+
+
+@cache_catalog_page
+async def home_async(request):
+    """home with the latest disks and tires read at once"""
+    latest_disks, latest_tires = await run_queries(
+        (list, Disk.objects.all()[0:6]),
+        (list, Tire.objects.all()[0:6]),
+    )
+
+    return await run_in_worker(
+        render,
+        request,
+        "pages/home.html",
+        {
+            "disks": latest_disks,
+            "tires": latest_tires,
+        },
+    )
+
+
+def search(request):
+    """Search tires and disks at once, one ranked list (?format=json for JSON)"""
+    query = request.GET.get("q", "").strip()
+    try:
+        page = min(max(int(request.GET.get("page", 1)), 1), SEARCH_MAX_PAGES)
+    except ValueError:
+        page = 1
+
+    results, has_next, timings = [], False, {}
+    if query:
+        results, has_next, timings = merge_ranked(
+            {"tire": Tire.objects.search(query), "disk": Disk.objects.search(query)},
+            offset=(page - 1) * SEARCH_PER_PAGE,
+            limit=SEARCH_PER_PAGE,
+            fields=SEARCH_FIELDS,
+        )
+        for row in results:
+            row["url"] = reverse(f"{row['kind']}_detail", args=[row["slug"]])
+
+    context = {
+        "query": query,
+        "results": results,
+        "page": page,
+        "has_next": has_next and page < SEARCH_MAX_PAGES,
+        "has_previous": page > 1,
+        "timings": timings,
+    }
+    if request.GET.get("format") == "json" or "application/json" in request.headers.get(
+        "Accept", ""
+    ):
+        response = JsonResponse(context)
+    else:
+        response = render(request, "pages/search.html", context)
+    if timings:
+        # Cost of each sub-search, visible in the browser's network panel
+        response["Server-Timing"] = ", ".join(
+            f"{name};dur={duration:.2f}" for name, duration in timings.items()
+        )
+    return response
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class TiresConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tires'
+
+    def ready(self):
+        from catalog.search import keep_search_index
+        from .facets import tire_facets
+        from .models import Tire
+
+        tire_facets.connect()
+        keep_search_index(self, Tire)
@@ -0,0 +1,5 @@
+from catalog.facets import FacetSummary
+from .models import Tire
+
+# Sidebar filters of the tire list
+tire_facets = FacetSummary(Tire, ["brand", "season", "diameter"])
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from catalog.search import drop_search_index, install_search_index
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection, apps.get_model("tires", "Tire"))
+
+
+def remove_search_index(apps, schema_editor):
+    drop_search_index(schema_editor.connection, apps.get_model("tires", "Tire"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tires", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0001_initial"),
+        ("tires", "0002_tire_search_index"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="tire",
+            name="tires_tire_season_13e658_idx",
+        ),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(fields=["created_at"], name="tire_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(fields=["price"], name="tire_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(
+                fields=["season", "diameter", "created_at"],
+                name="tire_season_diam_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(
+                fields=["season", "diameter", "price"],
+                name="tire_season_diam_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["season", "diameter", "created_at"],
+                name="tire_in_stock_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(
+                fields=["brand", "season", "created_at"],
+                name="tire_brand_season_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:33
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Concat
+
+
+def fill_size_key(apps, schema_editor):
+    Tire = apps.get_model("tires", "Tire")
+    text = models.CharField()
+    Tire.objects.update(
+        size_key=Concat(
+            Cast("width", text),
+            models.Value("/"),
+            Cast("profile", text),
+            models.Value("R"),
+            Cast("diameter", text),
+            output_field=text,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0001_initial"),
+        ("tires", "0003_catalog_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tire",
+            name="size_key",
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(fill_size_key, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(fields=["size_key"], name="tire_size_idx"),
+        ),
+    ]
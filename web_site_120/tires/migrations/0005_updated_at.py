@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:56
+
+from django.db import migrations, models
+
+
+def fill_updated_at(apps, schema_editor):
+    # Existing rows would all look changed "now", start from their creation
+    Tire = apps.get_model("tires", "Tire")
+    Tire.objects.update(updated_at=models.F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0001_initial"),
+        ("tires", "0004_tire_size_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tire",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(fields=["updated_at"], name="tire_updated_idx"),
+        ),
+    ]
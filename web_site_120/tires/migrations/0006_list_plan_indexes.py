@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0001_initial"),
+        ("tires", "0005_updated_at"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="tire",
+            name="tire_in_stock_created_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="tire",
+            name="tire_brand_season_created_idx",
+        ),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(
+                fields=["diameter", "created_at"], name="tire_diameter_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["created_at"],
+                name="tire_in_stock_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["price"],
+                name="tire_in_stock_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["brand"],
+                name="tire_in_stock_brand_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["brand", "season", "diameter"],
+                name="tire_in_stock_facets_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tire",
+            index=models.Index(
+                fields=["brand", "season", "diameter", "created_at"],
+                name="tire_brand_season_diam_idx",
+            ),
+        ),
+    ]
@@ -1,17 +1,58 @@
+import re
+
 from django.db import models
-from django.utils.text import slugify
 from categories.models import Category
+from catalog.facets import facet_counts
+from catalog.search import full_text_search
+from catalog.slugs import save_with_unique_slug
+
+# Tire size as people type it: "205/55 R16", "205/55ZR16", "205 55 16", "205-55-r16"
+SIZE_RE = re.compile(
+    r"(?<!\d)(\d{3})\s*[/\s\-xX]\s*(\d{2})[\s\-]*(?:[zZ]?[rR])?\s*(\d{2})(?!\d)"
+)
+# Only width and profile: "205/55"
+PARTIAL_SIZE_RE = re.compile(r"(?<!\d)(\d{3})\s*[/\-]\s*(\d{2})(?!\d)")
+
+
+def format_size(width, profile, diameter):
+    """Normalized size used by Tire.size_key ("205/55R16")"""
+    return f"{width}/{profile}R{diameter}"
+
+
+def parse_size(value):
+    """(width, profile, diameter) from a free-form size string or None"""
+    match = SIZE_RE.search(value)
+    if match:
+        return tuple(int(part) for part in match.groups())
+    return None
 
 
 class TireQuerySet(models.QuerySet):
     """Custom methods for tire search"""
 
     def search(self, query):
-        return self.filter(
-            models.Q(brand__icontains=query)
-            | models.Q(model__icontains=query)
-            | models.Q(article__icontains=query)
-        )
+        """Search by brand, model, article and size (best matches first)"""
+        tires = self
+        match = SIZE_RE.search(query)
+        if match:
+            # "michelin 205/55 R16" -> size filter plus a text search for "michelin"
+            tires = tires.by_size(match.group())
+            query = (query[: match.start()] + " " + query[match.end() :]).strip()
+        return full_text_search(tires, query)
+
+    def by_size(self, size):
+        """Filter by a size string ("205/55 R16" or just "205/55")"""
+        parsed = parse_size(size)
+        if parsed:
+            return self.filter(size_key=format_size(*parsed))
+        match = PARTIAL_SIZE_RE.search(size)
+        if match:
+            # Every "205/55R.." key, a range the size index can seek
+            width, profile = match.groups()
+            return self.filter(
+                size_key__gte=f"{width}/{profile}R", size_key__lt=f"{width}/{profile}S"
+            )
+        return self.none()
 
     def by_brand(self, brand):
         """Filter by brand"""
@@ -33,6 +74,12 @@ class TireQuerySet(models.QuerySet):
         """Only products in stock"""
         return self.filter(quantity__gt=0)
 
+    def facet_counts(self, brand="", season="", diameter=""):
+        """Count per brand/season/diameter value, each ignoring its own filter"""
+        return facet_counts(
+            self, {"brand": brand, "season": season, "diameter": diameter}
+        )
+
 
 class TireManager(models.Manager):
     def get_queryset(self):
@@ -41,6 +88,9 @@ class TireManager(models.Manager):
     def search(self, query):
         return self.get_queryset().search(query)
 
+    def by_size(self, size):
+        return self.get_queryset().by_size(size)
+
     def by_brand(self, brand):
         return self.get_queryset().by_brand(brand)
 
@@ -56,6 +106,9 @@ class TireManager(models.Manager):
     def in_stock(self):
         return self.get_queryset().in_stock()
 
+    def facet_counts(self, brand="", season="", diameter=""):
+        return self.get_queryset().facet_counts(brand, season, diameter)
+
 
 class Tire(models.Model):
     # Season
@@ -85,6 +138,7 @@ class Tire(models.Model):
     diameter = models.IntegerField()  # Diameter (14, 16, 17 ...)
     tire_type = models.CharField(max_length=50, choices=TIRE_TYPE_CHOICES)  # Type Tire
     season = models.CharField(max_length=50, choices=SEASON_CHOICES)  # Season
+    size_key = models.CharField(max_length=20, blank=True, editable=False)  # 205/55R16
     load_index = models.IntegerField()  # Load index (82, 91...)
     speed_index = models.CharField(max_length=5)  # Speed index (H, V, W...)
 
@@ -99,16 +153,37 @@ class Tire(models.Model):
 
     # Date
     created_at = models.DateTimeField(auto_now_add=True)  # Date add
+    # Bumped by save(); bulk writers set it themselves (feeds read it)
+    updated_at = models.DateTimeField(auto_now=True)
 
     slug = models.SlugField(unique=True, blank=True)
 
     objects = TireManager()
 
+    def slug_parts(self):
+        """Slug words, later ones only used to tell same-name products apart"""
+        return (
+            f"{self.brand} {self.model}",
+            f"{self.width}-{self.profile}-r{self.diameter}",
+            self.article,
+        )
+
+    # Computed columns and the fields they are computed from
+    DERIVED_FIELDS = {"size_key": ("width", "profile", "diameter")}
+
+    def set_derived_fields(self):
+        """Fill the columns computed from other fields (bulk writes call it too)"""
+        self.size_key = format_size(self.width, self.profile, self.diameter)
+
     # https://docs.djangoproject.com/en/5.2/topics/db/models/#overriding-predefined-model-methods
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(f"{self.brand}-{self.model}")
-        super().save(*args, **kwargs)
+        self.set_derived_fields()
+        if self.slug:
+            super().save(*args, **kwargs)
+        else:
+            save_with_unique_slug(
+                self, self.slug_parts(), super().save, *args, **kwargs
+            )
 
     def __str__(self):
         return f"{self.brand} {self.model} {self.width}/{self.profile}R{self.diameter}"
@@ -117,8 +192,52 @@ class Tire(models.Model):
         ordering = ["-created_at"]  # New Tires
         indexes = [
             models.Index(fields=["brand"]),
-            models.Index(fields=["season"]),
             models.Index(fields=["slug"]),
+            models.Index(fields=["size_key"], name="tire_size_idx"),
+            # Sorted list pages and their filter combinations. Ascending created_at
+            # indexes also serve "-created_at, -id" when walked backwards.
+            models.Index(fields=["created_at"], name="tire_created_idx"),
+            models.Index(fields=["updated_at"], name="tire_updated_idx"),
+            models.Index(fields=["price"], name="tire_price_idx"),
+            models.Index(
+                fields=["season", "diameter", "created_at"],
+                name="tire_season_diam_created_idx",
+            ),
+            models.Index(
+                fields=["season", "diameter", "price"],
+                name="tire_season_diam_price_idx",
+            ),
+            models.Index(
+                fields=["diameter", "created_at"], name="tire_diameter_created_idx"
+            ),
+            # Only the rows in stock, walked in order by ?in_stock=1 pages and
+            # grouped by their facet counts
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(quantity__gt=0),
+                name="tire_in_stock_created_idx",
+            ),
+            models.Index(
+                fields=["price"],
+                condition=models.Q(quantity__gt=0),
+                name="tire_in_stock_price_idx",
+            ),
+            models.Index(
+                fields=["brand"],
+                condition=models.Q(quantity__gt=0),
+                name="tire_in_stock_brand_idx",
+            ),
+            models.Index(
+                fields=["brand", "season", "diameter"],
+                condition=models.Q(quantity__gt=0),
+                name="tire_in_stock_facets_idx",
+            ),
+            # Brand filter, the "related" block of tire_detail and, covering
+            # brand/season/diameter, the facet counts GROUP BY
+            models.Index(
+                fields=["brand", "season", "diameter", "created_at"],
+                name="tire_brand_season_diam_idx",
+            ),
         ]
         verbose_name = "Tier"
         verbose_name_plural = "Tires"
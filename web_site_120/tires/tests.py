@@ -1,3 +1,114 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from catalog.tests import ChangelistQueriesMixin, make_tire
+from categories.models import Category
+from .models import Tire, parse_size
+
+
+class TireSizeTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tires", description="")
+        self.small = make_tire(category, "A1", width=205, profile=55, diameter=16)
+        self.large = make_tire(
+            category, "A2", model="X", width=225, profile=45, diameter=17
+        )
+
+    def test_parse_size(self):
+        for text in [
+            "205/55 R16",
+            "205/55R16",
+            "205/55ZR16",
+            "205 55 16",
+            "205-55-r16",
+        ]:
+            self.assertEqual(parse_size(text), (205, 55, 16), text)
+        self.assertIsNone(parse_size("205/55"))
+        self.assertIsNone(parse_size("michelin"))
+
+    def test_save_keeps_size_key(self):
+        self.assertEqual(self.small.size_key, "205/55R16")
+        self.large.diameter = 18
+        self.large.save()
+        self.assertEqual(Tire.objects.get(pk=self.large.pk).size_key, "225/45R18")
+
+    def test_by_size(self):
+        self.assertEqual(list(Tire.objects.by_size("205/55 r16")), [self.small])
+        self.assertEqual(list(Tire.objects.by_size("225/45")), [self.large])
+        other = make_tire(self.small.category, "A3", width=225, profile=45, diameter=18)
+        make_tire(self.small.category, "A4", width=225, profile=40, diameter=17)
+        self.assertEqual(set(Tire.objects.by_size("225/45")), {self.large, other})
+        self.assertEqual(list(Tire.objects.by_size("nonsense")), [])
+
+    def test_search_understands_sizes(self):
+        self.assertEqual(list(Tire.objects.search("225/45 R17")), [self.large])
+        self.assertEqual(list(Tire.objects.search("michelin 205/55R16")), [self.small])
+        self.assertEqual(list(Tire.objects.search("nokian 205/55R16")), [])
+
+
+# The pagination block of the listing templates
+PAGINATION = (
+    "{% for tire in page_obj %}{{ tire.article }} {% endfor %}"
+    "| {{ page_obj.number }}/{{ page_obj.paginator.num_pages }} |"
+    "{% if page_obj.has_previous %} ?page={{ page_obj.previous_page_number }}"
+    "{% endif %}"
+    "{% if page_obj.has_next %} ?page={{ page_obj.next_page_number }}{% endif %}"
+)
+
+
+@override_settings(
+    TEMPLATES=[
+        {
+            "BACKEND": "django.template.backends.django.DjangoTemplates",
+            "OPTIONS": {
+                "loaders": [
+                    (
+                        "django.template.loaders.locmem.Loader",
+                        {"tires/tire_list.html": PAGINATION},
+                    )
+                ]
+            },
+        }
+    ]
+)
+class TireListPaginationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tires", description="")
+        for i in range(30):
+            make_tire(category, f"A{i:02}", price=1000 + i)
+
+    def get(self, **params):
+        response = self.client.get(reverse("tire_list"), params)
+        return response, response.content.decode()
+
+    def test_cursor_pages_render_page_links(self):
+        response, html = self.get(sort_by="price")
+        self.assertTrue(html.endswith("| 1/3 | ?page=2"))
+        self.assertTrue(html.startswith("A00 A01 "))
+
+        cursor = response.context["page_obj"].next_cursor
+        response, html = self.get(sort_by="price", cursor=cursor)
+        self.assertTrue(html.startswith("A12 "))
+        self.assertTrue(html.endswith("| 2/3 | ?page=1 ?page=3"))
+
+        # The rendered link leads to the same rows as the cursor
+        _, linked = self.get(sort_by="price", page=2)
+        self.assertEqual(linked, html)
+
+        cursor = response.context["page_obj"].next_cursor
+        _, html = self.get(sort_by="price", cursor=cursor)
+        self.assertEqual(
+            html, " ".join(f"A{i}" for i in range(24, 30)) + " | 3/3 | ?page=2"
+        )
+
+
+class TireAdminTests(ChangelistQueriesMixin, TestCase):
+    def test_changelist_queries_are_constant(self):
+        category = Category.objects.create(name="Tires", description="")
+
+        def add_rows(rows):
+            start = Tire.objects.count()
+            for i in range(start, start + rows):
+                make_tire(category, f"A{i}", brand=f"Brand {i % 3}")
+
+        self.assertChangelistQueries(Tire, add_rows)
@@ -1,75 +1,130 @@
 from django.shortcuts import render, get_object_or_404
 from django.core.paginator import Paginator
-from django.db import models
+from catalog.caching import cache_catalog_page
+from catalog.pagination import KeysetPaginator
+from catalog.parallel import run_in_worker, run_queries
+from .facets import tire_facets
 from .models import Tire, TireManager
 
 
-def tire_list(request):
-    """List of tires with search, filtering and sorting"""
+def search_tires(params):
+    """Tires matching the search, size, price and stock parameters"""
     tires: TireManager = Tire.objects.all()
 
     # Search
-    search = request.GET.get("search", "")
+    search = params.get("search", "")
     if search:
         tires = tires.search(search)
 
-    brand = request.GET.get("brand", "")
-    if brand:
-        tires = tires.by_brand(brand)
-
-    season = request.GET.get("season", "")
-    if season:
-        tires = tires.by_season(season)
-
-    diameter = request.GET.get("diameter", "")
-    if diameter:
-        tires = tires.by_diameter(diameter)
+    size = params.get("size", "")
+    if size:
+        tires = tires.by_size(size)
 
-    min_price = request.GET.get("min_price", "")
-    max_price = request.GET.get("max_price", "")
+    min_price = params.get("min_price", "")
+    max_price = params.get("max_price", "")
     if min_price and max_price:
         tires = tires.by_price_range(float(min_price), float(max_price))
 
-    sort_by = request.GET.get("sort_by", "-created_at")
-    valid_sorts = ["-created_at", "created_at", "price", "-price", "brand"]
-    if sort_by in valid_sorts:
-        tires = tires.order_by(sort_by)
-
-    in_stock_only = request.GET.get("in_stock", "")
+    in_stock_only = params.get("in_stock", "")
     if in_stock_only:
         tires = tires.in_stock()
 
-    # PAGINATION (12 products per page)
-    paginator = Paginator(tires, 12)
-    page_number = request.GET.get("page", 1)
-    page_obj = paginator.get_page(page_number)
+    return tires
 
-    # GET UNIQUE VALUES FOR THE FILTERS
-    all_tires: TireManager = Tire.objects.all()
-    brands = sorted(all_tires.values_list("brand", flat=True).distinct())
-    seasons = all_tires.values_list("season", flat=True).distinct()
-    diameters = sorted(all_tires.values_list("diameter", flat=True).distinct())
 
-    min_price_db = all_tires.aggregate(models.Min("price"))["price__min"] or 0
-    max_price_db = all_tires.aggregate(models.Max("price"))["price__max"] or 0
+def filter_tires(tires, params):
+    """Apply the brand, season and diameter filters"""
+    if params.get("brand"):
+        tires = tires.by_brand(params["brand"])
 
-    context = {
+    if params.get("season"):
+        tires = tires.by_season(params["season"])
+
+    if params.get("diameter"):
+        tires = tires.by_diameter(params["diameter"])
+
+    return tires
+
+
+def tire_page(tires, params):
+    """The page of ``tires`` asked for by ``params``, its rows already read"""
+    # Search results keep their relevance order unless a sort is chosen
+    sort_by = params.get(
+        "sort_by", "relevance" if params.get("search") else "-created_at"
+    )
+    valid_sorts = ["-created_at", "created_at", "price", "-price", "brand"]
+    if sort_by in valid_sorts:
+        tires = tires.order_by(sort_by)
+
+    # PAGINATION (12 products per page)
+    # Cursor links cost the same on every page, ?page=N links still work
+    if sort_by in KeysetPaginator.orderings and "page" not in params:
+        paginator = KeysetPaginator(tires, 12, sort_by)
+        page_obj = paginator.get_page(params.get("cursor"))
+    else:
+        paginator = Paginator(tires, 12)
+        page_number = params.get("page", 1)
+        page_obj = paginator.get_page(page_number)
+        page_obj.object_list = list(page_obj.object_list)
+    return page_obj
+
+
+def tire_list_context(params, page_obj, facet_counts, facets):
+    seasons = facets["season"]
+    return {
         "page_obj": page_obj,
         "tires": page_obj.object_list,
-        "brands": brands,
+        "brands": facets["brand"],
         "seasons": seasons,
-        "diameters": diameters,
-        "min_price_db": min_price_db,
-        "max_price_db": max_price_db,
-        "current_search": search,
-        "current_brand": brand,
+        "diameters": facets["diameter"],
+        "facet_counts": facet_counts,
+        "min_price_db": facets["min_price"],
+        "max_price_db": facets["max_price"],
+        "current_search": params.get("search", ""),
+        "current_size": params.get("size", ""),
+        "current_brand": params.get("brand", ""),
         "current_seasons": seasons,
-        "current_diameter": diameter,
+        "current_diameter": params.get("diameter", ""),
     }
 
+
+def tire_list(request):
+    """List of tires with search, filtering and sorting"""
+    tires = search_tires(request.GET)
+    brand = request.GET.get("brand", "")
+    season = request.GET.get("season", "")
+    diameter = request.GET.get("diameter", "")
+
+    # Counts for the filters, before the filters themselves are applied
+    facet_counts = tires.facet_counts(brand, season, diameter)
+    page_obj = tire_page(filter_tires(tires, request.GET), request.GET)
+
+    # UNIQUE VALUES FOR THE FILTERS (cached, kept fresh by model signals)
+    facets = tire_facets.get()
+
+    context = tire_list_context(request.GET, page_obj, facet_counts, facets)
     return render(request, "tires/tire_list.html", context=context)
 
 
+async def tire_list_async(request):
+    """tire_list with the page, the facet counts and the facets read at once"""
+    # Building a search may look up its index table
+    tires = await run_in_worker(search_tires, request.GET)
+    brand = request.GET.get("brand", "")
+    season = request.GET.get("season", "")
+    diameter = request.GET.get("diameter", "")
+
+    facet_counts, page_obj, facets = await run_queries(
+        (tires.facet_counts, brand, season, diameter),
+        (tire_page, filter_tires(tires, request.GET), request.GET),
+        (tire_facets.get,),
+    )
+
+    context = tire_list_context(request.GET, page_obj, facet_counts, facets)
+    return await run_in_worker(render, request, "tires/tire_list.html", context)
+
+
+@cache_catalog_page
 def tire_detail(request, slug):
     """Parts of one tire"""
     tire = get_object_or_404(Tire, slug=slug)
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web_site_120.settings')
+# Async list pages under ASGI, DJANGO_URLCONF=web_site_120.urls opts out
+os.environ.setdefault('DJANGO_URLCONF', 'web_site_120.urls_async')
 
 application = get_asgi_application()
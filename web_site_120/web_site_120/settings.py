@@ -43,23 +43,31 @@ INSTALLED_APPS = [
     "disks.apps.DisksConfig",
     "orders.apps.OrdersConfig",
     "tires.apps.TiresConfig",
+    "catalog.apps.CatalogConfig",
 ]
 
 MIDDLEWARE = [
+    # First, so it sees the queries and time of every other middleware too
+    "catalog.middleware.RequestProfileMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "catalog.middleware.PrimaryAfterWriteMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Last, so the view time is the view's alone
+    "catalog.middleware.ViewProfileMiddleware",
 ]
 
-ROOT_URLCONF = "web_site_120.urls"
+# asgi.py picks web_site_120.urls_async, the same routes with async list pages
+ROOT_URLCONF = os.environ.get("DJANGO_URLCONF", "web_site_120.urls")
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates with renders timed for catalog.profiling
+        "BACKEND": "catalog.profiling.ProfiledDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -67,6 +75,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "orders.context_processors.cart",
             ],
         },
     },
@@ -78,10 +87,94 @@ WSGI_APPLICATION = "web_site_120.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
+# Connections are kept for DB_CONN_MAX_AGE seconds (0 - one per request) and
+# checked before reuse, so a restarted database server costs one error-free
+# reconnect instead of a failed request.
+CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", 60))
+
+# SQLite, run on every new connection:
+# - WAL: readers don't block the writer and the writer doesn't block readers;
+# - synchronous=NORMAL: no fsync per commit, still safe in WAL mode (a power
+#   cut can lose the last commits, never corrupt the file);
+# - 64 MB page cache and 256 MB memory-mapped reads per connection;
+# - temporary sort/group tables in memory.
+SQLITE_OPTIONS = {
+    "init_command": (
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA cache_size=-65536;"
+        "PRAGMA mmap_size=268435456;"
+        "PRAGMA temp_store=MEMORY;"
+    ),
+    # Writers wait up to 20 s for the lock instead of failing at once with
+    # "database is locked"
+    "timeout": 20,
+    # Take the write lock at BEGIN: a deferred transaction that reads, then
+    # writes can't wait for the lock and fails when another writer holds it
+    "transaction_mode": "IMMEDIATE",
+}
+
+# A non-empty POSTGRES_DB switches the primary and its replicas to PostgreSQL
+USE_POSTGRES = bool(os.environ.get("POSTGRES_DB"))
+
+if USE_POSTGRES:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ["POSTGRES_DB"],
+            "USER": os.environ.get("POSTGRES_USER", ""),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", ""),
+            "PORT": os.environ.get("POSTGRES_PORT", ""),
+            "CONN_MAX_AGE": CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": SQLITE_OPTIONS,
+        }
+    }
+
+# Read replicas for catalog pages (catalog.routers). A second SQLite file,
+# read-only here, is enough to try it locally (see README)
+if USE_POSTGRES:
+    replica_hosts = os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",")
+    for number, host in enumerate(filter(None, map(str.strip, replica_hosts)), 1):
+        DATABASES[f"replica{number}"] = {
+            **DATABASES["default"],
+            "HOST": host,
+            "TEST": {"MIRROR": "default"},
+        }
+elif os.environ.get("SQLITE_REPLICA_PATH"):
+    DATABASES["replica"] = {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": f"file:{os.environ['SQLITE_REPLICA_PATH']}?mode=ro",
+        "CONN_MAX_AGE": CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"timeout": 20},
+        "TEST": {"MIRROR": "default"},
+    }
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["catalog.routers.ReplicaRouter"]
+# Seconds a replica may lag behind: how long someone who changed the catalog
+# keeps reading the primary, and how long after a change pages aren't cached
+REPLICA_LAG = int(os.environ.get("REPLICA_LAG", 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Catalog filter summaries live here and are updated by model signals, so
+# production (several processes) needs a shared backend such as Redis.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     }
 }
 
@@ -127,5 +220,36 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Sessions hold the cart read on every page, serve them from the cache
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+# Bearer token for the supplier price/stock sync endpoint, disabled when empty
+CATALOG_SYNC_TOKEN = os.environ.get("CATALOG_SYNC_TOKEN", "")
+
+# Threads resizing uploaded product images in the background
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", 2))
+
+# Per-request query, template and view timings (catalog.profiling): a
+# Server-Timing header and log lines. Off unless REQUEST_PROFILING=1
+REQUEST_PROFILING = os.environ.get("REQUEST_PROFILING") == "1"
+# Statements run this many times in one request are logged as likely N+1
+DUPLICATE_QUERY_THRESHOLD = int(os.environ.get("DUPLICATE_QUERY_THRESHOLD", 3))
+# Share of the requests slower than SLOW_REQUEST_MS logged with every query
+SLOW_REQUEST_MS = int(os.environ.get("SLOW_REQUEST_MS", 500))
+SLOW_REQUEST_TRACE_RATE = float(os.environ.get("SLOW_REQUEST_TRACE_RATE", 0.1))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "catalog.profiling": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
@@ -19,21 +19,44 @@ from django.contrib import admin
 from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
-from pages.views import home
+from pages.views import home, search
+from catalog import api, views as catalog_views
+from orders import views as order_views
 from disks import views as disk_views
 from tires import views as tire_views
 
-
 urlpatterns = [
     path("admin/", admin.site.urls),
     # home
     path("", home, name="home"),
+    path("search/", search, name="search"),
     # disks
     path("disks/", disk_views.disk_list, name="disk_list"),
     path("disks/<slug:slug>/", disk_views.disk_detail, name="disk_detail"),
     # tires
     path("tires/", tire_views.tire_list, name="tire_list"),
     path("tires/<slug:slug>/", tire_views.tire_detail, name="tire_detail"),
+    # cart
+    path("cart/", order_views.cart_detail, name="cart"),
+    path("cart/update/", order_views.cart_update, name="cart_update"),
+    path("cart/checkout/", order_views.cart_checkout, name="cart_checkout"),
+    # JSON API
+    path("api/tires/", api.tire_list, name="api_tire_list"),
+    path("api/tires/<slug:slug>/", api.tire_detail, name="api_tire_detail"),
+    path("api/disks/", api.disk_list, name="api_disk_list"),
+    path("api/disks/<slug:slug>/", api.disk_detail, name="api_disk_detail"),
+    path("api/categories/", api.category_list, name="api_category_list"),
+    path(
+        "api/categories/<slug:slug>/",
+        api.category_detail,
+        name="api_category_detail",
+    ),
+    # search box suggestions
+    path("api/autocomplete/", catalog_views.autocomplete, name="autocomplete"),
+    # supplier feeds
+    path("api/stock/sync/", catalog_views.stock_sync, name="stock_sync"),
+    # marketplace feeds
+    path("feeds/<str:fmt>/", catalog_views.product_feed, name="product_feed"),
 ]
 
 if settings.DEBUG:
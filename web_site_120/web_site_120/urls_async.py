@@ -0,0 +1,26 @@
+"""
+URL configuration served by asgi.py: the same routes as urls.py, with the
+async versions of the pages that have independent queries to run at once.
+"""
+
+from django.urls import path
+
+from disks import views as disk_views
+from pages import views as page_views
+from tires import views as tire_views
+from .urls import urlpatterns as sync_urlpatterns
+
+ASYNC_VIEWS = {
+    "home": page_views.home_async,
+    "disk_list": disk_views.disk_list_async,
+    "tire_list": tire_views.tire_list_async,
+}
+
+urlpatterns = [
+    (
+        path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name)
+        if getattr(pattern, "name", None) in ASYNC_VIEWS
+        else pattern
+    )
+    for pattern in sync_urlpatterns
+]